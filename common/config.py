@@ -20,15 +20,54 @@ class AppSettings(BaseSettings):
     rag_search_routing_key: str = Field("search", alias="RAG_SEARCH_ROUTING_KEY")
     rag_recommend_routing_key: str = Field("recommend", alias="RAG_RECOMMEND_ROUTING_KEY")
     rag_quiz_routing_key: str = Field("quiz", alias="RAG_QUIZ_ROUTING_KEY")
+    rag_search_batch_routing_key: str = Field("search_batch", alias="RAG_SEARCH_BATCH_ROUTING_KEY")
+    rag_facets_routing_key: str = Field("facets", alias="RAG_FACETS_ROUTING_KEY")
+    rag_cancel_exchange: str = Field("rag.cancel", alias="RAG_CANCEL_EXCHANGE")  # fanout
+    # RPC server: concurrent handlers per queue; prefetch = concurrency * RPC_PREFETCH_PER_WORKER
+    rpc_search_concurrency: int = Field(2, alias="RPC_SEARCH_CONCURRENCY")
+    rpc_recommend_concurrency: int = Field(4, alias="RPC_RECOMMEND_CONCURRENCY")
+    rpc_quiz_concurrency: int = Field(1, alias="RPC_QUIZ_CONCURRENCY")
+    rpc_search_batch_concurrency: int = Field(1, alias="RPC_SEARCH_BATCH_CONCURRENCY")
+    rpc_facets_concurrency: int = Field(4, alias="RPC_FACETS_CONCURRENCY")
+    rpc_prefetch_per_worker: int = Field(2, alias="RPC_PREFETCH_PER_WORKER")
+    rpc_drain_timeout_s: float = Field(30.0, alias="RPC_DRAIN_TIMEOUT_S")
+    # RPC bodies: request codec for clients (application/json | application/msgpack);
+    # bodies from this size (bytes) are deflated, 0 disables compression
+    rpc_content_type: str = Field("application/msgpack", alias="RPC_CONTENT_TYPE")
+    rpc_compress_threshold: int = Field(16384, alias="RPC_COMPRESS_THRESHOLD")
 
     # Qdrant
     qdrant_host: str = Field("qdrant", alias="QDRANT_HOST")
     qdrant_port: int = Field(6333, alias="QDRANT_PORT")
     qdrant_collection: str = Field("tech_media_chunks", alias="QDRANT_COLLECTION")
+    # Vector backend: "qdrant" (server) or "embedded" (in-process store under VECTOR_STORE_PATH,
+    # written by the indexer, opened read-only by rag-service at startup)
+    vector_backend: str = Field("qdrant", alias="VECTOR_BACKEND")
+    vector_store_path: str = Field("/vectors", alias="VECTOR_STORE_PATH")
+    vector_store_dtype: str = Field("float32", alias="VECTOR_STORE_DTYPE")  # float32 | float16
+    # rag-service async client: gRPC transport, request timeout, retries of transient errors, HTTP pool size
+    qdrant_prefer_grpc: bool = Field(False, alias="QDRANT_PREFER_GRPC")
+    qdrant_grpc_port: int = Field(6334, alias="QDRANT_GRPC_PORT")
+    qdrant_timeout_s: float = Field(10.0, alias="QDRANT_TIMEOUT_S")
+    qdrant_retries: int = Field(2, alias="QDRANT_RETRIES")
+    qdrant_pool_size: int = Field(32, alias="QDRANT_POOL_SIZE")
+    # Retrieval: "groups" = Qdrant group-by article_id, "chunks" = top chunks folded client-side
+    rag_retrieval_mode: str = Field("groups", alias="RAG_RETRIEVAL_MODE")
+    rag_chunks_per_article: int = Field(3, alias="RAG_CHUNKS_PER_ARTICLE")
+    # Filters matching at most this many chunks are scored exactly instead of via ANN (0 = off)
+    rag_exact_search_threshold: int = Field(1000, alias="RAG_EXACT_SEARCH_THRESHOLD")
+    rag_facet_cache_ttl_s: float = Field(300.0, alias="RAG_FACET_CACHE_TTL_S")
+    # How often rag-service checks for a new facet catalog version
+    facets_refresh_s: float = Field(60.0, alias="FACETS_REFRESH_S")
+    # How often rag-service checks which collection version the QDRANT_COLLECTION alias points to
+    collection_refresh_s: float = Field(15.0, alias="COLLECTION_REFRESH_S")
 
     # Embeddings
     embed_model: str = Field("intfloat/multilingual-e5-small", alias="EMBED_MODEL")
     embed_batch_size: int = Field(32, alias="EMBED_BATCH_SIZE")
+    # rag-service: concurrent query embeddings are micro-batched (window 0 = only what is already queued)
+    embed_batch_window_ms: float = Field(2.0, alias="EMBED_BATCH_WINDOW_MS")
+    embed_batch_max_size: int = Field(32, alias="EMBED_BATCH_MAX_SIZE")
 
     # LLM
     llm_model_path: str = Field("/models/model.gguf", alias="LLM_MODEL_PATH")
@@ -37,12 +76,48 @@ class AppSettings(BaseSettings):
     llm_temperature: float = Field(0.2, alias="LLM_TEMPERATURE")
     llm_top_p: float = Field(0.95, alias="LLM_TOP_P")
     llm_n_gpu_layers: int = Field(35, alias="LLM_N_GPU_LAYERS")
+    # Parallel generation: N llama.cpp contexts over one mmap'ed GGUF (CPU hosts)
+    llm_pool_size: int = Field(1, alias="LLM_POOL_SIZE")
+    llm_n_threads: int = Field(0, alias="LLM_N_THREADS")  # per context; 0 => llama.cpp default
+    llm_pin_cores: bool = Field(False, alias="LLM_PIN_CORES")
+    # Input-token budget for the prompt; 0 => LLM_N_CTX - LLM_MAX_TOKENS (minus a small reserve)
+    llm_prompt_token_budget: int = Field(0, alias="LLM_PROMPT_TOKEN_BUDGET")
+    # Speculative decoding: off | prompt_lookup | draft
+    llm_speculative_mode: str = Field("off", alias="LLM_SPECULATIVE_MODE")
+    llm_speculative_endpoints: str = Field("search,quiz", alias="LLM_SPECULATIVE_ENDPOINTS")  # comma-separated
+    llm_speculative_num_pred_tokens: int = Field(10, alias="LLM_SPECULATIVE_NUM_PRED_TOKENS")
+    llm_speculative_max_ngram: int = Field(2, alias="LLM_SPECULATIVE_MAX_NGRAM")
+    llm_draft_model_path: str = Field("", alias="LLM_DRAFT_MODEL_PATH")
+    # Quiz: JSON-schema constrained output; token budget = base + per_question * n_questions
+    # (per_question 0 = measured with the model's tokenizer at the schema length limits;
+    # n_questions is clamped to fit n_ctx/2 and the response reports it)
+    quiz_structured: bool = Field(True, alias="QUIZ_STRUCTURED")
+    llm_quiz_base_tokens: int = Field(16, alias="LLM_QUIZ_BASE_TOKENS")
+    llm_quiz_tokens_per_question: int = Field(0, alias="LLM_QUIZ_TOKENS_PER_QUESTION")
 
     # Indexer
     csv_input_dir: str = Field("/data", alias="CSV_INPUT_DIR")
     chunk_size: int = Field(900, alias="CHUNK_SIZE")
     chunk_overlap: int = Field(150, alias="CHUNK_OVERLAP")
     upsert_batch_size: int = Field(256, alias="UPSERT_BATCH_SIZE")
+    # Per-article index state; unchanged articles are skipped on re-runs (delete the file for a full rewrite)
+    index_manifest_path: str = Field("/state/index_manifest.json", alias="INDEX_MANIFEST_PATH")
+    # Blue/green re-indexing (Qdrant only): build <QDRANT_COLLECTION>__v<time>, then switch the alias
+    index_blue_green: bool = Field(False, alias="INDEX_BLUE_GREEN")
+    index_keep_versions: int = Field(2, alias="INDEX_KEEP_VERSIONS")
+    index_optimize_timeout_s: float = Field(3600.0, alias="INDEX_OPTIMIZE_TIMEOUT_S")
+    # HNSW indexing threshold (KB) restored on a version after its bulk load
+    qdrant_indexing_threshold: int = Field(20000, alias="QDRANT_INDEXING_THRESHOLD")
+
+    # Offline abstracts (python3 -m rag_service.abstracts), fed to search instead of raw excerpts
+    abstracts_state_path: str = Field("/state/abstracts.json", alias="ABSTRACTS_STATE_PATH")
+    abstract_max_tokens: int = Field(160, alias="ABSTRACT_MAX_TOKENS")
+    abstract_source_chunks: int = Field(3, alias="ABSTRACT_SOURCE_CHUNKS")
+    rag_use_abstracts: bool = Field(True, alias="RAG_USE_ABSTRACTS")
+    # Answer search with an extractive summary when the predicted LLM queue wait
+    # exceeds this many seconds (0 = only during warm-up)
+    rag_degrade_wait_s: float = Field(30.0, alias="RAG_DEGRADE_WAIT_S")
+    rag_extractive_sentences: int = Field(4, alias="RAG_EXTRACTIVE_SENTENCES")
 
     # Telegram
     telegram_bot_token: str = Field("CHANGE_ME", alias="TELEGRAM_BOT_TOKEN")
@@ -50,6 +125,9 @@ class AppSettings(BaseSettings):
     # Logging
     log_level: str = Field("INFO", alias="LOG_LEVEL")
 
+    def speculative_endpoints_list(self) -> List[str]:
+        return [p.strip() for p in self.llm_speculative_endpoints.split(",") if p.strip()]
+
     def allowed_ids_list(self) -> List[int]:
         if not self.allowed_telegram_ids.strip():
             return []
@@ -0,0 +1,33 @@
+"""Article metadata store: one point per article next to the chunk collection.
+
+Chunk points carry only what search filters and ranks on, plus the text::
+
+    {"article_id", "chunk_id", "text", "author_norm", "pub_day", "pub_epoch_day", "topics_norm"}
+
+Everything shown to the user lives once per article in ``<collection>__articles``
+(point id = ``article_id``, 1-d dummy vector)::
+
+    {"title", "author", "platform", "url", "pub_date", "pub_day", "topics",
+     "subtopic_raw", "chunks", "abstract"}
+
+rag-service joins it for the final top-N articles only. Collections indexed
+before the split have the metadata in every chunk payload; readers fall back
+to it when an article has no record.
+"""
+
+from typing import Any, Dict, Tuple
+
+
+CHUNK_FIELDS = ("article_id", "chunk_id", "text", "author_norm", "pub_day", "pub_epoch_day", "topics_norm")
+ARTICLE_FIELDS = ("title", "author", "platform", "url", "pub_date", "pub_day", "topics", "subtopic_raw", "abstract")
+
+
+def articles_collection(collection: str) -> str:
+    return f"{collection}__articles"
+
+
+def split_payload(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(chunk payload, article payload) of a chunk point in either layout."""
+    chunk = {k: payload[k] for k in CHUNK_FIELDS if k in payload}
+    article = {k: payload[k] for k in ARTICLE_FIELDS if k in payload}
+    return chunk, article
@@ -0,0 +1,22 @@
+"""Where the indexer publishes the facet catalog and how it is laid out.
+
+The catalog is one point in a small ``<collection>__meta`` collection next to
+the chunk collection, so it lives in whatever vector backend is configured::
+
+    {
+      "version": "2024-12-01T10:00:00+00:00",   # changes on every indexer run
+      "articles": 1234,
+      "authors": [["иванов", "Иванов", 12], ...],   # [normalized, label, articles]
+      "topics":  [["ии", "ИИ", 310], ...],
+      "days":    [["2024-12-01", 7], ...]          # articles per pub_day
+    }
+"""
+
+import uuid
+
+
+FACETS_POINT_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "meta:facets"))
+
+
+def meta_collection(collection: str) -> str:
+    return f"{collection}__meta"
@@ -1,16 +1,29 @@
+import datetime as dt
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 
 class RagFilters(BaseModel):
     author: Optional[str] = None
-    date: Optional[str] = None  # YYYY-MM-DD
+    date: Optional[str] = None  # YYYY-MM-DD, exact day
+    date_from: Optional[dt.date] = None  # YYYY-MM-DD, inclusive
+    date_to: Optional[dt.date] = None  # YYYY-MM-DD, inclusive
     topic: Optional[str] = None
 
 
 class RagRequest(BaseModel):
     query: str = Field(..., min_length=1)
     filters: RagFilters = Field(default_factory=RagFilters)
+    # "fast": no generation, the summary lists precomputed article abstracts
+    mode: Literal["full", "fast"] = "full"
+    # Accept an extractive summary (no LLM) during warm-up or when the LLM queue is long
+    allow_degraded: bool = True
+
+
+class RagBatchRequest(BaseModel):
+    queries: List[RagRequest] = Field(..., min_length=1, max_length=256)
+    summarize: bool = False  # LLM summary per query; off => retrieval only
+    max_articles: int = Field(default=5, ge=1, le=20)
 
 
 class ArticleItem(BaseModel):
@@ -21,6 +34,39 @@ class ArticleItem(BaseModel):
     topic: str
 
 
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str] = Field(..., min_length=4, max_length=4)
+    answer: str = Field(..., pattern="^[A-D]$")
+    explanation: str = ""
+    source: int  # 1-based index into articles
+
+
 class RagResponse(BaseModel):
     summary: str
     articles: List[ArticleItem]
+    quiz: Optional[List[QuizQuestion]] = None  # structured quiz; summary keeps a text rendering
+    degraded: bool = False  # summary is extractive (LLM warming up or saturated)
+
+
+class RagBatchResponse(BaseModel):
+    results: List[RagResponse]  # aligned with RagBatchRequest.queries
+    summary: str = ""  # set only when the batch as a whole failed
+
+
+class FacetsRequest(BaseModel):
+    field: Literal["author", "topic", "day"]
+    prefix: str = ""  # matched against normalized values and their words
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class FacetValue(BaseModel):
+    value: str  # normalized, what the filter matches on
+    label: str  # as written in the source data
+    count: int  # articles
+
+
+class FacetsResponse(BaseModel):
+    field: str
+    values: List[FacetValue]
+    version: str = ""  # catalog version; empty while no catalog is loaded
@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+
+
+logger = logging.getLogger(__name__)
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared by the RPC layer and worker threads.
+
+    Callbacks let blocking waiters (e.g. the LLM scheduler) wake up on cancel
+    instead of polling.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for cb in callbacks:
+            cb()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def add_callback(self, cb: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+    def remove_callback(self, cb: Callable[[], None]) -> None:
+        with self._lock:
+            if cb in self._callbacks:
+                self._callbacks.remove(cb)
+
+
+class CancelRegistry:
+    """In-flight RPC requests by correlation_id.
+
+    A cancel can arrive before the request is delivered to us (still in the
+    broker queue or the prefetch buffer); such ids are remembered for
+    ``remember_s`` so the request is dropped as soon as it shows up.
+    """
+
+    def __init__(self, remember_s: float = 600.0, max_remembered: int = 10000) -> None:
+        self._lock = threading.Lock()
+        self._active: Dict[str, CancelToken] = {}
+        self._cancelled: "OrderedDict[str, float]" = OrderedDict()
+        self._remember_s = remember_s
+        self._max_remembered = max_remembered
+
+    def register(self, correlation_id: str) -> CancelToken:
+        token = CancelToken()
+        with self._lock:
+            early = self._cancelled.pop(correlation_id, None) is not None
+            self._active[correlation_id] = token
+        if early:
+            token.cancel()
+        return token
+
+    def release(self, correlation_id: str) -> None:
+        with self._lock:
+            self._active.pop(correlation_id, None)
+
+    def cancel(self, correlation_id: str) -> bool:
+        """Cancel a request; returns True if it was in flight."""
+        with self._lock:
+            token = self._active.get(correlation_id)
+            if token is None:
+                now = time.monotonic()
+                self._cancelled[correlation_id] = now
+                while self._cancelled and (
+                    len(self._cancelled) > self._max_remembered
+                    or next(iter(self._cancelled.values())) < now - self._remember_s
+                ):
+                    self._cancelled.popitem(last=False)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+
+async def publish_cancel(channel: AbstractChannel, exchange_name: str, correlation_id: str, api_key: Optional[str]) -> None:
+    exchange = await channel.get_exchange(exchange_name, ensure=False)
+    headers = {"x-api-key": api_key} if api_key else {}
+    await exchange.publish(
+        aio_pika.Message(
+            body=json.dumps({"correlation_id": correlation_id}).encode("utf-8"),
+            headers=headers,
+            content_type="application/json",
+        ),
+        routing_key="",
+    )
+
+
+class CancelListener:
+    """Consumes cancel notices from a fanout exchange into a CancelRegistry.
+
+    Every service instance binds its own exclusive queue, so a cancel reaches
+    whichever instance holds the request.
+    """
+
+    def __init__(
+        self,
+        conn: AbstractRobustConnection,
+        exchange_name: str,
+        registry: CancelRegistry,
+        required_api_key: Optional[str] = None,
+    ) -> None:
+        self._conn = conn
+        self._exchange_name = exchange_name
+        self._registry = registry
+        self._required_api_key = required_api_key
+        self._channel: Optional[aio_pika.abc.AbstractRobustChannel] = None
+
+    async def start(self) -> None:
+        channel = await self._conn.channel()
+        self._channel = channel
+        exchange = await channel.declare_exchange(self._exchange_name, aio_pika.ExchangeType.FANOUT, durable=True)
+        queue = await channel.declare_queue(name="", exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+
+        async def on_cancel(message: aio_pika.IncomingMessage) -> None:
+            if self._required_api_key and (message.headers or {}).get("x-api-key") != self._required_api_key:
+                logger.warning("Unauthorized cancel notice", extra={"trace_id": ""})
+                return
+            try:
+                cid = json.loads(message.body.decode("utf-8"))["correlation_id"]
+            except Exception:
+                logger.warning("Malformed cancel notice", extra={"trace_id": ""})
+                return
+            in_flight = self._registry.cancel(str(cid))
+            logger.info("RPC cancel received", extra={"trace_id": "", "correlation_id": cid, "in_flight": in_flight})
+
+        await queue.consume(on_cancel, no_ack=True)
+        logger.info("Cancel listener started", extra={"trace_id": "", "exchange": self._exchange_name})
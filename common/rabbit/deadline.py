@@ -0,0 +1,30 @@
+"""Call deadlines, shared by the RPC client and server.
+
+The client sets an absolute deadline on every call; the server drops calls
+that expired while queued and sheds those it predicts it cannot answer in
+time.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+
+# Absolute deadline set by the caller, unix time in integer milliseconds (AMQP
+# tables encode Python floats as 32-bit). Compared against the local clock, so
+# hosts are expected to be NTP-synced.
+DEADLINE_HEADER = "x-deadline-ms"
+
+
+def deadline_header(timeout_s: float) -> int:
+    return int((time.time() + timeout_s) * 1000)
+
+
+def deadline_from_headers(headers: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Return the caller's deadline as unix time in seconds, if present."""
+    raw = (headers or {}).get(DEADLINE_HEADER)
+    if raw is None:
+        return None
+    try:
+        return int(raw.decode() if isinstance(raw, bytes) else raw) / 1000.0
+    except (TypeError, ValueError):
+        return None
@@ -1,17 +1,141 @@
 import asyncio
-import json
+import logging
 import uuid
 from typing import Any, Dict, Optional
 
 import aio_pika
-from aio_pika.abc import AbstractRobustConnection
+from aio_pika.abc import AbstractExchange, AbstractQueue, AbstractRobustChannel, AbstractRobustConnection
+
+from common.rabbit.cancellation import publish_cancel
+from common.rabbit.codec import ACCEPT_ENCODING_HEADER, DEFLATE, JSON, decode, encode, preferred_content_type
+from common.rabbit.deadline import DEADLINE_HEADER, deadline_header
+
+
+logger = logging.getLogger(__name__)
+
+
+class RpcCancelled(Exception):
+    """The call was superseded by a newer call with the same cancel key."""
+
+
+class RpcConnectionLost(ConnectionError):
+    """The connection was re-established while the call was waiting for its reply."""
 
 
 class RpcClient:
-    def __init__(self, conn: AbstractRobustConnection, exchange_name: str, api_key: str) -> None:
+    """RPC client over one long-lived channel and one reply consumer.
+
+    Replies for all calls arrive on a single exclusive queue and are routed to
+    waiting futures by correlation_id, so a call costs a single publish. Calls
+    that time out or are cancelled are removed from the map and a cancel notice
+    is published (when ``cancel_exchange`` is set) so the server can stop work.
+
+    Requests are serialized as ``content_type`` (JSON if that codec is not
+    installed) and deflated above ``compress_threshold`` bytes; the caller also
+    advertises that it accepts compressed replies.
+    """
+
+    def __init__(
+        self,
+        conn: AbstractRobustConnection,
+        exchange_name: str,
+        api_key: Optional[str] = None,
+        cancel_exchange: Optional[str] = None,
+        content_type: str = JSON,
+        compress_threshold: int = 0,
+    ) -> None:
         self._conn = conn
         self._exchange_name = exchange_name
         self._api_key = api_key
+        self._cancel_exchange = cancel_exchange
+        self._content_type = preferred_content_type(content_type)
+        self._compress_threshold = compress_threshold
+
+        self._channel: Optional[AbstractRobustChannel] = None
+        self._exchange: Optional[AbstractExchange] = None
+        self._reply_q: Optional[AbstractQueue] = None
+        self._start_lock = asyncio.Lock()
+
+        self._pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # cancel_key (e.g. "search:<user_id>") -> correlation_id of the latest call
+        self._latest: Dict[str, str] = {}
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._reply_q is not None:
+                return
+            channel = await self._conn.channel()
+            self._exchange = await channel.declare_exchange(self._exchange_name, aio_pika.ExchangeType.DIRECT, durable=True)
+            if self._cancel_exchange:
+                await channel.declare_exchange(self._cancel_exchange, aio_pika.ExchangeType.FANOUT, durable=True)
+
+            # Client-named rather than server-named (amq.gen-*): the robust channel
+            # re-declares it after a reconnect, and the broker refuses "amq."
+            # names from clients. We avoid direct reply-to because its consumer
+            # cannot be restored across reconnects (PRECONDITION_FAILED - fast
+            # reply consumer does not exist).
+            reply_q = await channel.declare_queue(
+                name=f"rpc.reply.{uuid.uuid4().hex}",
+                durable=False,
+                exclusive=True,
+                auto_delete=True,
+            )
+            await reply_q.consume(self._on_response, no_ack=True)
+            self._conn.reconnect_callbacks.add(self._on_reconnect)
+
+            self._channel = channel
+            self._reply_q = reply_q
+            logger.info("RPC client started", extra={"trace_id": "", "exchange": self._exchange_name, "reply_queue": reply_q.name})
+
+    async def close(self) -> None:
+        self._conn.reconnect_callbacks.discard(self._on_reconnect)
+        self._fail_pending(RpcConnectionLost("RPC client closed"))
+        if self._channel is not None:
+            await self._channel.close()
+        self._channel = None
+        self._exchange = None
+        self._reply_q = None
+
+    async def _on_response(self, message: aio_pika.IncomingMessage) -> None:
+        cid = message.correlation_id
+        fut = self._pending.pop(cid, None) if cid else None
+        if fut is None or fut.done():
+            # Late reply for a call we stopped waiting for.
+            return
+        try:
+            fut.set_result(decode(message.body, message.content_type, message.content_encoding))
+        except Exception as e:
+            fut.set_exception(e)
+
+    def _on_reconnect(self, *_: Any) -> None:
+        # The exclusive reply queue died with the old connection, together with
+        # any replies in it; fail fast instead of waiting for the timeout.
+        self._fail_pending(RpcConnectionLost("AMQP connection was re-established"))
+
+    def _fail_pending(self, exc: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    async def cancel(self, correlation_id: str) -> None:
+        """Publish a cancel notice; failures are logged, never raised."""
+        if not self._cancel_exchange or self._channel is None:
+            return
+        try:
+            await publish_cancel(self._channel, self._cancel_exchange, correlation_id, self._api_key)
+        except Exception:
+            logger.exception("Failed to publish RPC cancel", extra={"trace_id": ""})
+
+    async def _supersede(self, cancel_key: str, correlation_id: str) -> None:
+        previous = self._latest.get(cancel_key)
+        self._latest[cancel_key] = correlation_id
+        if previous is None:
+            return
+        fut = self._pending.pop(previous, None)
+        if fut and not fut.done():
+            fut.set_exception(RpcCancelled())
+            await self.cancel(previous)
 
     async def call(
         self,
@@ -19,32 +143,53 @@ class RpcClient:
         payload: Dict[str, Any],
         timeout_s: float = 250.0,
         trace_id: Optional[str] = None,
+        cancel_key: Optional[str] = None,
     ) -> Dict[str, Any]:
-        channel = await self._conn.channel()
-        exchange = await channel.declare_exchange(self._exchange_name, aio_pika.ExchangeType.DIRECT, durable=True)
+        """Publish a request and wait for its reply.
 
-        callback_queue = "amq.rabbitmq.reply-to"
-        correlation_id = str(uuid.uuid4())
-        fut: asyncio.Future[Dict[str, Any]] = asyncio.get_running_loop().create_future()
-
-        async def on_response(message: aio_pika.IncomingMessage) -> None:
-            if message.correlation_id == correlation_id and not fut.done():
-                data = json.loads(message.body.decode("utf-8"))
-                fut.set_result(data)
+        A newer call with the same ``cancel_key`` makes this one raise RpcCancelled.
+        """
+        if self._reply_q is None:
+            await self.start()
+        assert self._exchange is not None and self._reply_q is not None
 
-        await channel.consume(on_response, queue_name=callback_queue, no_ack=True)
-
-        headers = {"x-api-key": self._api_key}
+        correlation_id = str(uuid.uuid4())
+        # Absolute deadline lets the server drop requests we no longer wait for.
+        headers: Dict[str, Any] = {DEADLINE_HEADER: deadline_header(timeout_s)}
+        if self._api_key:
+            headers["x-api-key"] = self._api_key
         if trace_id:
             headers["x-trace-id"] = trace_id
+        if self._compress_threshold:
+            headers[ACCEPT_ENCODING_HEADER] = DEFLATE
+        body, content_type, content_encoding = encode(payload, self._content_type, self._compress_threshold)
+
+        fut: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = fut
+        if cancel_key:
+            await self._supersede(cancel_key, correlation_id)
 
         msg = aio_pika.Message(
-            body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
-            reply_to=callback_queue,
+            body=body,
+            reply_to=self._reply_q.name,
             correlation_id=correlation_id,
-            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
             headers=headers,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            content_type=content_type,
+            content_encoding=content_encoding,
+            # The broker discards the request once nobody can be waiting for it.
+            expiration=timeout_s,
         )
-        await exchange.publish(msg, routing_key=routing_key)
 
-        return await asyncio.wait_for(fut, timeout=timeout_s)
+        try:
+            await self._exchange.publish(msg, routing_key=routing_key)
+            return await asyncio.wait_for(fut, timeout=timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # We stop waiting: let the server free the capacity.
+            self._pending.pop(correlation_id, None)
+            await self.cancel(correlation_id)
+            raise
+        finally:
+            self._pending.pop(correlation_id, None)
+            if cancel_key and self._latest.get(cancel_key) == correlation_id:
+                del self._latest[cancel_key]
@@ -1,15 +1,31 @@
-import json
+import asyncio
 import logging
-from typing import Awaitable, Callable, Optional
+import time
+from typing import Any, Awaitable, Callable, Optional, Set
 
 import aio_pika
 from aio_pika.abc import AbstractRobustConnection
 
+from common.rabbit.cancellation import CancelRegistry
+from common.rabbit.codec import JSON, accepts_compression, decode, encode, preferred_content_type
+from common.rabbit.deadline import deadline_from_headers
+
 
 logger = logging.getLogger(__name__)
 
+OVERLOADED_REPLY = {"summary": "Сервис перегружен. Попробуйте позже.", "articles": [], "error": "overloaded"}
+
 
 class RpcServer:
+    """RPC consumer for one queue/handler.
+
+    Up to ``prefetch_count`` messages are delivered at once and at most
+    ``max_concurrency`` handlers run concurrently (a per-handler semaphore);
+    the rest wait locally. Every message is acked individually and only after
+    its reply is published. ``stop()`` cancels the consumer, requeues messages
+    that have not started and waits for running handlers to finish.
+    """
+
     def __init__(
         self,
         conn: AbstractRobustConnection,
@@ -19,6 +35,11 @@ class RpcServer:
         handler: Callable[[dict, dict], Awaitable[dict]],
         prefetch_count: int = 1,
         required_api_key: Optional[str] = None,
+        ewma_alpha: float = 0.2,
+        cancel_registry: Optional[CancelRegistry] = None,
+        max_concurrency: Optional[int] = None,
+        compress_threshold: int = 0,
+        backlog_ttl_s: float = 1.0,
     ) -> None:
         self._conn = conn
         self._exchange_name = exchange_name
@@ -27,12 +48,64 @@ class RpcServer:
         self._handler = handler
         self._prefetch_count = prefetch_count
         self._required_api_key = required_api_key
+        self._cancel_registry = cancel_registry
+        self._max_concurrency = max_concurrency or prefetch_count
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._compress_threshold = compress_threshold
+
+        # Admission control: smoothed handler duration, messages being handled
+        # and messages delivered but waiting for a handler slot.
+        self._ewma_alpha = ewma_alpha
+        self._service_time_s: Optional[float] = None
+        self._last_done = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        # Messages still in the broker queue, per consumer: the local counters
+        # only see the prefetched ones. Read at most every ``backlog_ttl_s``.
+        self._backlog_ttl_s = backlog_ttl_s
+        self._backlog = 0
+        self._backlog_at = 0.0
+
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+        self._stopping = False
 
         # Keep strong refs (helps observability and avoids accidental GC/close).
         self._channel: Optional[aio_pika.abc.AbstractRobustChannel] = None
         self._queue: Optional[aio_pika.abc.AbstractRobustQueue] = None
         self._consumer_tag: Optional[str] = None
 
+    def predicted_wait_s(self) -> float:
+        """Expected time until a newly delivered message is answered."""
+        if self._service_time_s is None:
+            return 0.0
+        ahead = self._in_flight + self._waiting + self._backlog
+        if ahead == 0 and time.monotonic() - self._last_done > self._service_time_s:
+            # Idle long enough for the estimate to be stale: let one through
+            # to re-measure instead of shedding forever on an old spike.
+            return 0.0
+        return (1 + ahead // self._max_concurrency) * self._service_time_s
+
+    async def _refresh_backlog(self) -> None:
+        now = time.monotonic()
+        if self._channel is None or now - self._backlog_at < self._backlog_ttl_s:
+            return
+        # Set before the await so concurrent deliveries do not all declare.
+        self._backlog_at = now
+        try:
+            queue = await self._channel.declare_queue(self._queue_name, passive=True)
+        except Exception:
+            logger.debug("Queue depth unavailable", exc_info=True, extra={"trace_id": "", "queue": self._queue_name})
+            return
+        result = queue.declaration_result
+        self._backlog = result.message_count // max(result.consumer_count, 1)
+
+    def _observe(self, duration_s: float) -> None:
+        self._last_done = time.monotonic()
+        if self._service_time_s is None:
+            self._service_time_s = duration_s
+        else:
+            self._service_time_s += self._ewma_alpha * (duration_s - self._service_time_s)
+
     async def start(self) -> None:
         channel = await self._conn.channel()
         await channel.set_qos(prefetch_count=self._prefetch_count)
@@ -43,11 +116,75 @@ class RpcServer:
         await queue.bind(exchange, routing_key=self._routing_key)
         self._queue = queue
 
+        async def reply(message: aio_pika.IncomingMessage, result: dict) -> None:
+            # Answer in the caller's content type; compress only if it asked for it.
+            body, content_type, content_encoding = encode(
+                result,
+                preferred_content_type(message.content_type or JSON),
+                self._compress_threshold if accepts_compression(message.headers) else 0,
+            )
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=body,
+                    correlation_id=message.correlation_id,
+                    content_type=content_type,
+                    content_encoding=content_encoding,
+                ),
+                routing_key=message.reply_to,
+            )
+
+        async def process(message: aio_pika.IncomingMessage, trace_id: str, deadline: Optional[float]) -> None:
+            log_extra = {"trace_id": trace_id}
+            cid = message.correlation_id
+            token = self._cancel_registry.register(cid) if self._cancel_registry else None
+            try:
+                if token is not None and token.is_cancelled():
+                    logger.info("Dropping cancelled RPC message", extra=log_extra)
+                    await message.ack()
+                    return
+                if deadline is not None and time.time() >= deadline:
+                    logger.info("Dropping RPC message expired while waiting for a handler slot", extra=log_extra)
+                    await message.ack()
+                    return
+
+                payload = decode(message.body, message.content_type, message.content_encoding)
+                started = time.monotonic()
+                self._in_flight += 1
+                try:
+                    result = await self._handler(payload, {"trace_id": trace_id, "deadline": deadline, "cancel": token})
+                except Exception:
+                    if token is not None and token.is_cancelled():
+                        # The caller abandoned the call; there is no one to report to.
+                        logger.info("RPC handler cancelled", extra=log_extra)
+                        await message.ack()
+                        return
+                    raise
+                finally:
+                    self._in_flight -= 1
+                    if token is None or not token.is_cancelled():
+                        self._observe(time.monotonic() - started)
+
+                if token is not None and token.is_cancelled():
+                    logger.info("RPC handler cancelled", extra=log_extra)
+                else:
+                    await reply(message, result)
+                await message.ack()
+            finally:
+                if self._cancel_registry is not None:
+                    self._cancel_registry.release(cid)
+
         async def on_message(message: aio_pika.IncomingMessage) -> None:
             trace_id = (message.headers or {}).get("x-trace-id", "")
             log_extra = {"trace_id": trace_id}
+            task = asyncio.current_task()
+            if task is not None:
+                self._tasks.add(task)
 
             try:
+                if self._stopping:
+                    await message.nack(requeue=True)
+                    return
+
                 if not message.reply_to or not message.correlation_id:
                     logger.warning("RPC message missing reply_to/correlation_id", extra=log_extra)
                     await message.ack()
@@ -57,33 +194,52 @@ class RpcServer:
                     api_key = (message.headers or {}).get("x-api-key")
                     if api_key != self._required_api_key:
                         logger.warning("Unauthorized RPC call", extra=log_extra)
-                        body = json.dumps({"summary": "Unauthorized", "articles": []}, ensure_ascii=False).encode("utf-8")
-                        await channel.default_exchange.publish(
-                            aio_pika.Message(body=body, correlation_id=message.correlation_id),
-                            routing_key=message.reply_to,
+                        await reply(message, {"summary": "Unauthorized", "articles": []})
+                        await message.ack()
+                        return
+
+                deadline = deadline_from_headers(message.headers)
+                if deadline is not None:
+                    now = time.time()
+                    if now >= deadline:
+                        # The caller has already timed out; nobody reads the reply.
+                        logger.info("Dropping expired RPC message", extra={**log_extra, "late_s": round(now - deadline, 3)})
+                        await message.ack()
+                        return
+                    await self._refresh_backlog()
+                    predicted = self.predicted_wait_s()
+                    if now + predicted > deadline:
+                        logger.warning(
+                            "Shedding RPC message: predicted wait exceeds deadline",
+                            extra={**log_extra, "predicted_s": round(predicted, 3), "left_s": round(deadline - now, 3)},
                         )
+                        await reply(message, OVERLOADED_REPLY)
                         await message.ack()
                         return
 
-                payload = json.loads(message.body.decode("utf-8"))
-                result = await self._handler(payload, {"trace_id": trace_id})
-                body = json.dumps(result, ensure_ascii=False).encode("utf-8")
-                await channel.default_exchange.publish(
-                    aio_pika.Message(body=body, correlation_id=message.correlation_id),
-                    routing_key=message.reply_to,
-                )
-                await message.ack()
+                self._waiting += 1
+                try:
+                    await self._semaphore.acquire()
+                finally:
+                    self._waiting -= 1
+                try:
+                    if self._stopping:
+                        # Not started yet: hand it back to the broker for another instance.
+                        await message.nack(requeue=True)
+                        return
+                    await process(message, trace_id, deadline)
+                finally:
+                    self._semaphore.release()
             except Exception as e:
                 logger.exception("RPC handler failed", extra=log_extra)
                 try:
-                    body = json.dumps({"summary": f"Ошибка обработки запроса: {e}", "articles": []}, ensure_ascii=False).encode("utf-8")
                     if message.reply_to and message.correlation_id:
-                        await channel.default_exchange.publish(
-                            aio_pika.Message(body=body, correlation_id=message.correlation_id),
-                            routing_key=message.reply_to,
-                        )
+                        await reply(message, {"summary": f"Ошибка обработки запроса: {e}", "articles": []})
                 finally:
                     await message.ack()
+            finally:
+                if task is not None:
+                    self._tasks.discard(task)
 
         self._consumer_tag = await queue.consume(on_message)
         logger.info(
@@ -94,5 +250,28 @@ class RpcServer:
                 "exchange": self._exchange_name,
                 "routing_key": self._routing_key,
                 "prefetch": self._prefetch_count,
+                "concurrency": self._max_concurrency,
             },
-        )
\ No newline at end of file
+        )
+
+    async def stop(self, drain_timeout_s: float = 30.0) -> None:
+        """Stop consuming and let running handlers finish (graceful drain)."""
+        self._stopping = True
+        if self._queue is not None and self._consumer_tag is not None:
+            await self._queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+        pending = set(self._tasks)
+        if pending:
+            logger.info("Draining RPC handlers", extra={"trace_id": "", "queue": self._queue_name, "in_flight": len(pending)})
+            _, not_done = await asyncio.wait(pending, timeout=drain_timeout_s)
+            if not_done:
+                logger.warning(
+                    "RPC drain timed out; unacked messages will be redelivered",
+                    extra={"trace_id": "", "queue": self._queue_name, "left": len(not_done)},
+                )
+
+        if self._channel is not None:
+            await self._channel.close()
+            self._channel = None
+        logger.info("RPC server stopped", extra={"trace_id": "", "queue": self._queue_name})
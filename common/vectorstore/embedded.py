@@ -0,0 +1,738 @@
+"""Embedded, in-process vector store with a Qdrant-compatible client subset.
+
+Meant for small deployments, CI and benchmarks: no server, exact search.
+Each collection is a directory with
+
+- ``vectors.bin`` — memory-mapped ``capacity x dim`` matrix (float32/float16),
+  rows L2-normalized so cosine similarity is a dot product;
+- ``payloads.jsonl`` — append-only log of ``{"row", "id", "payload"}``
+  (``payload: null`` marks a deleted row), replayed into columns on open;
+- ``meta.json`` — dimension, dtype, capacity and payload index schema.
+
+Payloads are kept as columns; keyword fields get inverted indexes and
+integer fields a NumPy column, so filters become boolean masks. Search is a
+blockwise matmul over the masked rows plus ``argpartition`` top-k.
+
+Only the client methods used by this project are implemented. The store is
+single-writer: a writer holds an exclusive ``flock`` on the collection
+directory, and a second one fails to open it. A read-only client stats ``meta.json`` and ``payloads.jsonl``
+on every call and applies what the writer appended since: new log records,
+and a remap of the vectors when the capacity grew.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from qdrant_client.http import models as qm
+
+
+DEFAULT_KEYWORD_FIELDS = ("article_id", "author_norm", "pub_day", "topics_norm")
+DEFAULT_INTEGER_FIELDS = ("chunk_id", "pub_epoch_day")
+
+_BLOCK_ROWS = 65536
+_INITIAL_CAPACITY = 1024
+
+
+def _values(v: Any) -> Iterable[Any]:
+    # Qdrant matches a list payload value if any element matches.
+    return v if isinstance(v, list) else (v,)
+
+
+def _point_id(pid: Any) -> Union[str, int]:
+    return pid if isinstance(pid, int) else str(pid)
+
+
+def _project(payload: Dict[str, Any], with_payload: Any) -> Optional[Dict[str, Any]]:
+    if with_payload is True:
+        return payload
+    if not with_payload:
+        return None
+    if isinstance(with_payload, qm.PayloadSelectorInclude):
+        fields = with_payload.include
+    elif isinstance(with_payload, qm.PayloadSelectorExclude):
+        return {k: v for k, v in payload.items() if k not in set(with_payload.exclude)}
+    else:
+        fields = with_payload
+    return {k: payload[k] for k in fields if k in payload}
+
+
+class _RWLock:
+    """Many readers or one writer; a waiting writer blocks new readers."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _Collection:
+    def __init__(self, path: str, read_only: bool) -> None:
+        self._path = path
+        self._read_only = read_only
+        # Reads hold it shared; a reader applying the writer's changes holds it exclusively.
+        self.lock = _RWLock()
+        self._dir_fd: Optional[int] = None
+        if not read_only:
+            self._lock_dir()
+        meta_path = os.path.join(path, "meta.json")
+        log_path = os.path.join(path, "payloads.jsonl")
+        self._meta_mtime_ns = os.stat(meta_path).st_mtime_ns
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim: int = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.capacity: int = meta["capacity"]
+        self.keyword_fields = set(meta["keyword_fields"])
+        self.integer_fields = set(meta["integer_fields"])
+
+        self._vectors = self._map(self.capacity)
+        self.ids: List[Union[str, int]] = []
+        self.payloads: List[Optional[Dict[str, Any]]] = []
+        self.row_of: Dict[Union[str, int], int] = {}
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.keyword_index: Dict[str, Dict[Any, set]] = {f: {} for f in self.keyword_fields}
+        self.integer_columns: Dict[str, np.ndarray] = {f: np.full(self.capacity, np.nan) for f in self.integer_fields}
+
+        # Bytes of payloads.jsonl applied, and its size when last looked at.
+        self._log_offset = 0
+        self._log_size = 0
+        if os.path.exists(log_path):
+            self._log_size = os.path.getsize(log_path)
+            self._tail()
+        if not read_only and self._log_size > self._log_offset:
+            # A write interrupted mid-line; appending after it would corrupt the next record.
+            with open(log_path, "r+b") as f:
+                f.truncate(self._log_offset)
+        self._log = None if read_only else open(log_path, "a", encoding="utf-8")
+
+    def _lock_dir(self) -> None:
+        # Single writer per collection, across processes: a second writer would
+        # truncate the first one's record in flight and assign rows from its
+        # own stale state. Released when the process exits.
+        fd = os.open(self._path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise RuntimeError(f"Embedded collection {self._path} is open for writing by another process") from None
+        self._dir_fd = fd
+
+    def _map(self, capacity: int) -> np.memmap:
+        return np.memmap(
+            os.path.join(self._path, "vectors.bin"),
+            dtype=self.dtype,
+            mode="r" if self._read_only else "r+",
+            shape=(capacity, self.dim),
+        )
+
+    def _tail(self) -> None:
+        """Apply the records appended to ``payloads.jsonl`` since the last call.
+
+        Stops at an unterminated last line (a write in progress or cut short
+        by a crash) and, for a reader, at a row beyond the capacity read from
+        ``meta.json`` (the writer grew the collection after it was read); the
+        next call continues from there.
+        """
+        with open(os.path.join(self._path, "payloads.jsonl"), "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    rec = json.loads(line)
+                    if self._read_only and rec["row"] >= self.capacity:
+                        break
+                    self._apply(rec["row"], rec["id"], rec["payload"])
+                self._log_offset += len(line)
+
+    def refresh(self) -> bool:
+        """Reader: catch up with the writer; False if the collection must be reopened.
+
+        Two ``os.stat`` calls when nothing changed. Otherwise applies only the
+        appended payload records, remaps the vectors if the capacity grew and
+        indexes fields added since; a smaller capacity or a shorter log means
+        the collection was recreated.
+        """
+        try:
+            meta_mtime_ns = os.stat(os.path.join(self._path, "meta.json")).st_mtime_ns
+            log_size = os.stat(os.path.join(self._path, "payloads.jsonl")).st_size
+        except FileNotFoundError:
+            return False
+        if meta_mtime_ns == self._meta_mtime_ns and log_size == self._log_size:
+            return True
+        if log_size < self._log_offset:
+            return False
+        with self.lock.exclusive():
+            if meta_mtime_ns != self._meta_mtime_ns:
+                with open(os.path.join(self._path, "meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                if meta["dim"] != self.dim or meta["dtype"] != self.dtype.name or meta["capacity"] < self.capacity:
+                    return False
+                if meta["capacity"] > self.capacity:
+                    self._extend(meta["capacity"])
+                for field in set(meta["keyword_fields"]) - self.keyword_fields:
+                    self.add_index(field, "keyword")
+                for field in set(meta["integer_fields"]) - self.integer_fields:
+                    self.add_index(field, "integer")
+                self._meta_mtime_ns = meta_mtime_ns
+            self._log_size = log_size
+            self._tail()
+        return True
+
+    @staticmethod
+    def create(path: str, dim: int, dtype: str, keyword_fields: Sequence[str], integer_fields: Sequence[str]) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.memmap(os.path.join(path, "vectors.bin"), dtype=np.dtype(dtype), mode="w+", shape=(_INITIAL_CAPACITY, dim)).flush()
+        _Collection._write_meta(path, {
+            "dim": dim,
+            "dtype": dtype,
+            "capacity": _INITIAL_CAPACITY,
+            "keyword_fields": list(keyword_fields),
+            "integer_fields": list(integer_fields),
+        })
+
+    @staticmethod
+    def _write_meta(path: str, meta: Dict[str, Any]) -> None:
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def _save_meta(self) -> None:
+        self._write_meta(self._path, {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "capacity": self.capacity,
+            "keyword_fields": sorted(self.keyword_fields),
+            "integer_fields": sorted(self.integer_fields),
+        })
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.ids)
+
+    # --- payload columns and indexes -------------------------------------
+
+    def _unindex(self, row: int) -> None:
+        old = self.payloads[row]
+        if old is None:
+            return
+        for field, index in self.keyword_index.items():
+            for v in _values(old.get(field)):
+                rows = index.get(v)
+                if rows is not None:
+                    rows.discard(row)
+        for col in self.integer_columns.values():
+            col[row] = np.nan
+
+    def _index(self, row: int, payload: Dict[str, Any]) -> None:
+        for field, index in self.keyword_index.items():
+            for v in _values(payload.get(field)):
+                if v is not None:
+                    index.setdefault(v, set()).add(row)
+        for field, col in self.integer_columns.items():
+            v = payload.get(field)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                col[row] = v
+
+    def _apply(self, row: int, pid: Union[str, int], payload: Optional[Dict[str, Any]]) -> None:
+        if row == len(self.ids):
+            self.ids.append(pid)
+            self.payloads.append(None)
+        else:
+            self._unindex(row)
+        self.row_of[pid] = row
+        self.payloads[row] = payload
+        self.alive[row] = payload is not None
+        if payload is None:
+            self.row_of.pop(pid, None)
+        else:
+            self._index(row, payload)
+
+    def add_index(self, field: str, schema: Any) -> None:
+        kind = getattr(schema, "value", schema)
+        if kind == "keyword" and field not in self.keyword_fields:
+            self.keyword_fields.add(field)
+            self.keyword_index[field] = {}
+        elif kind in ("integer", "float") and field not in self.integer_fields:
+            self.integer_fields.add(field)
+            self.integer_columns[field] = np.full(self.capacity, np.nan)
+        else:
+            return
+        for row, payload in enumerate(self.payloads):
+            if payload is not None:
+                self._unindex(row)
+                self._index(row, payload)
+        if not self._read_only:
+            self._save_meta()
+
+    # --- writes -----------------------------------------------------------
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self._vectors.flush()
+        del self._vectors
+        with open(os.path.join(self._path, "vectors.bin"), "r+b") as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._extend(capacity)
+        self._save_meta()
+
+    def _extend(self, capacity: int) -> None:
+        self._vectors = self._map(capacity)
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - self.capacity, dtype=bool)])
+        for field, col in self.integer_columns.items():
+            self.integer_columns[field] = np.concatenate([col, np.full(capacity - self.capacity, np.nan)])
+        self.capacity = capacity
+
+    def upsert(self, points: Sequence[qm.PointStruct]) -> None:
+        if not points:
+            return
+        self._grow(self.n_rows + len(points))
+        vecs = np.asarray([p.vector for p in points], dtype=np.float32)
+        if vecs.ndim != 2 or vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}")
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        for p, vec in zip(points, vecs):
+            pid = _point_id(p.id)
+            row = self.row_of.get(pid, self.n_rows)
+            payload = p.payload or {}
+            self._vectors[row] = vec
+            self._apply(row, pid, payload)
+            self._log.write(json.dumps({"row": row, "id": pid, "payload": payload}, ensure_ascii=False) + "\n")
+        self._vectors.flush()
+        self._log.flush()
+        self._save_meta()
+
+    def set_payload(self, rows: Iterable[int], payload: Dict[str, Any]) -> None:
+        """Merge ``payload`` into existing rows (vectors untouched)."""
+        for row in rows:
+            pid = self.ids[row]
+            merged = {**(self.payloads[row] or {}), **payload}
+            self._apply(row, pid, merged)
+            self._log.write(json.dumps({"row": row, "id": pid, "payload": merged}, ensure_ascii=False) + "\n")
+        self._log.flush()
+
+    def delete(self, rows: Iterable[int]) -> None:
+        for row in rows:
+            pid = self.ids[row]
+            self._apply(row, pid, None)
+            self._log.write(json.dumps({"row": row, "id": pid, "payload": None}) + "\n")
+        self._log.flush()
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._vectors.flush()
+        if self._dir_fd is not None:
+            os.close(self._dir_fd)
+            self._dir_fd = None
+
+    # --- reads ------------------------------------------------------------
+
+    def vector(self, row: int) -> List[float]:
+        return np.asarray(self._vectors[row], dtype=np.float32).tolist()
+
+    def _match_mask(self, field: str, wanted: List[Any]) -> np.ndarray:
+        n = self.n_rows
+        mask = np.zeros(n, dtype=bool)
+        index = self.keyword_index.get(field)
+        if index is not None:
+            for v in wanted:
+                rows = index.get(v)
+                if rows:
+                    mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            return mask
+        if field in self.integer_columns:
+            return np.isin(self.integer_columns[field][:n], wanted)
+        wanted_set = set(wanted)
+        for row, payload in enumerate(self.payloads):
+            if payload is not None and any(v in wanted_set for v in _values(payload.get(field))):
+                mask[row] = True
+        return mask
+
+    def _range_mask(self, field: str, rng: qm.Range) -> np.ndarray:
+        n = self.n_rows
+        col = self.integer_columns.get(field)
+        if col is None:
+            col = np.array([
+                p.get(field) if p is not None and isinstance(p.get(field), (int, float)) else np.nan
+                for p in self.payloads
+            ], dtype=np.float64)
+        col = col[:n]
+        mask = ~np.isnan(col)
+        if rng.lt is not None:
+            mask &= col < rng.lt
+        if rng.lte is not None:
+            mask &= col <= rng.lte
+        if rng.gt is not None:
+            mask &= col > rng.gt
+        if rng.gte is not None:
+            mask &= col >= rng.gte
+        return mask
+
+    def _condition_mask(self, cond: Any) -> np.ndarray:
+        if isinstance(cond, qm.Filter):
+            return self.filter_mask(cond)
+        if isinstance(cond, qm.HasIdCondition):
+            mask = np.zeros(self.n_rows, dtype=bool)
+            rows = [self.row_of[_point_id(i)] for i in cond.has_id if _point_id(i) in self.row_of]
+            mask[rows] = True
+            return mask
+        if isinstance(cond, qm.FieldCondition):
+            if cond.match is not None:
+                if isinstance(cond.match, qm.MatchValue):
+                    return self._match_mask(cond.key, [cond.match.value])
+                if isinstance(cond.match, qm.MatchAny):
+                    return self._match_mask(cond.key, list(cond.match.any))
+                if isinstance(cond.match, qm.MatchExcept):
+                    return ~self._match_mask(cond.key, list(cond.match.except_))
+            if cond.range is not None:
+                return self._range_mask(cond.key, cond.range)
+        raise ValueError(f"Unsupported filter condition: {cond!r}")
+
+    def filter_mask(self, flt: Optional[qm.Filter]) -> np.ndarray:
+        mask = self.alive[:self.n_rows].copy()
+        if flt is None:
+            return mask
+        for cond in flt.must or []:
+            mask &= self._condition_mask(cond)
+        for cond in flt.must_not or []:
+            mask &= ~self._condition_mask(cond)
+        if flt.should:
+            any_should = np.zeros(self.n_rows, dtype=bool)
+            for cond in flt.should:
+                any_should |= self._condition_mask(cond)
+            mask &= any_should
+        return mask
+
+    def scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of ``query`` (normalized) against ``rows``, blockwise."""
+        out = np.empty(len(rows), dtype=np.float32)
+        contiguous = len(rows) == self.n_rows  # no filter: stream the matrix in order
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, len(rows))
+            block = self._vectors[start:end] if contiguous else self._vectors[rows[start:end]]
+            out[start:end] = np.asarray(block, dtype=np.float32) @ query
+        return out
+
+
+class EmbeddedVectorStore:
+    """Drop-in for the ``QdrantClient`` methods used by the indexer and rag-service.
+
+    ``path`` holds one directory per collection. Writers must be a single
+    process; ``read_only=True`` opens collections without write access.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = "float32",
+        read_only: bool = False,
+        keyword_fields: Sequence[str] = DEFAULT_KEYWORD_FIELDS,
+        integer_fields: Sequence[str] = DEFAULT_INTEGER_FIELDS,
+    ) -> None:
+        if np.dtype(dtype) not in (np.float32, np.float16):
+            raise ValueError("dtype must be float32 or float16")
+        self._path = path
+        self._dtype = np.dtype(dtype).name
+        self._read_only = read_only
+        self._keyword_fields = tuple(keyword_fields)
+        self._integer_fields = tuple(integer_fields)
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.RLock()
+
+    def _collection(self, name: str) -> _Collection:
+        col = self._collections.get(name)
+        if col is not None and self._read_only and not col.refresh():
+            # Recreated by the writer; calls already running finish on the old object.
+            with self._lock:
+                if self._collections.get(name) is col:
+                    del self._collections[name]
+            col = None
+        if col is not None:
+            return col
+        if not self._read_only:
+            with self._lock:
+                col = self._collections.get(name)
+                if col is None:
+                    col = self._collections[name] = self._open(name)
+            return col
+        # A reader replays the log outside the store lock, so calls on other
+        # collections are not held up; a concurrent open of the same one loses.
+        col = self._open(name)
+        with self._lock:
+            return self._collections.setdefault(name, col)
+
+    def _open(self, name: str) -> _Collection:
+        if not self.collection_exists(name):
+            raise ValueError(f"Collection {name} not found")
+        return _Collection(os.path.join(self._path, name), self._read_only)
+
+    @contextmanager
+    def _reading(self, name: str) -> Iterator[_Collection]:
+        col = self._collection(name)
+        with col.lock.shared():
+            yield col
+
+    # --- collections ------------------------------------------------------
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._path, collection_name, "meta.json"))
+
+    def create_collection(self, collection_name: str, vectors_config: qm.VectorParams, **kwargs: Any) -> bool:
+        if self._read_only:
+            raise PermissionError("Embedded vector store is read-only")
+        if vectors_config.distance != qm.Distance.COSINE:
+            raise ValueError("Embedded vector store supports cosine distance only")
+        with self._lock:
+            _Collection.create(
+                os.path.join(self._path, collection_name),
+                vectors_config.size,
+                self._dtype,
+                self._keyword_fields,
+                self._integer_fields,
+            )
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: Any = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._collection(collection_name).add_index(field_name, field_schema)
+
+    def count(self, collection_name: str, count_filter: Optional[qm.Filter] = None, exact: bool = True, **kwargs: Any) -> qm.CountResult:
+        with self._reading(collection_name) as col:
+            return qm.CountResult(count=int(col.filter_mask(count_filter).sum()))
+
+    # --- points -----------------------------------------------------------
+
+    def upsert(self, collection_name: str, points: Sequence[qm.PointStruct], **kwargs: Any) -> qm.UpdateResult:
+        if self._read_only:
+            raise PermissionError("Embedded vector store is read-only")
+        with self._lock:
+            self._collection(collection_name).upsert(points)
+        return qm.UpdateResult(operation_id=None, status=qm.UpdateStatus.COMPLETED)
+
+    @staticmethod
+    def _selected_rows(col: _Collection, selector: Any) -> List[int]:
+        if isinstance(selector, qm.FilterSelector):
+            return np.nonzero(col.filter_mask(selector.filter))[0].tolist()
+        if isinstance(selector, qm.Filter):
+            return np.nonzero(col.filter_mask(selector))[0].tolist()
+        ids = selector.points if isinstance(selector, qm.PointIdsList) else selector
+        return [col.row_of[_point_id(i)] for i in ids if _point_id(i) in col.row_of]
+
+    def delete(self, collection_name: str, points_selector: Any, **kwargs: Any) -> qm.UpdateResult:
+        if self._read_only:
+            raise PermissionError("Embedded vector store is read-only")
+        with self._lock:
+            col = self._collection(collection_name)
+            col.delete(self._selected_rows(col, points_selector))
+        return qm.UpdateResult(operation_id=None, status=qm.UpdateStatus.COMPLETED)
+
+    def set_payload(self, collection_name: str, payload: Dict[str, Any], points: Any, **kwargs: Any) -> qm.UpdateResult:
+        if self._read_only:
+            raise PermissionError("Embedded vector store is read-only")
+        with self._lock:
+            col = self._collection(collection_name)
+            col.set_payload(self._selected_rows(col, points), payload)
+        return qm.UpdateResult(operation_id=None, status=qm.UpdateStatus.COMPLETED)
+
+    def _top(self, col: _Collection, query: Sequence[float], qfilter: Optional[qm.Filter], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = np.asarray(query, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        mask = col.filter_mask(qfilter)
+        rows = np.nonzero(mask)[0]
+        if len(rows) == 0 or k <= 0:
+            return rows[:0], np.empty(0, dtype=np.float32)
+        scores = col.scores(rows, q)
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return rows[order], scores[order]
+
+    def _scored(self, col: _Collection, row: int, score: float, with_payload: Any, with_vectors: bool) -> qm.ScoredPoint:
+        return qm.ScoredPoint(
+            id=col.ids[row],
+            version=0,
+            score=float(score),
+            payload=_project(col.payloads[row], with_payload),
+            vector=col.vector(row) if with_vectors else None,
+        )
+
+    def search(
+        self,
+        collection_name: str,
+        query_vector: Sequence[float],
+        query_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[qm.ScoredPoint]:
+        with self._reading(collection_name) as col:
+            rows, scores = self._top(col, query_vector, query_filter, limit)
+            return [
+                self._scored(col, r, s, with_payload, with_vectors)
+                for r, s in zip(rows.tolist(), scores.tolist())
+                if score_threshold is None or s >= score_threshold
+            ]
+
+    def search_batch(self, collection_name: str, requests: Sequence[qm.SearchRequest], **kwargs: Any) -> List[List[qm.ScoredPoint]]:
+        return [
+            self.search(
+                collection_name,
+                r.vector,
+                query_filter=r.filter,
+                limit=r.limit,
+                with_payload=r.with_payload if r.with_payload is not None else False,
+                with_vectors=bool(r.with_vector),
+                score_threshold=r.score_threshold,
+            )
+            for r in requests
+        ]
+
+    def search_groups(
+        self,
+        collection_name: str,
+        query_vector: Sequence[float],
+        group_by: str,
+        query_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        group_size: int = 1,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        **kwargs: Any,
+    ) -> qm.GroupsResult:
+        with self._reading(collection_name) as col:
+            n_candidates = int(col.filter_mask(query_filter).sum())
+            # Widen the top-k window until enough groups are filled or rows run out.
+            k = max(limit * group_size * 4, 64)
+            while True:
+                rows, scores = self._top(col, query_vector, query_filter, k)
+                groups: Dict[Any, List[qm.ScoredPoint]] = {}
+                for r, s in zip(rows.tolist(), scores.tolist()):
+                    key = col.payloads[r].get(group_by)
+                    if key is None or isinstance(key, list):
+                        continue
+                    hits = groups.get(key)
+                    if hits is None:
+                        if len(groups) >= limit:
+                            continue
+                        hits = groups[key] = []
+                    if len(hits) < group_size:
+                        hits.append(self._scored(col, r, s, with_payload, with_vectors))
+                full = sum(len(h) >= group_size for h in groups.values())
+                if full >= limit or k >= n_candidates:
+                    break
+                k *= 4
+            return qm.GroupsResult(groups=[qm.PointGroup(id=key, hits=hits) for key, hits in groups.items()])
+
+    def retrieve(
+        self,
+        collection_name: str,
+        ids: Sequence[Any],
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        **kwargs: Any,
+    ) -> List[qm.Record]:
+        with self._reading(collection_name) as col:
+            out = []
+            for pid in ids:
+                row = col.row_of.get(_point_id(pid))
+                if row is not None:
+                    out.append(qm.Record(
+                        id=col.ids[row],
+                        payload=_project(col.payloads[row], with_payload),
+                        vector=col.vector(row) if with_vectors else None,
+                    ))
+            return out
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter: Optional[qm.Filter] = None,
+        limit: int = 10,
+        offset: Optional[int] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+        **kwargs: Any,
+    ) -> Tuple[List[qm.Record], Optional[int]]:
+        """Rows in insertion order; ``offset`` is the row to continue from."""
+        with self._reading(collection_name) as col:
+            rows = np.nonzero(col.filter_mask(scroll_filter))[0]
+            if offset is not None:
+                rows = rows[rows >= int(offset)]
+            page, rest = rows[:limit].tolist(), rows[limit:limit + 1]
+            records = [
+                qm.Record(
+                    id=col.ids[r],
+                    payload=_project(col.payloads[r], with_payload),
+                    vector=col.vector(r) if with_vectors else None,
+                )
+                for r in page
+            ]
+            return records, (int(rest[0]) if len(rest) else None)
+
+    def close(self, **kwargs: Any) -> None:
+        with self._lock:
+            for col in self._collections.values():
+                col.close()
+            self._collections.clear()
+
+
+class AsyncEmbeddedVectorStore:
+    """``AsyncQdrantClient``-shaped wrapper: runs store calls in worker threads."""
+
+    def __init__(self, store: EmbeddedVectorStore) -> None:
+        self._store = store
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._store, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
@@ -0,0 +1,41 @@
+from collections import Counter
+from typing import Any, Dict, List
+
+
+class FacetCatalogBuilder:
+    """Counts articles per normalized author, topic and publication day.
+
+    Fed once per article during indexing; ``build`` returns the compact catalog
+    payload described in ``common.contracts.catalog``.
+    """
+
+    def __init__(self) -> None:
+        self._articles = 0
+        self._authors: Counter = Counter()
+        self._topics: Counter = Counter()
+        self._days: Counter = Counter()
+        self._labels: Dict[str, Dict[str, str]] = {"authors": {}, "topics": {}}
+
+    def add(self, author: str, author_norm: str, topics: List[str], topics_norm: List[str], day: str) -> None:
+        self._articles += 1
+        if author_norm:
+            self._authors[author_norm] += 1
+            self._labels["authors"].setdefault(author_norm, author)
+        for label, norm in zip(topics, topics_norm):
+            self._topics[norm] += 1
+            self._labels["topics"].setdefault(norm, label)
+        if day:
+            self._days[day] += 1
+
+    def build(self, version: str) -> Dict[str, Any]:
+        def entries(kind: str, counts: Counter) -> List[List[Any]]:
+            labels = self._labels[kind]
+            return [[norm, labels[norm], n] for norm, n in counts.most_common()]
+
+        return {
+            "version": version,
+            "articles": self._articles,
+            "authors": entries("authors", self._authors),
+            "topics": entries("topics", self._topics),
+            "days": [[day, n] for day, n in sorted(self._days.items())],
+        }
@@ -12,17 +12,21 @@ if _ROOT not in sys.path:
     sys.path.insert(0, _ROOT)
 
 import logging
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Set
 
 from qdrant_client.http.models import PointStruct
 
 from common.config import AppSettings
 from common.logging import setup_logging
+from common.vectorstore.embedded import EmbeddedVectorStore
 
 from indexer_service.csv_loader import CsvDirectoryLoader
-from indexer_service.normalizer import norm_text, norm_key, parse_topics, to_pub_day
+from indexer_service.normalizer import norm_text, norm_key, parse_topics, to_epoch_day, to_pub_day
 from indexer_service.chunker import SimpleChunker
 from indexer_service.embedder import Embedder
+from indexer_service.facets import FacetCatalogBuilder
+from indexer_service.manifest import IndexManifest, content_hash
 from indexer_service.qdrant_repo import QdrantRepository
 
 
@@ -41,27 +45,80 @@ def run() -> None:
         port=settings.qdrant_port,
         collection=settings.qdrant_collection,
         vector_size=embedder.vector_size(),
+        client=(
+            EmbeddedVectorStore(settings.vector_store_path, dtype=settings.vector_store_dtype)
+            if settings.vector_backend == "embedded"
+            else None
+        ),
     )
-    repo.ensure_collection()
+    manifest = IndexManifest(settings.index_manifest_path)
+    started_at = datetime.now(timezone.utc)
+    # Identifies this run in the manifest ("rev"): which articles it (re)wrote.
+    rev = started_at.isoformat()
+
+    # Blue/green: build a new collection version next to the live one and
+    # switch the alias at the end, so searches never see a half-built index.
+    blue_green = settings.index_blue_green and settings.vector_backend != "embedded"
+    if settings.index_blue_green and not blue_green:
+        logger.warning("Blue/green indexing needs Qdrant; indexing in place", extra={"trace_id": ""})
+    # Collection whose points unchanged articles are copied from (blue/green only).
+    source = None
+    if blue_green:
+        source = repo.live_collection()
+        target = repo.begin_version(started_at.strftime("%Y%m%dT%H%M%S"))
+        logger.info("Building collection version", extra={"trace_id": "", "collection": target, "live": source})
+        if source is None and len(manifest):
+            logger.info("No live collection, ignoring existing manifest", extra={"trace_id": "", "articles": len(manifest)})
+            manifest.clear()
+    elif repo.ensure_collection() and len(manifest):
+        # A fresh collection has none of the manifest's articles.
+        logger.info("Collection created, ignoring existing manifest", extra={"trace_id": "", "articles": len(manifest)})
+        manifest.clear()
+    # Anything that changes the points of an unchanged article forces a rewrite.
+    build_key = f"{settings.embed_model}|{settings.chunk_size}|{settings.chunk_overlap}"
 
     chunker = SimpleChunker(chunk_size=settings.chunk_size, overlap=settings.chunk_overlap)
 
     batch_texts: List[str] = []
     batch_points: List[PointStruct] = []
+    batch_articles: Dict[str, Dict[str, Any]] = {}
 
     def flush() -> None:
-        nonlocal batch_texts, batch_points
+        nonlocal batch_texts, batch_points, batch_articles
         if not batch_texts:
             return
         vecs = embedder.embed_passages(batch_texts)
         for i, p in enumerate(batch_points):
             p.vector = vecs[i].tolist()
         repo.upsert(batch_points)
-        logger.info("Upserted batch", extra={"trace_id": "", "count": len(batch_points)})
-        batch_texts, batch_points = [], []
+        repo.upsert_articles(batch_articles)
+        logger.info("Upserted batch", extra={"trace_id": "", "count": len(batch_points), "articles": len(batch_articles)})
+        batch_texts, batch_points, batch_articles = [], [], {}
+        manifest.commit()
+
+    # Unchanged articles waiting to be copied from the live version (blue/green).
+    carry: List[str] = []
+    seen: Set[str] = set()
+
+    def copy_carried() -> None:
+        nonlocal carry, count_copied
+        if not carry:
+            return
+        found = repo.copy_articles(source, carry)
+        missing = set(carry) - found
+        if missing:
+            # The manifest promised points the live version does not have;
+            # forgetting them makes the next run embed them again.
+            logger.warning("Unchanged articles missing in live collection", extra={"trace_id": "", "count": len(missing)})
+            seen.difference_update(missing)
+        count_copied += len(found)
+        carry = []
 
     count_articles = 0
     count_chunks = 0
+    count_skipped = 0
+    count_copied = 0
+    facets = FacetCatalogBuilder()
 
     for art in loader.iter_articles():
         title = norm_text(art.title)
@@ -80,27 +137,54 @@ def run() -> None:
         except Exception:
             # fallback: take first 10 chars if looks like YYYY-MM-DD
             day = pub_date[:10] if len(pub_date) >= 10 else ""
+        epoch_day = to_epoch_day(day)
 
         article_id = repo.article_id_from_url(url)
         topics, topics_norm, subtopic_raw = parse_topics(subtopic)
+        facets.add(author, norm_key(author), topics, topics_norm, day)
+        count_articles += 1
+        seen.add(article_id)
+
+        digest = content_hash(build_key, title, author, platform, url, pub_date, subtopic, content)
+        if manifest.is_current(article_id, digest):
+            count_skipped += 1
+            if source is not None:
+                carry.append(article_id)
+                if len(carry) >= 64:
+                    copy_carried()
+            continue
 
         chunks = chunker.split(content)
+        previous = manifest.get(article_id)
+        if not blue_green and previous is not None and previous.get("chunks", 0) > len(chunks):
+            # Point ids are per chunk, so a shorter article would keep serving
+            # its old tail; a blue/green version starts empty.
+            repo.delete_chunks_from(article_id, len(chunks))
+        # Shown metadata is stored once per article; chunks keep what search
+        # filters on (common.contracts.articles).
+        batch_articles[article_id] = {
+            "title": title,
+            "author": author,
+            "platform": platform,
+            "url": url,
+            "pub_date": pub_date,
+            "pub_day": day,
+            "topics": topics,
+            "subtopic_raw": subtopic_raw,
+            "chunks": len(chunks),
+        }
         for chunk_id, chunk_text in enumerate(chunks):
-            point_id = repo.article_id_from_url(url)
+            # One point per chunk; an id derived from the URL alone made every
+            # chunk overwrite the previous one.
+            point_id = repo.chunk_point_id(url, chunk_id)
             payload = {
                 "article_id": article_id,
-                "title": title,
-                "author": author,
+                "chunk_id": chunk_id,
+                "text": chunk_text,
                 "author_norm": norm_key(author),
-                "platform": platform,
-                "url": url,
-                "pub_date": pub_date,
                 "pub_day": day,
-                "topics": topics,
+                "pub_epoch_day": epoch_day,
                 "topics_norm": topics_norm,
-                "subtopic_raw": subtopic_raw,
-                "chunk_id": chunk_id,
-                "text": chunk_text,
             }
             batch_texts.append(chunk_text)
             batch_points.append(PointStruct(id=point_id, vector=[], payload=payload))
@@ -109,12 +193,54 @@ def run() -> None:
             if len(batch_texts) >= settings.upsert_batch_size:
                 flush()
 
-        count_articles += 1
+        manifest.record(article_id, url, digest, len(chunks), rev)
         if count_articles % 200 == 0:
-            logger.info("Progress", extra={"trace_id": "", "articles": count_articles, "chunks": count_chunks})
+            # Checkpoint: everything recorded so far is upserted, so a rerun
+            # after a crash resumes from here.
+            flush()
+            if not blue_green:
+                # A blue/green build is not resumable (each run starts a new
+                # version), and the manifest must describe the live collection.
+                manifest.save()
+            logger.info(
+                "Progress",
+                extra={"trace_id": "", "articles": count_articles, "chunks": count_chunks, "skipped": count_skipped},
+            )
 
     flush()
-    logger.info("Indexing completed", extra={"trace_id": "", "articles": count_articles, "chunks": count_chunks})
+    if blue_green:
+        copy_carried()
+        repo.finish_bulk_load(settings.qdrant_indexing_threshold, settings.index_optimize_timeout_s)
+        repo.swap_alias()
+        # Articles gone from the input are not in the new version.
+        manifest.retain(seen)
+    else:
+        gone = manifest.missing(seen)
+        if gone:
+            repo.delete_articles(gone)
+            logger.info("Deleted articles gone from input", extra={"trace_id": "", "count": len(gone)})
+        manifest.retain(seen)
+    manifest.save()
+    # Published last: rag-service reloads the catalog when its version changes.
+    catalog = facets.build(version=rev)
+    repo.write_catalog(catalog)
+    logger.info(
+        "Facet catalog written",
+        extra={"trace_id": "", "version": catalog["version"], "authors": len(catalog["authors"]), "topics": len(catalog["topics"])},
+    )
+    if blue_green:
+        repo.drop_old_versions(settings.index_keep_versions)
+    logger.info(
+        "Indexing completed",
+        extra={
+            "trace_id": "",
+            "articles": count_articles,
+            "chunks": count_chunks,
+            "skipped": count_skipped,
+            "copied": count_copied,
+            "collection": repo.target,
+        },
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def content_hash(*parts: str) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class IndexManifest:
+    """What is already in the collection, per article.
+
+    ``{article_id: {"url", "hash", "chunks", "rev"}}`` in one JSON file. ``hash``
+    covers everything the article's points are built from, so unchanged
+    articles are skipped on the next run; ``rev`` is the run that last wrote
+    the points and lets later stages (abstracts) see which articles changed.
+
+    Entries are staged with ``record`` and become part of the manifest only on
+    ``commit``, which the caller does after the points are upserted; ``save``
+    writes committed entries atomically.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._articles: Dict[str, Dict[str, Any]] = {}
+        self._staged: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._articles = json.load(f).get("articles", {})
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def get(self, article_id: str) -> Optional[Dict[str, Any]]:
+        return self._articles.get(article_id)
+
+    def is_current(self, article_id: str, digest: str) -> bool:
+        entry = self._articles.get(article_id)
+        return entry is not None and entry.get("hash") == digest
+
+    def clear(self) -> None:
+        self._articles.clear()
+        self._staged.clear()
+
+    def missing(self, article_ids: Iterable[str]) -> List[str]:
+        """Committed articles not in ``article_ids`` (gone from the input)."""
+        keep = set(article_ids)
+        return [aid for aid in self._articles if aid not in keep]
+
+    def retain(self, article_ids: Iterable[str]) -> None:
+        """Drop committed entries not in ``article_ids`` (gone from the input)."""
+        keep = set(article_ids)
+        self._articles = {aid: e for aid, e in self._articles.items() if aid in keep}
+
+    def record(self, article_id: str, url: str, digest: str, chunks: int, rev: str) -> None:
+        self._staged[article_id] = {"url": url, "hash": digest, "chunks": chunks, "rev": rev}
+
+    def commit(self) -> None:
+        self._articles.update(self._staged)
+        self._staged.clear()
+
+    def save(self) -> None:
+        if not self._path:
+            return
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"articles": self._articles}, f, ensure_ascii=False)
+        os.replace(tmp, self._path)
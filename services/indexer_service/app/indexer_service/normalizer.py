@@ -1,6 +1,6 @@
 import re
-from datetime import datetime
-from typing import List, Tuple
+from datetime import date, datetime
+from typing import List, Optional, Tuple
 
 
 def norm_text(s: str) -> str:
@@ -25,3 +25,11 @@ def to_pub_day(pub_date: str) -> str:
     # robust ISO parsing
     dt = datetime.fromisoformat(pub_date.replace("Z", "+00:00"))
     return dt.date().isoformat()
+
+
+def to_epoch_day(day: str) -> Optional[int]:
+    # days since 1970-01-01; integer range index serves date_from/date_to filters
+    try:
+        return (date.fromisoformat(day) - date(1970, 1, 1)).days
+    except ValueError:
+        return None
@@ -1,25 +1,311 @@
+import logging
+import time
 import uuid
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Set
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance, PointStruct
+from qdrant_client.http.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HnswConfigDiff,
+    MatchAny,
+    MatchValue,
+    OptimizersConfigDiff,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    Range,
+    VectorParams,
+)
+
+from common.contracts.articles import articles_collection, split_payload
+from common.contracts.catalog import FACETS_POINT_ID, meta_collection
+
+
+logger = logging.getLogger(__name__)
+
+
+PAYLOAD_INDEXES = (
+    ("article_id", PayloadSchemaType.KEYWORD),
+    ("chunk_id", PayloadSchemaType.INTEGER),
+    ("author_norm", PayloadSchemaType.KEYWORD),
+    ("pub_day", PayloadSchemaType.KEYWORD),
+    ("topics_norm", PayloadSchemaType.KEYWORD),
+    ("pub_epoch_day", PayloadSchemaType.INTEGER),
+)
 
 
 class QdrantRepository:
-    def __init__(self, host: str, port: int, collection: str, vector_size: int) -> None:
-        self._client = QdrantClient(host=host, port=port)
+    """Writes chunk points, article records and the facet catalog.
+
+    ``collection`` is the name rag-service reads; article metadata goes to its
+    article store (``common.contracts.articles``). Normally points go straight
+    into it; in blue/green mode ``begin_version`` creates a versioned
+    collection (``<collection>__v<version>``) that receives the points, and
+    ``swap_alias`` makes ``collection`` an alias of it once it is built.
+    """
+
+    def __init__(self, host: str, port: int, collection: str, vector_size: int, client: Optional[Any] = None) -> None:
+        # ``client``: any QdrantClient-compatible object, e.g. EmbeddedVectorStore.
+        self._client = client if client is not None else QdrantClient(host=host, port=port)
         self._collection = collection
+        self._target = collection
         self._vector_size = vector_size
 
-    def ensure_collection(self) -> None:
-        if not self._client.collection_exists(self._collection):
+    @property
+    def target(self) -> str:
+        return self._target
+
+    def _create_payload_indexes(self) -> None:
+        # rag-service groups search hits by article_id, fetches an article's
+        # first chunks by article_id + chunk_id range and filters by author,
+        # day, topic and pub_epoch_day range; idempotent if they exist.
+        for field, schema in PAYLOAD_INDEXES:
+            self._client.create_payload_index(
+                collection_name=self._target,
+                field_name=field,
+                field_schema=schema,
+            )
+
+    def _ensure_articles(self, name: str) -> None:
+        # One point per article, read by id only: no HNSW graph (m=0).
+        if not self._client.collection_exists(name):
             self._client.create_collection(
-                collection_name=self._collection,
+                collection_name=name,
+                vectors_config=VectorParams(size=1, distance=Distance.COSINE),
+                hnsw_config=HnswConfigDiff(m=0),
+            )
+
+    def ensure_collection(self) -> bool:
+        """Create the collection (and its article store) and payload indexes if missing; True if the collection was created."""
+        created = not self._client.collection_exists(self._target)
+        if created:
+            self._client.create_collection(
+                collection_name=self._target,
                 vectors_config=VectorParams(size=self._vector_size, distance=Distance.COSINE),
             )
+        self._create_payload_indexes()
+        self._ensure_articles(articles_collection(self._target))
+        return created
+
+    # --- blue/green ---
+
+    def _version_prefix(self) -> str:
+        return f"{self._collection}__v"
+
+    def _alias_target(self, alias: str) -> Optional[str]:
+        for a in self._client.get_aliases().aliases:
+            if a.alias_name == alias:
+                return a.collection_name
+        return None
+
+    def resolve_alias(self) -> Optional[str]:
+        """Collection the alias currently points to, or None if there is no alias."""
+        return self._alias_target(self._collection)
+
+    def live_collection(self) -> Optional[str]:
+        """What rag-service reads now: the alias target, a plain collection of that name, or None."""
+        live = self.resolve_alias()
+        if live is None and self._client.collection_exists(self._collection):
+            live = self._collection
+        return live
+
+    def begin_version(self, version: str) -> str:
+        """Create an empty versioned collection (and article store) and direct writes to it.
+
+        HNSW indexing is off (``indexing_threshold=0``) while it is loaded, so
+        the bulk upload does not rebuild the graph segment by segment;
+        ``finish_bulk_load`` turns it back on.
+        """
+        self._target = f"{self._version_prefix()}{version}"
+        self._client.create_collection(
+            collection_name=self._target,
+            vectors_config=VectorParams(size=self._vector_size, distance=Distance.COSINE),
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+        )
+        self._create_payload_indexes()
+        self._ensure_articles(articles_collection(self._target))
+        return self._target
+
+    def finish_bulk_load(self, indexing_threshold: int, timeout_s: float, poll_s: float = 2.0) -> None:
+        """Enable indexing on the new version and wait until the optimizer is done."""
+        self._client.update_collection(
+            collection_name=self._target,
+            optimizer_config=OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+        )
+        deadline = time.monotonic() + timeout_s
+        green = 0
+        while True:
+            # The optimizer starts asynchronously: require two green polls in a row.
+            time.sleep(poll_s)
+            info = self._client.get_collection(self._target)
+            green = green + 1 if info.status == CollectionStatus.GREEN else 0
+            if green >= 2:
+                logger.info(
+                    "Collection optimized",
+                    extra={"trace_id": "", "collection": self._target, "points": info.points_count, "indexed": info.indexed_vectors_count},
+                )
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"collection {self._target} not optimized after {timeout_s}s (status {info.status})")
+
+    def copy_articles(self, source: str, article_ids: List[str]) -> Set[str]:
+        """Copy the points of ``article_ids`` from ``source``; returns the ids found.
+
+        Chunk vectors are reused as is. Article records come from the source's
+        article store; for a source indexed before the split they are taken
+        from the chunk payloads, which are slimmed on the way.
+        """
+        flt = Filter(must=[FieldCondition(key="article_id", match=MatchAny(any=article_ids))])
+        source_articles = articles_collection(source)
+        records: Dict[str, Dict[str, Any]] = {}
+        if self._client.collection_exists(source_articles):
+            for r in self._client.retrieve(collection_name=source_articles, ids=article_ids, with_payload=True, with_vectors=False):
+                records[str(r.id)] = r.payload or {}
+        found: Set[str] = set()
+        offset = None
+        while True:
+            points, offset = self._client.scroll(
+                collection_name=source,
+                scroll_filter=flt,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            slim = []
+            for p in points:
+                chunk, article = split_payload(p.payload or {})
+                aid = str(chunk.get("article_id", ""))
+                found.add(aid)
+                if article and aid not in records:
+                    records[aid] = article
+                slim.append(PointStruct(id=p.id, vector=p.vector, payload=chunk))
+            if slim:
+                self._client.upsert(collection_name=self._target, points=slim)
+            if offset is None:
+                break
+        self.upsert_articles({aid: meta for aid, meta in records.items() if aid in found})
+        return found
+
+    def swap_alias(self) -> Optional[str]:
+        """Point the aliases (chunks and article store) at the new version in one atomic update; returns the previous target."""
+        previous = self.resolve_alias()
+        ops: List[Any] = []
+        pairs = ((self._collection, self._target), (articles_collection(self._collection), articles_collection(self._target)))
+        for alias, target in pairs:
+            if self._alias_target(alias) is not None:
+                ops.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+            elif self._client.collection_exists(alias):
+                # Deployments from before blue/green have a plain collection under
+                # the alias name; it must go first, so this one switch is not atomic.
+                logger.warning("Replacing plain collection with alias", extra={"trace_id": "", "collection": alias})
+                self._client.delete_collection(alias)
+            ops.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias)))
+        self._client.update_collection_aliases(change_aliases_operations=ops)
+        logger.info("Alias switched", extra={"trace_id": "", "alias": self._collection, "collection": self._target, "previous": previous})
+        return previous
+
+    def drop_old_versions(self, keep: int) -> List[str]:
+        """Delete versioned collections except the newest ``keep`` versions (the live one always stays)."""
+        live = self.resolve_alias()
+        prefix = self._version_prefix()
+        names = [c.name for c in self._client.get_collections().collections if c.name.startswith(prefix)]
+        # "<collection>__v<version>" and its "...__articles" share the version.
+        version_of = {name: name[len(prefix):].split("__", 1)[0] for name in names}
+        versions = sorted(set(version_of.values()))
+        live_version = version_of.get(live) if live else None
+        stale_versions = {v for v in versions[:-max(keep, 1)] if v != live_version}
+        stale = sorted(name for name, v in version_of.items() if v in stale_versions)
+        for name in stale:
+            self._client.delete_collection(name)
+        if stale:
+            logger.info("Old collection versions deleted", extra={"trace_id": "", "collections": stale})
+        return stale
 
     @staticmethod
     def article_id_from_url(url: str) -> str:
         return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
 
+    @staticmethod
+    def chunk_point_id(url: str, chunk_id: int) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{url}#{chunk_id}"))
+
     def upsert(self, points: List[PointStruct]) -> None:
-        self._client.upsert(collection_name=self._collection, points=points)
+        self._client.upsert(collection_name=self._target, points=points)
+
+    def delete_chunks_from(self, article_id: str, first_chunk: int) -> None:
+        """Delete an article's chunks with ``chunk_id >= first_chunk`` (left over when it got shorter)."""
+        self._client.delete(
+            collection_name=self._target,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="article_id", match=MatchValue(value=article_id)),
+                FieldCondition(key="chunk_id", range=Range(gte=first_chunk)),
+            ])),
+        )
+
+    def delete_articles(self, article_ids: List[str], batch: int = 256) -> None:
+        """Delete the chunks and article records of ``article_ids``."""
+        for i in range(0, len(article_ids), batch):
+            ids = article_ids[i:i + batch]
+            self._client.delete(
+                collection_name=self._target,
+                points_selector=FilterSelector(filter=Filter(must=[FieldCondition(key="article_id", match=MatchAny(any=ids))])),
+            )
+            self._client.delete(collection_name=articles_collection(self._target), points_selector=PointIdsList(points=ids))
+
+    def upsert_articles(self, records: Dict[str, Dict[str, Any]]) -> None:
+        """Write article records (``article_id`` -> metadata) to the article store."""
+        if records:
+            self._client.upsert(
+                collection_name=articles_collection(self._target),
+                points=[PointStruct(id=aid, vector=[1.0], payload=meta) for aid, meta in records.items()],
+            )
+
+    def iter_points(self, batch: int = 1024, articles: bool = False) -> Iterator[List[Any]]:
+        """All points of the collection, or of its article store (alias resolved), in pages."""
+        name = articles_collection(self._collection) if articles else self._collection
+        if articles and not self._client.collection_exists(name):
+            return
+        offset = None
+        while True:
+            points, offset = self._client.scroll(
+                collection_name=name,
+                limit=batch,
+                offset=offset,
+                with_payload=True,
+                with_vectors=not articles,
+            )
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    def count(self) -> int:
+        return self._client.count(collection_name=self._target, exact=True).count
+
+    def load_catalog(self) -> Optional[Dict[str, Any]]:
+        meta = meta_collection(self._collection)
+        if not self._client.collection_exists(meta):
+            return None
+        pts = self._client.retrieve(collection_name=meta, ids=[FACETS_POINT_ID], with_payload=True, with_vectors=False)
+        return (pts[0].payload or {}) if pts else None
+
+    def write_catalog(self, catalog: Dict[str, Any]) -> None:
+        """Replace the facet catalog point in the ``<collection>__meta`` collection."""
+        meta = meta_collection(self._collection)
+        if not self._client.collection_exists(meta):
+            self._client.create_collection(
+                collection_name=meta,
+                vectors_config=VectorParams(size=1, distance=Distance.COSINE),
+            )
+        self._client.upsert(
+            collection_name=meta,
+            points=[PointStruct(id=FACETS_POINT_ID, vector=[1.0], payload=catalog)],
+        )
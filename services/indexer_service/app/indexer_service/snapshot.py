@@ -0,0 +1,274 @@
+"""Build-and-ship index snapshots.
+
+``export`` dumps the configured collection (Qdrant or the embedded store) into
+one tar file: points with their vectors and payload in parts, the article
+records, the facet catalog, the index manifest and the abstracts state.
+``restore`` loads such a file into the target backend without running the
+embedding model. On Qdrant it builds a new collection version and switches the
+``QDRANT_COLLECTION`` alias, like blue/green indexing.
+
+    # build machine (after a normal indexer run)
+    docker compose run --rm indexer-service python -m indexer_service.snapshot export /snapshots/index.tar
+    # serving host
+    docker compose run --rm indexer-service python -m indexer_service.snapshot restore /snapshots/index.tar
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.http.models import PointStruct
+
+from common.config import AppSettings
+from common.logging import setup_logging
+from common.vectorstore.embedded import EmbeddedVectorStore
+
+from indexer_service.qdrant_repo import QdrantRepository
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+META_NAME = "snapshot.json"
+CATALOG_NAME = "catalog.json"
+MANIFEST_NAME = "index_manifest.json"
+ABSTRACTS_NAME = "abstracts_state.json"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _add(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _read(tar: tarfile.TarFile, name: str) -> Optional[bytes]:
+    try:
+        f = tar.extractfile(name)
+    except KeyError:
+        return None
+    return f.read() if f is not None else None
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _repo(settings: AppSettings, vector_size: int) -> QdrantRepository:
+    return QdrantRepository(
+        host=settings.qdrant_host,
+        port=settings.qdrant_port,
+        collection=settings.qdrant_collection,
+        vector_size=vector_size,
+        client=(
+            EmbeddedVectorStore(settings.vector_store_path, dtype=settings.vector_store_dtype)
+            if settings.vector_backend == "embedded"
+            else None
+        ),
+    )
+
+
+def export(settings: AppSettings, out: str, part_size: int) -> Dict[str, Any]:
+    # Reading only: the vector size comes from the points themselves.
+    repo = _repo(settings, vector_size=0)
+    meta: Dict[str, Any] = {
+        "format": SNAPSHOT_FORMAT,
+        "collection": settings.qdrant_collection,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embed_model": settings.embed_model,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "vector_size": 0,
+        "points": 0,
+        "parts": [],
+        "articles": 0,
+        "article_parts": [],
+    }
+    tmp = f"{out}.tmp"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with tarfile.open(tmp, "w") as tar:
+        ids: List[Any] = []
+        payloads: List[Dict[str, Any]] = []
+        vectors: List[List[float]] = []
+
+        def write_part() -> None:
+            nonlocal ids, payloads, vectors
+            if not ids:
+                return
+            name = f"part-{len(meta['parts']):05d}"
+            buf = io.BytesIO()
+            np.save(buf, np.asarray(vectors, dtype=np.float32))
+            npy = buf.getvalue()
+            jsonl = "".join(
+                json.dumps({"id": pid, "payload": payload}, ensure_ascii=False) + "\n" for pid, payload in zip(ids, payloads)
+            ).encode("utf-8")
+            _add(tar, f"{name}.npy", npy)
+            _add(tar, f"{name}.jsonl", jsonl)
+            meta["parts"].append({"name": name, "points": len(ids), "npy_sha256": _sha256(npy), "jsonl_sha256": _sha256(jsonl)})
+            meta["points"] += len(ids)
+            logger.info("Snapshot part written", extra={"trace_id": "", "part": name, "points": meta["points"]})
+            ids, payloads, vectors = [], [], []
+
+        for page in repo.iter_points():
+            for p in page:
+                if not meta["vector_size"]:
+                    meta["vector_size"] = len(p.vector)
+                ids.append(str(p.id))
+                payloads.append(p.payload or {})
+                vectors.append(p.vector)
+                if len(ids) >= part_size:
+                    write_part()
+        write_part()
+        if not meta["points"]:
+            raise SystemExit(f"Collection {settings.qdrant_collection} is empty or missing; nothing to export")
+
+        for page in repo.iter_points(batch=part_size, articles=True):
+            name = f"articles-{len(meta['article_parts']):05d}"
+            jsonl = "".join(
+                json.dumps({"id": str(p.id), "payload": p.payload or {}}, ensure_ascii=False) + "\n" for p in page
+            ).encode("utf-8")
+            _add(tar, f"{name}.jsonl", jsonl)
+            meta["article_parts"].append({"name": name, "points": len(page), "jsonl_sha256": _sha256(jsonl)})
+            meta["articles"] += len(page)
+
+        catalog = repo.load_catalog()
+        if catalog is not None:
+            _add(tar, CATALOG_NAME, json.dumps(catalog, ensure_ascii=False).encode("utf-8"))
+        for name, path in ((MANIFEST_NAME, settings.index_manifest_path), (ABSTRACTS_NAME, settings.abstracts_state_path)):
+            data = _read_file(path)
+            if data is not None:
+                _add(tar, name, data)
+                meta.setdefault("files", []).append(name)
+        # Written last so a truncated file is detected on restore.
+        _add(tar, META_NAME, json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+    os.replace(tmp, out)
+    return meta
+
+
+def restore(settings: AppSettings, path: str, force: bool) -> Dict[str, Any]:
+    with tarfile.open(path, "r") as tar:
+        raw = _read(tar, META_NAME)
+        if raw is None:
+            raise SystemExit(f"{path}: no {META_NAME}, not a snapshot or truncated")
+        meta = json.loads(raw)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise SystemExit(f"{path}: unsupported snapshot format {meta.get('format')}")
+        if meta.get("embed_model") != settings.embed_model and not force:
+            # rag-service would embed queries with another model than the points.
+            raise SystemExit(
+                f"Snapshot was built with EMBED_MODEL={meta.get('embed_model')}, this host uses {settings.embed_model}; "
+                "use --force to restore anyway"
+            )
+        if (meta.get("chunk_size"), meta.get("chunk_overlap")) != (settings.chunk_size, settings.chunk_overlap):
+            logger.warning(
+                "Chunk settings differ from the snapshot; the next indexer run rewrites every article",
+                extra={"trace_id": "", "snapshot": [meta.get("chunk_size"), meta.get("chunk_overlap")]},
+            )
+
+        repo = _repo(settings, vector_size=int(meta["vector_size"]))
+        blue_green = settings.vector_backend != "embedded"
+        if blue_green:
+            repo.begin_version(datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"))
+        else:
+            # The embedded store has no aliases: restore into an empty collection only.
+            repo.ensure_collection()
+            if repo.count():
+                raise SystemExit(f"Embedded collection {settings.qdrant_collection} is not empty; use an empty VECTOR_STORE_PATH")
+
+        restored = 0
+        for part in meta["parts"]:
+            npy = _read(tar, f"{part['name']}.npy")
+            jsonl = _read(tar, f"{part['name']}.jsonl")
+            if npy is None or jsonl is None or _sha256(npy) != part["npy_sha256"] or _sha256(jsonl) != part["jsonl_sha256"]:
+                raise SystemExit(f"{path}: part {part['name']} is missing or corrupt")
+            vectors = np.load(io.BytesIO(npy))
+            rows = [json.loads(line) for line in jsonl.decode("utf-8").splitlines()]
+            for i in range(0, len(rows), settings.upsert_batch_size):
+                repo.upsert([
+                    PointStruct(id=row["id"], vector=vectors[i + j].tolist(), payload=row["payload"])
+                    for j, row in enumerate(rows[i:i + settings.upsert_batch_size])
+                ])
+            restored += len(rows)
+            logger.info("Snapshot part restored", extra={"trace_id": "", "part": part["name"], "points": restored})
+
+        # Absent in snapshots of collections indexed before the article store.
+        for part in meta.get("article_parts", []):
+            jsonl = _read(tar, f"{part['name']}.jsonl")
+            if jsonl is None or _sha256(jsonl) != part["jsonl_sha256"]:
+                raise SystemExit(f"{path}: part {part['name']} is missing or corrupt")
+            rows = [json.loads(line) for line in jsonl.decode("utf-8").splitlines()]
+            for i in range(0, len(rows), settings.upsert_batch_size):
+                repo.upsert_articles({row["id"]: row["payload"] for row in rows[i:i + settings.upsert_batch_size]})
+
+        if blue_green:
+            repo.finish_bulk_load(settings.qdrant_indexing_threshold, settings.index_optimize_timeout_s)
+            repo.swap_alias()
+        # State files describe the restored collection; written after it is live.
+        for name, target in ((MANIFEST_NAME, settings.index_manifest_path), (ABSTRACTS_NAME, settings.abstracts_state_path)):
+            data = _read(tar, name)
+            if data is not None and target:
+                _write_file(target, data)
+        catalog = _read(tar, CATALOG_NAME)
+        if catalog is not None:
+            repo.write_catalog(json.loads(catalog))
+        if blue_green:
+            repo.drop_old_versions(settings.index_keep_versions)
+    return meta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="write the configured collection to a snapshot file")
+    p_export.add_argument("out", help="snapshot file to create (.tar)")
+    p_export.add_argument("--part-size", type=int, default=10000, help="points per part inside the file")
+    p_restore = sub.add_parser("restore", help="load a snapshot file into the configured backend")
+    p_restore.add_argument("path", help="snapshot file")
+    p_restore.add_argument("--force", action="store_true", help="restore even if EMBED_MODEL differs")
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    setup_logging(settings.log_level)
+
+    started = time.perf_counter()
+    if args.command == "export":
+        meta = export(settings, args.out, args.part_size)
+    else:
+        meta = restore(settings, args.path, args.force)
+    logger.info(
+        "Snapshot done",
+        extra={
+            "trace_id": "",
+            "command": args.command,
+            "points": meta["points"],
+            "collection": settings.qdrant_collection,
+            "took_s": round(time.perf_counter() - started, 1),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
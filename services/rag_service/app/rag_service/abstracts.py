@@ -0,0 +1,126 @@
+"""Offline per-article abstracts.
+
+Generates a short abstract for every indexed article with the local GGUF model
+and stores it in the article's record (``abstract``, see
+``common.contracts.articles``), where search picks it up. Driven by the
+indexer manifest: an article is processed when the indexer wrote its points in
+a run (``rev``) other than the one its abstract was made for, so reruns only
+touch new and changed articles. Progress is saved after every batch; an
+interrupted run resumes where it stopped.
+
+    docker compose run --rm rag-service python3 -m rag_service.abstracts --limit 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+from common.config import AppSettings
+from common.logging import setup_logging
+from common.vectorstore.embedded import EmbeddedVectorStore
+
+from rag_service.llm import LlamaCppLLM
+from rag_service.prompt_builder import PromptBuilder
+from rag_service.qdrant_repo import QdrantSearchRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def pending(manifest: Dict[str, Dict[str, Any]], done: Dict[str, str]) -> List[str]:
+    """Articles whose points were written after (or without) their abstract."""
+    return [aid for aid, entry in manifest.items() if done.get(aid) != entry.get("rev")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=0, help="process at most N articles (0 = all pending)")
+    parser.add_argument("--batch", type=int, default=16, help="articles fetched per request and per checkpoint")
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    setup_logging(settings.log_level)
+
+    # Written by indexer_service.manifest.IndexManifest: {"articles": {article_id: {..., "rev"}}}
+    manifest = _load_json(settings.index_manifest_path).get("articles", {})
+    done: Dict[str, str] = _load_json(settings.abstracts_state_path).get("done", {})
+    todo = pending(manifest, done)
+    if args.limit > 0:
+        todo = todo[:args.limit]
+    logger.info("Abstracts pending", extra={"trace_id": "", "pending": len(todo), "indexed": len(manifest)})
+    if not todo:
+        return
+
+    repo = QdrantSearchRepository(
+        settings.qdrant_host,
+        settings.qdrant_port,
+        settings.qdrant_collection,
+        client=EmbeddedVectorStore(settings.vector_store_path) if settings.vector_backend == "embedded" else None,
+    )
+    llm = LlamaCppLLM(
+        model_path=settings.llm_model_path,
+        n_ctx=settings.llm_n_ctx,
+        max_tokens=settings.abstract_max_tokens,
+        temperature=settings.llm_temperature,
+        top_p=settings.llm_top_p,
+        n_gpu_layers=settings.llm_n_gpu_layers,
+        n_threads=settings.llm_n_threads or None,
+    )
+    builder = PromptBuilder()
+
+    started = time.perf_counter()
+    written = 0
+    for i in range(0, len(todo), args.batch):
+        ids = todo[i:i + args.batch]
+        articles = repo.fetch_articles(ids, per_article=settings.abstract_source_chunks)
+        meta = repo.fetch_article_meta(ids)
+        for aid in ids:
+            chunks = articles.get(aid)
+            if chunks:
+                lead = {**chunks[0]["payload"], **meta.get(aid, {})}
+                text = "\n".join(c["payload"].get("text", "") for c in chunks)
+                abstract = llm.generate(
+                    builder.build_abstract(lead.get("title", ""), text),
+                    endpoint="abstract",
+                    max_tokens=settings.abstract_max_tokens,
+                ).strip()
+                if abstract:
+                    repo.set_article_payload(aid, {"abstract": abstract})
+                    written += 1
+            # Articles missing from the collection are marked too; the indexer
+            # bumps their rev when it writes them again.
+            done[aid] = manifest[aid].get("rev", "")
+        _save_json(settings.abstracts_state_path, {"done": done})
+        processed = min(i + args.batch, len(todo))
+        logger.info(
+            "Abstracts progress",
+            extra={
+                "trace_id": "",
+                "processed": processed,
+                "pending": len(todo) - processed,
+                "written": written,
+                "s_per_article": round((time.perf_counter() - started) / processed, 2),
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Batch search throughput vs. a loop of single searches (retrieval only).
+
+    python3 -m rag_service.bench.batch_search --queries queries.txt --batch 64
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from common.config import AppSettings
+from common.logging import setup_logging
+
+from rag_service.embedder import QueryEmbedder
+from rag_service.qdrant_repo import AsyncQdrantSearchRepository
+from rag_service.retriever import Retriever
+
+
+async def _run(settings: AppSettings, queries: List[str], batch: int, limit: int) -> None:
+    embedder = QueryEmbedder(settings.embed_model, batch_size=settings.embed_batch_size)
+    qrepo = AsyncQdrantSearchRepository(
+        settings.qdrant_host,
+        settings.qdrant_port,
+        settings.qdrant_collection,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port,
+    )
+    retriever = Retriever(qrepo)
+    embedder.embed("warmup")
+
+    started = time.perf_counter()
+    for q in queries:
+        await retriever.retrieve_chunks(embedder.embed(q).tolist(), None, limit_chunks=limit)
+    single_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        part = queries[i:i + batch]
+        vecs = embedder.embed_batch(part).tolist()
+        await retriever.retrieve_chunks_batch(vecs, [None] * len(part), limit_chunks=limit)
+    batch_s = time.perf_counter() - started
+    await qrepo.close()
+
+    print(f"{'mode':<10}{'queries':>9}{'seconds':>10}{'q/s':>10}")
+    print(f"{'single':<10}{len(queries):>9}{single_s:>10.2f}{len(queries) / single_s:>10.1f}")
+    print(f"{'batch':<10}{len(queries):>9}{batch_s:>10.2f}{len(queries) / batch_s:>10.1f}")
+    print(f"speedup: {single_s / batch_s:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="text file, one search query per line")
+    parser.add_argument("--batch", type=int, default=64, help="queries per batch call")
+    parser.add_argument("--limit", type=int, default=50, help="chunks per query")
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    setup_logging("WARNING")
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    if not queries:
+        raise SystemExit("No queries")
+
+    asyncio.run(_run(settings, queries, args.batch, args.limit))
+
+
+if __name__ == "__main__":
+    main()
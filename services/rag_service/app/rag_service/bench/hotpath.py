@@ -0,0 +1,113 @@
+"""Non-LLM hot path micro-benchmark: hits -> articles -> sources -> contract.
+
+Compares the pydantic-based path (a model per hit, per article and for the
+response, then ``model_dump``) with the slotted records and dict mapper now
+used by rag-service. Synthetic data, no Qdrant or models needed.
+
+    python3 -m rag_service.bench.hotpath --hits 50 --articles 12 --repeat 2000
+"""
+
+import argparse
+import random
+import timeit
+from typing import Any, Dict, List, Tuple
+
+from pydantic import BaseModel
+
+from common.contracts.models import ArticleItem, RagResponse
+
+from rag_service.domain import RetrievedChunk
+from rag_service.mapper import ContractMapper
+from rag_service.retriever import Retriever
+
+
+class _PydChunk(BaseModel):
+    score: float
+    payload: Dict[str, Any]
+
+
+class _PydArticle(BaseModel):
+    best_score: float
+    payload: Dict[str, Any]
+    texts: List[str]
+
+
+def _hits(n_hits: int, n_articles: int) -> List[Tuple[float, Dict[str, Any]]]:
+    rnd = random.Random(0)
+    out = []
+    for i in range(n_hits):
+        a = rnd.randrange(n_articles)
+        out.append((1.0 - i / n_hits, {
+            "article_id": f"a{a}",
+            "chunk_id": i,
+            "title": f"Статья {a}",
+            "url": f"https://example.com/{a}",
+            "author": "Автор",
+            "pub_day": "2024-12-01",
+            "subtopic_raw": "ИИ",
+            "text": "Текст фрагмента. " * 60,
+        }))
+    return out
+
+
+def _sources(aggregated, limit: int) -> Tuple[List[dict], List[dict]]:
+    articles, sources = [], []
+    for art in aggregated[:limit]:
+        p = art.payload
+        a = {"title": p.get("title", ""), "url": p.get("url", ""), "author": p.get("author", ""),
+             "date": p.get("pub_day", ""), "topic": p.get("subtopic_raw", "")}
+        articles.append(a)
+        sources.append({**a, "score": art.best_score, "texts": [t for t in art.texts if t]})
+    return articles, sources
+
+
+def _baseline(raw, max_articles: int) -> dict:
+    chunks = [_PydChunk(score=s, payload=p) for s, p in raw]
+    by_article: Dict[str, Dict[str, Any]] = {}
+    for ch in chunks:
+        p = ch.payload
+        aid = p.get("article_id")
+        item = by_article.get(aid)
+        if item is None:
+            by_article[aid] = {"best_score": ch.score, "payload": p, "texts": [p["text"]]}
+        else:
+            item["best_score"] = max(item["best_score"], ch.score)
+            if len(item["texts"]) < 3:
+                item["texts"].append(p["text"])
+    aggregated = [_PydArticle(**v) for v in by_article.values()]
+    aggregated.sort(key=lambda a: a.best_score, reverse=True)
+    articles, _ = _sources(aggregated[:max_articles], max_articles)
+    items = [ArticleItem(**a) for a in articles]
+    return RagResponse(summary="s", articles=items).model_dump(exclude_none=True)
+
+
+def _current(raw, max_articles: int, retriever: Retriever, mapper: ContractMapper) -> dict:
+    chunks = [RetrievedChunk(s, p) for s, p in raw]
+    aggregated = retriever.aggregate(chunks, max_articles=max_articles)
+    articles, _ = _sources(aggregated, max_articles)
+    return mapper.to_contract("s", articles)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hits", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=12)
+    parser.add_argument("--max-articles", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    raw = _hits(args.hits, args.articles)
+    retriever, mapper = Retriever(repo=None, mode="chunks"), ContractMapper()
+    assert _baseline(raw, args.max_articles) == _current(raw, args.max_articles, retriever, mapper)
+
+    base = min(timeit.repeat(lambda: _baseline(raw, args.max_articles), number=args.repeat, repeat=3)) / args.repeat
+    cur = min(timeit.repeat(lambda: _current(raw, args.max_articles, retriever, mapper), number=args.repeat, repeat=3)) / args.repeat
+
+    print(f"{'path':<10}{'us/request':>12}")
+    print(f"{'pydantic':<10}{base * 1e6:>12.1f}")
+    print(f"{'slotted':<10}{cur * 1e6:>12.1f}")
+    print(f"speedup: {base / cur:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
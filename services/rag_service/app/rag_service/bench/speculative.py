@@ -0,0 +1,121 @@
+"""Speculative decoding benchmark on real search prompts.
+
+Builds summary prompts through the regular retrieval + packing path and runs
+them with each decoding mode, reporting tokens/s and draft acceptance rate.
+
+    python3 -m rag_service.bench.speculative --queries queries.txt --modes off,prompt_lookup
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import statistics
+from typing import List
+
+from common.config import AppSettings
+from common.contracts.models import RagRequest
+from common.logging import setup_logging
+
+from rag_service.embedder import QueryEmbedder
+from rag_service.llm import LlamaCppLLM, SPECULATIVE_MODES
+from rag_service.mapper import ContractMapper
+from rag_service.quiz import QuizFormat
+from rag_service.prompt_builder import PromptBuilder
+from rag_service.prompt_packer import PromptPacker
+from rag_service.qdrant_repo import AsyncQdrantSearchRepository
+from rag_service.retriever import Retriever
+from rag_service.service import RagService
+
+
+def _load_llm(settings: AppSettings, mode: str) -> LlamaCppLLM:
+    return LlamaCppLLM(
+        model_path=settings.llm_model_path,
+        n_ctx=settings.llm_n_ctx,
+        max_tokens=settings.llm_max_tokens,
+        temperature=settings.llm_temperature,
+        top_p=settings.llm_top_p,
+        n_gpu_layers=settings.llm_n_gpu_layers,
+        speculative_mode=mode,
+        speculative_endpoints=["bench"],
+        num_pred_tokens=settings.llm_speculative_num_pred_tokens,
+        max_ngram_size=settings.llm_speculative_max_ngram,
+        draft_model_path=settings.llm_draft_model_path,
+    )
+
+
+async def _build_prompts(settings: AppSettings, llm: LlamaCppLLM, queries: List[str]) -> List[str]:
+    qrepo = AsyncQdrantSearchRepository(settings.qdrant_host, settings.qdrant_port, settings.qdrant_collection)
+    rag = RagService(
+        embedder=QueryEmbedder(settings.embed_model),
+        qrepo=qrepo,
+        retriever=Retriever(qrepo, mode=settings.rag_retrieval_mode, chunks_per_article=settings.rag_chunks_per_article),
+        llm=llm,
+        prompt_builder=PromptBuilder(),
+        prompt_packer=PromptPacker(
+            count_tokens=llm.count_tokens,
+            n_ctx=settings.llm_n_ctx,
+            max_new_tokens=settings.llm_max_tokens,
+            input_budget=settings.llm_prompt_token_budget,
+        ),
+        mapper=ContractMapper(),
+        quiz_format=QuizFormat(
+            structured=settings.quiz_structured,
+            base_tokens=settings.llm_quiz_base_tokens,
+            tokens_per_question=settings.llm_quiz_tokens_per_question,
+            max_tokens_cap=settings.llm_n_ctx // 2,
+        ),
+    )
+    prompts = []
+    for q in queries:
+        _, packed = await rag.search_prompt(RagRequest(query=q))
+        if packed is not None:
+            prompts.append(packed.prompt)
+    await qrepo.close()
+    return prompts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="text file, one search query per line")
+    parser.add_argument("--modes", default="off,prompt_lookup", help=f"comma-separated subset of {SPECULATIVE_MODES}")
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    setup_logging("WARNING")
+    logging.getLogger("rag_service").setLevel(logging.WARNING)
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    prompts: List[str] = []
+
+    print(f"{'mode':<14}{'prompts':>8}{'tok/s p50':>12}{'tok/s mean':>12}{'accept':>9}{'tokens':>9}")
+    for mode in modes:
+        llm = _load_llm(settings, mode)
+        if not prompts:
+            prompts = asyncio.run(_build_prompts(settings, llm, queries))
+            if not prompts:
+                raise SystemExit("No prompts: retrieval returned nothing for the given queries")
+
+        rates, drafted, accepted, tokens = [], 0, 0, 0
+        for prompt in prompts:
+            llm.generate(prompt, endpoint="bench")
+            st = llm.last_stats
+            rates.append(st.tokens_per_s)
+            drafted += st.drafted
+            accepted += st.accepted
+            tokens += st.completion_tokens
+
+        acceptance = f"{accepted / drafted:.2f}" if drafted else "-"
+        print(
+            f"{mode:<14}{len(prompts):>8}{statistics.median(rates):>12.2f}"
+            f"{statistics.fmean(rates):>12.2f}{acceptance:>9}{tokens:>9}"
+        )
+        del llm
+        gc.collect()
+
+
+if __name__ == "__main__":
+    main()
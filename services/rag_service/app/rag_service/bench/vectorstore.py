@@ -0,0 +1,116 @@
+"""Embedded vector store vs. Qdrant: search latency and recall.
+
+Copies up to ``--points`` chunks (with vectors) from the Qdrant collection into
+a temporary embedded store, then runs the same queries against both. Recall
+is Qdrant's (HNSW) top-k measured against the embedded store's exact top-k.
+
+    python3 -m rag_service.bench.vectorstore --points 200000 --queries queries.txt
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from common.config import AppSettings
+from common.logging import setup_logging
+from common.vectorstore.embedded import EmbeddedVectorStore
+
+from rag_service.embedder import QueryEmbedder
+
+
+def _copy(src: QdrantClient, collection: str, dst: EmbeddedVectorStore, limit: int) -> int:
+    offset: Optional[qm.ExtendedPointId] = None
+    copied = 0
+    while copied < limit:
+        points, offset = src.scroll(
+            collection_name=collection, limit=min(1024, limit - copied), offset=offset, with_payload=True, with_vectors=True
+        )
+        if not points:
+            break
+        if copied == 0:
+            dst.create_collection(collection, qm.VectorParams(size=len(points[0].vector), distance=qm.Distance.COSINE))
+        dst.upsert(collection, [qm.PointStruct(id=p.id, vector=p.vector, payload=p.payload or {}) for p in points])
+        copied += len(points)
+        if offset is None:
+            break
+    return copied
+
+
+def _timed(fn, queries: List[List[float]]) -> tuple:
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(fn(q))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=200000, help="chunks to copy from Qdrant")
+    parser.add_argument("--queries", help="text file with one query per line; default: perturbed stored vectors")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    setup_logging("WARNING")
+    qdrant = QdrantClient(host=settings.qdrant_host, port=settings.qdrant_port)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EmbeddedVectorStore(tmp, dtype=args.dtype)
+        started = time.perf_counter()
+        n = _copy(qdrant, settings.qdrant_collection, store, args.points)
+        if not n:
+            raise SystemExit("Collection is empty")
+        print(f"copied {n} points in {time.perf_counter() - started:.1f}s")
+
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()][:args.n_queries]
+            queries = QueryEmbedder(settings.embed_model).embed_batch(texts).tolist()
+        else:
+            rnd = np.random.default_rng(0)
+            seeds, _ = store.scroll(settings.qdrant_collection, limit=args.n_queries * 10, with_payload=False, with_vectors=True)
+            picked = rnd.choice(len(seeds), size=min(args.n_queries, len(seeds)), replace=False)
+            queries = [(np.asarray(seeds[i].vector) + rnd.normal(scale=0.05, size=len(seeds[i].vector))).tolist() for i in picked]
+
+        def q_search(q):
+            return [p.id for p in qdrant.search(settings.qdrant_collection, query_vector=q, limit=args.k, with_payload=False)]
+
+        def e_search(q):
+            return [p.id for p in store.search(settings.qdrant_collection, query_vector=q, limit=args.k, with_payload=False)]
+
+        # If only part of the collection was copied, Qdrant hits outside it are
+        # ignored: an exact global top-k restricted to the copied points is the
+        # exact top-m of the copied points, so recall stays comparable.
+        copied_ids = {str(r.id) for r in store.scroll(settings.qdrant_collection, limit=n, with_payload=False)[0]}
+
+        q_lat, q_res = _timed(q_search, queries)
+        e_lat, e_res = _timed(e_search, queries)
+
+        recalls = []
+        for q_ids, e_ids in zip(q_res, e_res):
+            q_ids = [i for i in map(str, q_ids) if i in copied_ids]
+            exact = set(map(str, e_ids[:len(q_ids)])) if q_ids else set()
+            if exact:
+                recalls.append(len(exact & set(q_ids)) / len(exact))
+
+        def p(lat, pct):
+            return statistics.quantiles(lat, n=100)[pct - 1]
+
+        print(f"{'backend':<10}{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}")
+        print(f"{'qdrant':<10}{p(q_lat, 50):>9.2f}{p(q_lat, 95):>9.2f}{statistics.fmean(recalls) if recalls else float('nan'):>10.3f}")
+        print(f"{'embedded':<10}{p(e_lat, 50):>9.2f}{p(e_lat, 95):>9.2f}{1.0:>10.3f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+from typing import Callable, List
+
+
+logger = logging.getLogger(__name__)
+
+
+async def watch_collection(repo, interval_s: float, on_change: List[Callable[[], None]]) -> None:
+    """Call ``on_change`` hooks when the collection alias switches to a new version.
+
+    Searches follow the alias by themselves; the hooks drop what was cached
+    about the previous version (filter counts).
+    """
+    current = None
+    while True:
+        try:
+            live = await repo.live_collection()
+            if current is not None and live != current:
+                logger.info("Collection version switched", extra={"trace_id": "", "collection": live, "previous": current})
+                for hook in on_change:
+                    hook()
+            current = live
+        except Exception:
+            logger.exception("Collection version check failed", extra={"trace_id": ""})
+        await asyncio.sleep(interval_s)
@@ -1,13 +1,44 @@
+from dataclasses import dataclass, field
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 
 
-class RetrievedChunk(BaseModel):
+# Retrieval hot path: plain slotted records, no validation. Data comes from our
+# own index; requests and responses are validated at the RPC boundary.
+@dataclass(slots=True)
+class RetrievedChunk:
     score: float
     payload: Dict[str, Any]
 
 
-class AggregatedArticle(BaseModel):
+@dataclass(slots=True)
+class AggregatedArticle:
     best_score: float
     payload: Dict[str, Any]
-    texts: List[str]
+    texts: List[str] = field(default_factory=list)
+
+
+class PackedPrompt(BaseModel):
+    prompt: str
+    prompt_tokens: int
+    budget: int
+    n_sources: int
+    n_excerpts: int
+
+
+class GenerationStats(BaseModel):
+    endpoint: str
+    speculative: bool
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+    drafted: int = 0
+    accepted: int = 0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.completion_tokens / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import numpy as np
+
+from rag_service.embedder import QueryEmbedder
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Micro-batches concurrent ``embed`` calls into one encoder forward pass.
+
+    A single worker thread takes the first waiting query, then keeps collecting
+    for at most ``window_ms`` or until ``max_batch`` queries. Queries arriving
+    while a batch is being encoded go into the next one, so under load batches
+    fill up on their own; a lone request waits at most the window.
+
+    Drop-in for ``QueryEmbedder`` (``embed`` / ``embed_batch`` and their
+    ``*_async`` variants); passage embeddings go straight to the encoder.
+    """
+
+    def __init__(self, embedder: QueryEmbedder, window_ms: float = 2.0, max_batch: int = 32, log_every_s: float = 60.0) -> None:
+        self._embedder = embedder
+        self._window_s = window_ms / 1000.0
+        self._max_batch = max(1, max_batch)
+        self._log_every_s = log_every_s
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_log = time.monotonic()
+
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def _submit(self, query: str) -> Future:
+        fut: Future = Future()
+        self._queue.put((query, fut))
+        return fut
+
+    def embed(self, query: str) -> np.ndarray:
+        return self._submit(query).result()
+
+    async def embed_async(self, query: str) -> np.ndarray:
+        # Awaits the worker's future without parking an executor thread.
+        return await asyncio.wrap_future(self._submit(query))
+
+    def embed_batch(self, queries: List[str]) -> np.ndarray:
+        # Already a batch: encode directly instead of splitting it across windows.
+        return self._embedder.embed_batch(queries)
+
+    async def embed_batch_async(self, queries: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embedder.embed_batch, queries)
+
+    async def embed_passages_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embedder.embed_passages, texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches, items = self._batches, self._items
+        return {
+            "batches": batches,
+            "items": items,
+            "avg_batch": round(items / batches, 2) if batches else 0.0,
+            "fill": round(items / (batches * self._max_batch), 3) if batches else 0.0,
+        }
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window_s
+        while len(batch) < self._max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                vecs = self._embedder.embed_batch([q for q, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(batch, vecs):
+                fut.set_result(vec)
+            self._record(len(batch))
+
+    def _record(self, size: int) -> None:
+        with self._lock:
+            self._batches += 1
+            self._items += size
+        now = time.monotonic()
+        if now - self._last_log >= self._log_every_s:
+            self._last_log = now
+            logger.info("Query embedding batches", extra={"trace_id": "", **self.stats()})
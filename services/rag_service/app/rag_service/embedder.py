@@ -1,12 +1,41 @@
+import asyncio
+from typing import List
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 
 class QueryEmbedder:
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, model_name: str, batch_size: int = 32) -> None:
+        # Imported here: torch + sentence_transformers take seconds to import and
+        # must not delay the service coming online (main loads this in a thread).
+        from sentence_transformers import SentenceTransformer
+
         self._model = SentenceTransformer(model_name)
+        self._batch_size = batch_size
 
     def embed(self, query: str) -> np.ndarray:
         q = f"query: {query}"
         vec = self._model.encode([q], normalize_embeddings=True, show_progress_bar=False)[0]
         return np.asarray(vec)
+
+    def embed_batch(self, queries: List[str]) -> np.ndarray:
+        """Embed many queries in one encoder call; rows align with ``queries``."""
+        texts = [f"query: {q}" for q in queries]
+        vecs = self._model.encode(texts, batch_size=self._batch_size, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vecs)
+
+    def embed_passages(self, texts: List[str]) -> np.ndarray:
+        """Embed document text (e5 "passage:" side), e.g. sentences to rank against a query."""
+        vecs = self._model.encode(
+            [f"passage: {t}" for t in texts], batch_size=self._batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(vecs)
+
+    async def embed_passages_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_passages, texts)
+
+    async def embed_async(self, query: str) -> np.ndarray:
+        return await asyncio.to_thread(self.embed, query)
+
+    async def embed_batch_async(self, queries: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_batch, queries)
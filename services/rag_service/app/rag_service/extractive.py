@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from rag_service.prompt_packer import SENTENCE_END
+
+
+class ExtractiveSummarizer:
+    """Summary without the LLM: source sentences picked by MMR.
+
+    Sentences of the retrieved excerpts are embedded (one encoder call) and
+    selected greedily by maximal marginal relevance: similarity to the query
+    minus ``diversity`` times similarity to what is already picked, so the
+    answer does not repeat one fact from overlapping chunks. Every sentence
+    keeps the ``[n]`` of its source.
+    """
+
+    def __init__(self, embedder, max_sentences: int = 4, diversity: float = 0.3, max_candidates: int = 120, min_chars: int = 40) -> None:
+        self._embedder = embedder
+        self._max_sentences = max_sentences
+        self._diversity = diversity
+        self._max_candidates = max_candidates
+        self._min_chars = min_chars
+
+    def _candidates(self, sources: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        out: List[Tuple[int, str]] = []
+        seen = set()
+        for n, src in enumerate(sources, start=1):
+            for text in src.get("texts") or []:
+                # Chunks are cut by characters: skip the fragment before the
+                # first sentence boundary unless the chunk starts a sentence.
+                for sentence in SENTENCE_END.split(text.strip()):
+                    sentence = sentence.strip()
+                    if len(sentence) < self._min_chars or sentence in seen or not sentence[0].isupper():
+                        continue
+                    seen.add(sentence)
+                    out.append((n, sentence))
+        return out[:self._max_candidates]
+
+    def _mmr(self, query_vec: np.ndarray, vecs: np.ndarray) -> List[int]:
+        relevance = vecs @ query_vec
+        picked: List[int] = []
+        redundancy = np.full(len(vecs), -np.inf)
+        for _ in range(min(self._max_sentences, len(vecs))):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            score = (1 - self._diversity) * relevance - self._diversity * penalty
+            score[picked] = -np.inf
+            best = int(np.argmax(score))
+            picked.append(best)
+            redundancy = np.maximum(redundancy, vecs @ vecs[best])
+        return picked
+
+    async def summarize(self, query_vec: List[float], sources: List[Dict[str, Any]]) -> str:
+        candidates = self._candidates(sources)
+        if not candidates:
+            return ""
+        vecs = await self._embedder.embed_passages_async([s for _, s in candidates])
+        picked = self._mmr(np.asarray(query_vec, dtype=np.float32), np.asarray(vecs, dtype=np.float32))
+        return " ".join(f"{candidates[i][1]} [{candidates[i][0]}]" for i in picked)
@@ -0,0 +1,87 @@
+import asyncio
+import bisect
+import difflib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.contracts.models import FacetsRequest
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Facet:
+    """Values of one field with a sorted (word, value index) list for prefix lookup."""
+
+    def __init__(self, entries: List[Tuple[str, str, int]]) -> None:
+        self.entries = entries
+        self.words = sorted((w, i) for i, (value, _, _) in enumerate(entries) for w in {value, *value.split()})
+        self.keys = [w for w, _ in self.words]
+        self.index = {value: i for i, (value, _, _) in enumerate(entries)}
+
+    def prefixed(self, prefix: str) -> List[int]:
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff")
+        return sorted({i for _, i in self.words[lo:hi]})
+
+    def close(self, text: str, limit: int) -> List[int]:
+        # Typo fallback when nothing starts with the input.
+        return [self.index[v] for v in difflib.get_close_matches(text, list(self.index), n=limit, cutoff=0.75)]
+
+
+class FacetCatalog:
+    """In-memory facet catalog written by the indexer (``common.contracts.catalog``).
+
+    Answers prefix autocomplete for authors, topics and days; replaced as a
+    whole by ``load`` when the indexer publishes a new version.
+    """
+
+    def __init__(self) -> None:
+        self.version = ""
+        self._facets: Dict[str, _Facet] = {}
+
+    def load(self, catalog: Dict[str, Any]) -> None:
+        facets = {
+            "author": _Facet([(v, label, n) for v, label, n in catalog.get("authors", [])]),
+            "topic": _Facet([(v, label, n) for v, label, n in catalog.get("topics", [])]),
+            # days are newest first; the label is the day itself
+            "day": _Facet([(d, d, n) for d, n in sorted(catalog.get("days", []), reverse=True)]),
+        }
+        self._facets, self.version = facets, str(catalog.get("version", ""))
+
+    def suggest(self, field: str, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        facet: Optional[_Facet] = self._facets.get(field)
+        if facet is None:
+            return []
+        text = prefix.strip().lower()
+        if not text:
+            picked = list(range(min(limit, len(facet.entries))))
+        else:
+            picked = facet.prefixed(text) or facet.close(text, limit)
+            if field != "day":
+                # most frequent first; exact match always on top
+                picked.sort(key=lambda i: (facet.entries[i][0] != text, -facet.entries[i][2]))
+        return [{"value": v, "label": label, "count": n} for v, label, n in (facet.entries[i] for i in picked[:limit])]
+
+    def answer(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """``facets`` RPC: validates the request and returns a ``FacetsResponse`` dict."""
+        try:
+            req = FacetsRequest.model_validate(payload)
+        except Exception:
+            return {"field": str(payload.get("field", "")), "values": [], "version": self.version}
+        return {"field": req.field, "values": self.suggest(req.field, req.prefix, req.limit), "version": self.version}
+
+
+async def watch_catalog(catalog: FacetCatalog, repo, interval_s: float) -> None:
+    """Keep ``catalog`` in sync with the published one; polls only its version."""
+    while True:
+        try:
+            head = await repo.load_catalog(fields=["version"])
+            if head is not None and str(head.get("version", "")) != catalog.version:
+                full = await repo.load_catalog()
+                if full is not None:
+                    catalog.load(full)
+                    logger.info("Facet catalog loaded", extra={"trace_id": "", "version": catalog.version})
+        except Exception:
+            logger.exception("Facet catalog refresh failed", extra={"trace_id": ""})
+        await asyncio.sleep(interval_s)
@@ -1,36 +1,208 @@
-from typing import Protocol
+from typing import Any, Dict, Iterable, Optional, Protocol
+import json
+import logging
 import os
+import time
+
+import numpy as np
+
+from common.rabbit.cancellation import CancelToken
+
+from rag_service.domain import GenerationStats
+
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_MODES = ("off", "prompt_lookup", "draft")
+
+
+class GenerationCancelled(Exception):
+    """The caller abandoned the request before or during generation."""
 
 
 class LLM(Protocol):
-    def generate(self, prompt: str) -> str: ...
+    def generate(
+        self,
+        prompt: str,
+        endpoint: str = "",
+        max_tokens: Optional[int] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> str: ...
+
+    def count_tokens(self, text: str) -> int: ...
+
+
+class TrackingDraftModel:
+    """Wraps a llama.cpp draft model and counts drafted/accepted tokens.
+
+    llama-cpp-python does not report acceptance itself. Every draft call receives
+    the verified sequence, so the tokens kept from the previous draft are the
+    common prefix of that draft and the newly verified tail.
+    """
+
+    def __init__(self, draft: Any) -> None:
+        self._draft = draft
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.drafted = 0
+        self.accepted = 0
+        self._last: Optional[np.ndarray] = None
+        self._last_len = 0
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        if self._last is not None and len(self._last):
+            verified = input_ids[self._last_len:self._last_len + len(self._last)]
+            n = min(len(verified), len(self._last))
+            mismatch = np.nonzero(verified[:n] != self._last[:n])[0]
+            self.drafted += len(self._last)
+            self.accepted += int(mismatch[0]) if len(mismatch) else n
+
+        draft = self._draft(input_ids, **kwargs)
+        self._last = np.array(draft, dtype=np.intc)
+        self._last_len = len(input_ids)
+        return draft
+
+
+class GgufDraftModel:
+    """Greedy drafting with a small GGUF model sharing the target's vocabulary."""
+
+    def __init__(self, model_path: str, n_ctx: int, n_gpu_layers: int, num_pred_tokens: int) -> None:
+        from llama_cpp import Llama
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Draft model file not found: {model_path}")
+
+        self._num_pred_tokens = num_pred_tokens
+        self._llm = Llama(model_path=model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, verbose=False)
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        out = []
+        # Llama.generate reuses the longest matching KV prefix, so only the newly
+        # verified tokens are evaluated on each call.
+        for token in self._llm.generate(input_ids.tolist(), top_k=1, temp=0.0):
+            out.append(token)
+            if len(out) >= self._num_pred_tokens:
+                break
+        return np.array(out, dtype=np.intc)
 
 
 class LlamaCppLLM:
-    def __init__(self, model_path: str, n_ctx: int, max_tokens: int, temperature: float, top_p: float, n_gpu_layers: int) -> None:
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        n_gpu_layers: int,
+        speculative_mode: str = "off",
+        speculative_endpoints: Iterable[str] = (),
+        num_pred_tokens: int = 10,
+        max_ngram_size: int = 2,
+        draft_model_path: str = "",
+        n_threads: Optional[int] = None,
+    ) -> None:
         from llama_cpp import Llama
 
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"LLM model file not found: {model_path}")
+        if speculative_mode not in SPECULATIVE_MODES:
+            raise ValueError(f"Unknown speculative mode: {speculative_mode}")
 
         self._max_tokens = max_tokens
         self._temperature = temperature
         self._top_p = top_p
+        self._speculative_endpoints = {e.strip() for e in speculative_endpoints if e.strip()}
+        self.last_stats: Optional[GenerationStats] = None
+        self._grammars: Dict[str, Any] = {}
+
+        self._draft: Optional[TrackingDraftModel] = None
+        if speculative_mode == "prompt_lookup":
+            from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
 
-        # One Llama instance = one context (CUDA if built with CUDA + n_gpu_layers > 0)
+            self._draft = TrackingDraftModel(
+                LlamaPromptLookupDecoding(max_ngram_size=max_ngram_size, num_pred_tokens=num_pred_tokens)
+            )
+        elif speculative_mode == "draft":
+            self._draft = TrackingDraftModel(
+                GgufDraftModel(draft_model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, num_pred_tokens=num_pred_tokens)
+            )
+
+        # One Llama instance = one context (CUDA if built with CUDA + n_gpu_layers > 0).
+        # A draft model switches llama.cpp to logits_all, so it is only attached
+        # when speculative decoding is enabled for at least one endpoint.
         self._llm = Llama(
             model_path=model_path,
             n_ctx=n_ctx,
             n_gpu_layers=n_gpu_layers,
+            n_threads=n_threads,
+            use_mmap=True,
+            draft_model=self._draft,
             verbose=False,
         )
 
-    def generate(self, prompt: str) -> str:
+    def _grammar(self, json_schema: Dict[str, Any]) -> Any:
+        from llama_cpp import LlamaGrammar
+
+        key = json.dumps(json_schema, sort_keys=True, ensure_ascii=False)
+        grammar = self._grammars.get(key)
+        if grammar is None:
+            grammar = LlamaGrammar.from_json_schema(key, verbose=False)
+            self._grammars[key] = grammar
+        return grammar
+
+    def generate(
+        self,
+        prompt: str,
+        endpoint: str = "",
+        max_tokens: Optional[int] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> str:
+        from llama_cpp import StoppingCriteriaList
+
+        if cancel is not None and cancel.is_cancelled():
+            raise GenerationCancelled()
+
+        speculative = self._draft is not None and endpoint in self._speculative_endpoints
+        self._llm.draft_model = self._draft if speculative else None
+        if self._draft is not None:
+            self._draft.reset_stats()
+
+        started = time.perf_counter()
         out = self._llm(
             prompt,
-            max_tokens=self._max_tokens,
+            max_tokens=self._max_tokens if max_tokens is None else max_tokens,
             temperature=self._temperature,
             top_p=self._top_p,
             stop=["</s>"],
+            # The grammar only admits EOS once the JSON object is closed.
+            grammar=self._grammar(json_schema) if json_schema is not None else None,
+            # Checked after every sampled token.
+            stopping_criteria=StoppingCriteriaList([lambda ids, logits: cancel.is_cancelled()]) if cancel else None,
+        )
+        elapsed = time.perf_counter() - started
+        if cancel is not None and cancel.is_cancelled():
+            logger.info("LLM generation cancelled", extra={"trace_id": "", "endpoint": endpoint, "seconds": round(elapsed, 3)})
+            raise GenerationCancelled()
+
+        usage = out.get("usage") or {}
+        self.last_stats = GenerationStats(
+            endpoint=endpoint,
+            speculative=speculative,
+            prompt_tokens=int(usage.get("prompt_tokens", 0)),
+            completion_tokens=int(usage.get("completion_tokens", 0)),
+            seconds=elapsed,
+            drafted=self._draft.drafted if speculative else 0,
+            accepted=self._draft.accepted if speculative else 0,
+        )
+        logger.info(
+            "LLM generation finished",
+            extra={"trace_id": "", **self.last_stats.model_dump()},
         )
         return (out["choices"][0]["text"] or "").strip()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._llm.tokenize(text.encode("utf-8"), add_bos=False))
@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from common.rabbit.cancellation import CancelToken
+
+from rag_service.llm import LLM, GenerationCancelled
+
+
+logger = logging.getLogger(__name__)
+
+
+def split_cores(size: int) -> List[Set[int]]:
+    """Split the CPUs available to this process into ``size`` contiguous groups."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if size > len(cpus):
+        raise ValueError(f"LLM pool size {size} exceeds available CPUs ({len(cpus)})")
+    per, extra = divmod(len(cpus), size)
+    groups, start = [], 0
+    for i in range(size):
+        end = start + per + (1 if i < extra else 0)
+        groups.append(set(cpus[start:end]))
+        start = end
+    return groups
+
+
+def _pin_thread(cpus: Optional[Set[int]]) -> None:
+    # On Linux pid 0 addresses the calling thread; llama.cpp worker threads
+    # created from it inherit the mask.
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+class LlamaContextPool:
+    """Pool of llama.cpp contexts over one memory-mapped GGUF file.
+
+    Every context is created and driven from its own worker thread, optionally
+    pinned to a subset of cores. Weights are mmap'ed (llama.cpp default), so the
+    page cache is shared and each extra context costs its KV cache and compute
+    buffers. With ``n_gpu_layers > 0`` every context uploads its own copy of the
+    offloaded layers, so the pool is meant for CPU hosts.
+
+    ``generate`` blocks the calling thread until a context is free and then
+    runs on the first free one. A cancelled request leaves the wait queue
+    immediately and a running one stops at the next token.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[Optional[int]], LLM],
+        size: int = 1,
+        n_threads: int = 0,
+        pin_cores: bool = False,
+    ) -> None:
+        if size < 1:
+            raise ValueError("LLM pool size must be >= 1")
+
+        core_sets: List[Optional[Set[int]]] = list(split_cores(size)) if pin_cores else [None] * size
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"llm-ctx-{i}", initializer=_pin_thread, initargs=(cpus,))
+            for i, cpus in enumerate(core_sets)
+        ]
+
+        futures = []
+        for executor, cpus in zip(self._executors, core_sets):
+            threads = len(cpus) if cpus else (n_threads or None)
+            futures.append(executor.submit(factory, threads))
+        self._contexts: List[LLM] = [f.result() for f in futures]
+
+        self._cond = threading.Condition()
+        self._free: Deque[int] = deque(range(size))
+        self._waiting = 0
+        # Moving average of generation time, for wait prediction.
+        self._avg_generation_s: Optional[float] = None
+
+        logger.info(
+            "LLM context pool ready",
+            extra={"trace_id": "", "size": size, "pinned": pin_cores, "cores": [sorted(c) if c else None for c in core_sets]},
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self._contexts)
+
+    def predicted_wait_s(self) -> float:
+        """Rough time a new request would wait for a free context.
+
+        Assumes every busy context has a full generation left and waiting
+        requests are served in order.
+        """
+        with self._cond:
+            ahead = self.size - len(self._free) + self._waiting
+            avg = self._avg_generation_s
+        if avg is None or ahead < self.size:
+            return 0.0
+        return (1 + (ahead - self.size) // self.size) * avg
+
+    def _acquire(self, cancel: Optional[CancelToken]) -> int:
+        def wake() -> None:
+            with self._cond:
+                self._cond.notify_all()
+
+        if cancel is not None:
+            cancel.add_callback(wake)
+        try:
+            with self._cond:
+                self._waiting += 1
+                try:
+                    while not self._free:
+                        if cancel is not None and cancel.is_cancelled():
+                            raise GenerationCancelled()
+                        self._cond.wait()
+                    if cancel is not None and cancel.is_cancelled():
+                        raise GenerationCancelled()
+                    return self._free.popleft()
+                finally:
+                    self._waiting -= 1
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(wake)
+
+    def _release(self, slot: int) -> None:
+        with self._cond:
+            self._free.append(slot)
+            # Wake everyone: a waiter picked by notify() may have been cancelled.
+            self._cond.notify_all()
+
+    def generate(
+        self,
+        prompt: str,
+        endpoint: str = "",
+        max_tokens: Optional[int] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> str:
+        slot = self._acquire(cancel)
+        started = time.monotonic()
+        try:
+            ctx = self._contexts[slot]
+            return self._executors[slot].submit(ctx.generate, prompt, endpoint, max_tokens, json_schema, cancel).result()
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                avg = self._avg_generation_s
+                self._avg_generation_s = elapsed if avg is None else 0.8 * avg + 0.2 * elapsed
+            self._release(slot)
+
+    def count_tokens(self, text: str) -> int:
+        # Tokenization only reads the shared vocabulary.
+        return self._contexts[0].count_tokens(text)
@@ -1,18 +1,30 @@
 import asyncio
 import logging
+import signal
+import time
 from typing import Optional
 
 from common.config import AppSettings
 from common.logging import setup_logging
+from common.rabbit.cancellation import CancelListener, CancelRegistry
 from common.rabbit.connection import connect
 from common.rabbit.rpc_server import RpcServer
+from common.vectorstore.embedded import AsyncEmbeddedVectorStore, EmbeddedVectorStore
 
+from rag_service.collection_watch import watch_collection
 from rag_service.embedder import QueryEmbedder
-from rag_service.qdrant_repo import QdrantSearchRepository
+from rag_service.embed_batcher import EmbeddingBatcher
+from rag_service.extractive import ExtractiveSummarizer
+from rag_service.facets import FacetCatalog, watch_catalog
+from rag_service.qdrant_repo import AsyncQdrantSearchRepository
+from rag_service.planner import FacetCounts
 from rag_service.retriever import Retriever
 from rag_service.prompt_builder import PromptBuilder
+from rag_service.prompt_packer import PromptPacker
 from rag_service.llm import LlamaCppLLM
+from rag_service.llm_pool import LlamaContextPool
 from rag_service.mapper import ContractMapper
+from rag_service.quiz import QuizFormat
 from rag_service.service import RagService
 
 
@@ -20,86 +32,231 @@ logger = logging.getLogger(__name__)
 
 
 async def main() -> None:
+    started = time.perf_counter()
     settings = AppSettings()
     setup_logging(settings.log_level)
 
     conn = await connect(settings.amqp_url)
 
+    qrepo = AsyncQdrantSearchRepository(
+        settings.qdrant_host,
+        settings.qdrant_port,
+        settings.qdrant_collection,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port,
+        timeout_s=settings.qdrant_timeout_s,
+        retries=settings.qdrant_retries,
+        pool_size=settings.qdrant_pool_size,
+        client=(
+            AsyncEmbeddedVectorStore(EmbeddedVectorStore(settings.vector_store_path, read_only=True))
+            if settings.vector_backend == "embedded"
+            else None
+        ),
+    )
+
+    # The facet catalog needs only Qdrant, so it is served during LLM warmup too.
+    facet_catalog = FacetCatalog()
+    facet_counts = FacetCounts(qrepo, ttl_s=settings.rag_facet_cache_ttl_s)
+
     # Heavy init (LLM load) can take a long time; start consumers immediately
     # so we don't accumulate unconsumed messages in RabbitMQ.
+    # Retrieval (embedder + Qdrant) is ready in seconds and serves search in
+    # degraded (extractive) mode and recommend; the LLM is attached when loaded.
     rag_ready = asyncio.Event()
     rag_holder: dict = {"rag": None}  # type: ignore[var-annotated]
 
-    async def init_rag() -> None:
-        logger.info("Initializing RAG components (LLM warmup may take a while)", extra={"trace_id": ""})
-        llm = LlamaCppLLM(
+    def log_ready(component: str, t0: float) -> None:
+        now = time.perf_counter()
+        logger.info(
+            "Startup component ready",
+            extra={
+                "trace_id": "",
+                "component": component,
+                "took_ms": round((now - t0) * 1000),
+                "since_start_ms": round((now - started) * 1000),
+            },
+        )
+
+    def make_context(n_threads: Optional[int]) -> LlamaCppLLM:
+        return LlamaCppLLM(
             model_path=settings.llm_model_path,
             n_ctx=settings.llm_n_ctx,
             max_tokens=settings.llm_max_tokens,
             temperature=settings.llm_temperature,
             top_p=settings.llm_top_p,
             n_gpu_layers=settings.llm_n_gpu_layers,
+            speculative_mode=settings.llm_speculative_mode,
+            speculative_endpoints=settings.speculative_endpoints_list(),
+            num_pred_tokens=settings.llm_speculative_num_pred_tokens,
+            max_ngram_size=settings.llm_speculative_max_ngram,
+            draft_model_path=settings.llm_draft_model_path,
+            n_threads=n_threads,
         )
 
-        embedder = QueryEmbedder(settings.embed_model)
-        qrepo = QdrantSearchRepository(settings.qdrant_host, settings.qdrant_port, settings.qdrant_collection)
-        retriever = Retriever(qrepo)
-        rag_holder["rag"] = RagService(
+    async def load_llm() -> LlamaContextPool:
+        t0 = time.perf_counter()
+        llm = await asyncio.to_thread(
+            LlamaContextPool,
+            make_context,
+            size=settings.llm_pool_size,
+            n_threads=settings.llm_n_threads,
+            pin_cores=settings.llm_pin_cores,
+        )
+        log_ready("llm", t0)
+        return llm
+
+    async def load_embedder() -> QueryEmbedder:
+        t0 = time.perf_counter()
+        embedder = await asyncio.to_thread(QueryEmbedder, settings.embed_model, batch_size=settings.embed_batch_size)
+        log_ready("embedder", t0)
+        return embedder
+
+    async def init_rag() -> None:
+        logger.info("Initializing RAG components (LLM warmup may take a while)", extra={"trace_id": ""})
+        # Independent loads run side by side: the GGUF model and the encoder
+        # (torch import + weights) each take seconds to minutes.
+        llm_task = asyncio.create_task(load_llm())
+        query_embedder = await load_embedder()
+
+        embedder = EmbeddingBatcher(
+            query_embedder,
+            window_ms=settings.embed_batch_window_ms,
+            max_batch=settings.embed_batch_max_size,
+        )
+        retriever = Retriever(
+            qrepo,
+            mode=settings.rag_retrieval_mode,
+            chunks_per_article=settings.rag_chunks_per_article,
+            facets=facet_counts,
+            exact_threshold=settings.rag_exact_search_threshold,
+        )
+        rag = RagService(
             embedder=embedder,
             qrepo=qrepo,
             retriever=retriever,
-            llm=llm,
+            llm=None,
             prompt_builder=PromptBuilder(),
+            prompt_packer=None,
             mapper=ContractMapper(),
+            quiz_format=QuizFormat(
+                structured=settings.quiz_structured,
+                base_tokens=settings.llm_quiz_base_tokens,
+                tokens_per_question=settings.llm_quiz_tokens_per_question,
+                max_tokens_cap=settings.llm_n_ctx // 2,
+            ),
+            use_abstracts=settings.rag_use_abstracts,
+            extractive=ExtractiveSummarizer(embedder, max_sentences=settings.rag_extractive_sentences),
+            degrade_wait_s=settings.rag_degrade_wait_s,
         )
+        rag_holder["rag"] = rag
         rag_ready.set()
-        logger.info("RAG components initialized", extra={"trace_id": ""})
+        log_ready("retrieval", started)
 
-    # Ensure GPU/LLM single-threaded execution across queues
-    gpu_lock = asyncio.Lock()
+        try:
+            llm = await llm_task
+        except Exception:
+            # Search keeps answering in degraded mode; quiz stays unavailable.
+            logger.exception("LLM load failed", extra={"trace_id": ""})
+            return
+        rag.attach_llm(
+            llm,
+            PromptPacker(
+                count_tokens=llm.count_tokens,
+                n_ctx=settings.llm_n_ctx,
+                max_new_tokens=settings.llm_max_tokens,
+                input_budget=settings.llm_prompt_token_budget,
+            ),
+        )
+        log_ready("rag", started)
 
-    async def get_rag() -> Optional[RagService]:
+    async def get_rag(need_llm: bool = False) -> Optional[RagService]:
         if not rag_ready.is_set():
             # Do not block the queue indefinitely; reply with a clear message.
             return None
-        return rag_holder["rag"]
+        rag = rag_holder["rag"]
+        if need_llm and not rag.llm_ready:
+            return None
+        return rag
 
     async def search_handler(payload: dict, meta: dict) -> dict:
         rag = await get_rag()
         if rag is None:
-            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте через 30–60 секунд.", "articles": []}
-        async with gpu_lock:
-            return rag.search(payload, trace_id=meta.get("trace_id", ""))
+            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте через 30–60 секунд.", "articles": [], "error": "warmup"}
+        # Qdrant calls are async; embedding, packing and generation run off the
+        # event loop, and LLM concurrency is bounded by the context pool.
+        return await rag.search(payload, trace_id=meta.get("trace_id", ""), cancel=meta.get("cancel"))
 
     async def recommend_handler(payload: dict, meta: dict) -> dict:
         rag = await get_rag()
         if rag is None:
-            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте позже.", "articles": []}
-        async with gpu_lock:
-            return rag.recommend(payload, trace_id=meta.get("trace_id", ""))
+            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте позже.", "articles": [], "error": "warmup"}
+        return await rag.recommend(payload, trace_id=meta.get("trace_id", ""))
 
     async def quiz_handler(payload: dict, meta: dict) -> dict:
-        rag = await get_rag()
+        rag = await get_rag(need_llm=True)
+        if rag is None:
+            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте позже.", "articles": [], "error": "warmup"}
+        return await rag.quiz(payload, trace_id=meta.get("trace_id", ""), cancel=meta.get("cancel"))
+
+    async def search_batch_handler(payload: dict, meta: dict) -> dict:
+        rag = await get_rag(need_llm=bool(payload.get("summarize")))
         if rag is None:
-            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте позже.", "articles": []}
-        async with gpu_lock:
-            return rag.quiz(payload, trace_id=meta.get("trace_id", ""))
+            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте позже.", "results": [], "error": "warmup"}
+        return await rag.search_batch(payload, trace_id=meta.get("trace_id", ""), cancel=meta.get("cancel"))
 
+    async def facets_handler(payload: dict, meta: dict) -> dict:
+        return facet_catalog.answer(payload)
+
+    # Callers publish cancel notices for abandoned calls; in-flight generations
+    # stop at the next token and queued ones never start.
+    cancels = CancelRegistry()
+    await CancelListener(conn, settings.rag_cancel_exchange, cancels, required_api_key=settings.service_api_key).start()
+
+    def server(queue: str, routing_key: str, handler, concurrency: int) -> RpcServer:
+        return RpcServer(
+            conn,
+            settings.rag_rpc_exchange,
+            queue,
+            routing_key,
+            handler,
+            prefetch_count=concurrency * settings.rpc_prefetch_per_worker,
+            max_concurrency=concurrency,
+            required_api_key=settings.service_api_key,
+            cancel_registry=cancels,
+            compress_threshold=settings.rpc_compress_threshold,
+        )
+
+    # Each queue gets its own handler limit, so a burst of slow quiz calls
+    # cannot take the slots search and recommend need.
     servers = [
-        RpcServer(conn, settings.rag_rpc_exchange, "rag.search.q", settings.rag_search_routing_key, search_handler, prefetch_count=1, required_api_key=settings.service_api_key),
-        RpcServer(conn, settings.rag_rpc_exchange, "rag.recommend.q", settings.rag_recommend_routing_key, recommend_handler, prefetch_count=1, required_api_key=settings.service_api_key),
-        RpcServer(conn, settings.rag_rpc_exchange, "rag.quiz.q", settings.rag_quiz_routing_key, quiz_handler, prefetch_count=1, required_api_key=settings.service_api_key),
+        server("rag.search.q", settings.rag_search_routing_key, search_handler, settings.rpc_search_concurrency),
+        server("rag.recommend.q", settings.rag_recommend_routing_key, recommend_handler, settings.rpc_recommend_concurrency),
+        server("rag.quiz.q", settings.rag_quiz_routing_key, quiz_handler, settings.rpc_quiz_concurrency),
+        server("rag.search_batch.q", settings.rag_search_batch_routing_key, search_batch_handler, settings.rpc_search_batch_concurrency),
+        server("rag.facets.q", settings.rag_facets_routing_key, facets_handler, settings.rpc_facets_concurrency),
     ]
 
     for s in servers:
         await s.start()
+    log_ready("consumers", started)
 
     # kick off warmup after consumers are online
     asyncio.create_task(init_rag())
+    asyncio.create_task(watch_catalog(facet_catalog, qrepo, settings.facets_refresh_s))
+    asyncio.create_task(watch_collection(qrepo, settings.collection_refresh_s, on_change=[facet_counts.clear]))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
 
     logger.info("rag-service running", extra={"trace_id": ""})
-    # keep alive
-    await asyncio.Event().wait()
+    await stop.wait()
+
+    # Graceful drain: finish running handlers, requeue the ones not started yet.
+    logger.info("rag-service stopping", extra={"trace_id": ""})
+    await asyncio.gather(*(s.stop(settings.rpc_drain_timeout_s) for s in servers))
+    await conn.close()
 
 
 if __name__ == "__main__":
@@ -1,17 +1,33 @@
-from typing import Any, Dict, List
-from common.contracts.models import ArticleItem, RagResponse
+from typing import Any, Dict, List, Optional
+from common.contracts.models import QuizQuestion
 
 
 class ContractMapper:
-    def to_contract(self, summary: str, articles: List[Dict[str, Any]]) -> Dict[str, Any]:
-        items = []
-        for a in articles:
-            items.append(ArticleItem(
-                title=a["title"],
-                url=a["url"],
-                author=a.get("author", "") or "",
-                date=a.get("date", "") or "",
-                topic=a.get("topic", "") or "",
-            ))
-        resp = RagResponse(summary=summary, articles=items)
-        return resp.model_dump()
+    """Builds the RagResponse contract as plain dicts.
+
+    Inputs are our own retrieval results, so the response is assembled
+    directly instead of going through ArticleItem/RagResponse validation and
+    ``model_dump``; the shape matches ``RagResponse.model_dump(exclude_none=True)``.
+    """
+
+    def to_contract(
+        self,
+        summary: str,
+        articles: List[Dict[str, Any]],
+        quiz: Optional[List[QuizQuestion]] = None,
+        degraded: bool = False,
+    ) -> Dict[str, Any]:
+        items = [
+            {
+                "title": a.get("title", "") or "",
+                "url": a.get("url", "") or "",
+                "author": a.get("author", "") or "",
+                "date": a.get("date", "") or "",
+                "topic": a.get("topic", "") or "",
+            }
+            for a in articles
+        ]
+        resp: Dict[str, Any] = {"summary": summary, "articles": items, "degraded": degraded}
+        if quiz is not None:
+            resp["quiz"] = [q.model_dump() for q in quiz]
+        return resp
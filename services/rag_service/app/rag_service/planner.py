@@ -0,0 +1,85 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http.models import FieldCondition, Filter, MatchAny, MatchValue
+
+from rag_service.domain import RetrievedChunk
+
+
+logger = logging.getLogger(__name__)
+
+
+def _condition_key(cond: Any) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+    """Cache key for a single-field match or range condition; None if it is not countable."""
+    if not isinstance(cond, FieldCondition):
+        return None
+    if isinstance(cond.match, MatchValue):
+        return cond.key, (cond.match.value,)
+    if isinstance(cond.match, MatchAny):
+        return cond.key, tuple(sorted(cond.match.any))
+    if cond.range is not None:
+        r = cond.range
+        return cond.key, ("range", r.gt, r.gte, r.lt, r.lte)
+    return None
+
+
+class FacetCounts:
+    """Cached chunk counts per filter value (``author_norm=...``, a ``pub_epoch_day`` range).
+
+    Counts are taken with Qdrant ``count`` on the payload indexes the first time
+    a value is seen and kept for ``ttl_s``. The estimate for a filter is the
+    smallest count among its ``must`` conditions: an upper bound on the number
+    of matching chunks (``must_not`` only removes more).
+    """
+
+    def __init__(self, repo, ttl_s: float = 300.0, max_entries: int = 10000) -> None:
+        self._repo = repo
+        self._ttl_s = ttl_s
+        self._max_entries = max_entries
+        self._counts: Dict[Tuple[str, Tuple[Any, ...]], Tuple[int, float]] = {}
+
+    async def _count(self, key: Tuple[str, Tuple[Any, ...]], cond: FieldCondition) -> int:
+        now = time.monotonic()
+        cached = self._counts.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        n = await self._repo.count(Filter(must=[cond]))
+        if len(self._counts) >= self._max_entries:
+            self._counts.clear()
+        self._counts[key] = (n, now + self._ttl_s)
+        return n
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+    async def estimate(self, qfilter: Optional[Filter]) -> Optional[int]:
+        """Upper bound on matching chunks, or None when the filter does not narrow."""
+        if qfilter is None or not qfilter.must:
+            return None
+        must = qfilter.must if isinstance(qfilter.must, list) else [qfilter.must]
+        best: Optional[int] = None
+        for cond in must:
+            key = _condition_key(cond)
+            if key is None:
+                continue
+            n = await self._count(key, cond)
+            best = n if best is None else min(best, n)
+            if best == 0:
+                break
+        return best
+
+
+def score_exact(query_vec: List[float], points: List[Tuple[Dict[str, Any], List[float]]]) -> List[RetrievedChunk]:
+    """Cosine-score every point against the query; best first."""
+    if not points:
+        return []
+    q = np.asarray(query_vec, dtype=np.float32)
+    q /= np.linalg.norm(q) or 1.0
+    mat = np.asarray([v for _, v in points], dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1)
+    norms[norms == 0] = 1.0
+    scores = (mat @ q) / norms
+    order = np.argsort(-scores)
+    return [RetrievedChunk(float(scores[i]), points[i][0]) for i in order]
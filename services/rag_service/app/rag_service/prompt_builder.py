@@ -30,20 +30,46 @@ class PromptBuilder:
 Сформируй аннотационное резюме по запросу.
 """
 
-    def build_quiz(self, query: str, sources: List[Dict[str, Any]], n_questions: int = 6) -> str:
+    def build_abstract(self, title: str, text: str) -> str:
+        return f"""Ты — редактор технологического СМИ. Напиши аннотацию статьи: 2–3 предложения, только факты из текста, без вступлений и оценок.
+
+Заголовок: {title}
+
+Текст:
+{text}
+
+Аннотация:
+"""
+
+    def build_quiz(self, query: str, sources: List[Dict[str, Any]], n_questions: int = 6, structured: bool = False) -> str:
         blocks = []
         for i, s in enumerate(sources, start=1):
             blocks.append(f"[{i}] {s['title']}\nURL: {s['url']}\nФрагменты:\n{s['excerpt']}\n")
 
-        rules = (
-            "Ты — AI-агент. Сгенерируй мини-тест по материалам источников.\n"
-            "Правила:\n"
-            "- Используй только источники ниже, не выдумывай.\n"
-            "- Каждый вопрос должен иметь ссылку [n] на источник.\n"
-            "- Формат: Вопрос, 4 варианта (A–D), правильный ответ, краткое объяснение.\n"
-            f"- Количество вопросов: {n_questions}.\n"
-            "- В конце: Источники: [1][2]...[k]\n"
-        )
+        if structured:
+            rules = (
+                "Ты — AI-агент. Сгенерируй мини-тест по материалам источников.\n"
+                "Правила:\n"
+                "- Используй только источники ниже, не выдумывай.\n"
+                f"- Количество вопросов: {n_questions}.\n"
+                "- Ответ — только JSON без пояснений: "
+                '{"questions": [{"question": "...", "options": ["...", "...", "...", "..."], '
+                '"answer": "A", "explanation": "...", "source": 1}]}\n'
+                "- options — ровно 4 варианта (A–D по порядку), answer — буква правильного варианта,\n"
+                "  explanation — одно короткое предложение, source — номер источника [n].\n"
+            )
+            task = "Сгенерируй тест в формате JSON."
+        else:
+            rules = (
+                "Ты — AI-агент. Сгенерируй мини-тест по материалам источников.\n"
+                "Правила:\n"
+                "- Используй только источники ниже, не выдумывай.\n"
+                "- Каждый вопрос должен иметь ссылку [n] на источник.\n"
+                "- Формат: Вопрос, 4 варианта (A–D), правильный ответ, краткое объяснение.\n"
+                f"- Количество вопросов: {n_questions}.\n"
+                "- В конце: Источники: [1][2]...[k]\n"
+            )
+            task = "Сгенерируй тест."
 
         return f"""{rules}
 Запрос: {query}
@@ -51,5 +77,5 @@ class PromptBuilder:
 Источники:
 {chr(10).join(blocks)}
 
-Сгенерируй тест.
+{task}
 """
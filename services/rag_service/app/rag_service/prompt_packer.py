@@ -0,0 +1,120 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from rag_service.domain import PackedPrompt
+
+
+EXCERPT_SEPARATOR = "\n---\n"
+
+# Chunks are cut by characters, so a "sentence" here is just the text up to
+# the next terminal punctuation mark.
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+class PromptPacker:
+    """Fits source excerpts into the LLM input-token budget.
+
+    Sources are expected in relevance order (as produced by the retriever) and
+    carry their raw chunk texts in ``texts``. Excerpts are filled round-robin:
+    every source gets its best chunk before any source gets a second one, and
+    the chunk that does not fit is trimmed at a sentence boundary.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        n_ctx: int,
+        max_new_tokens: int,
+        input_budget: int = 0,
+        reserve_tokens: int = 64,
+    ) -> None:
+        self._count = count_tokens
+        self._n_ctx = n_ctx
+        self._max_new_tokens = max_new_tokens
+        self._input_budget = input_budget
+        self._reserve = reserve_tokens
+
+    def budget_for(self, max_new_tokens: Optional[int] = None) -> int:
+        new_tokens = self._max_new_tokens if max_new_tokens is None else max_new_tokens
+        ceiling = self._n_ctx - new_tokens - self._reserve
+        if self._input_budget > 0:
+            return min(self._input_budget, ceiling)
+        return ceiling
+
+    def pack(
+        self,
+        build: Callable[[List[Dict[str, Any]]], str],
+        sources: List[Dict[str, Any]],
+        max_new_tokens: Optional[int] = None,
+    ) -> PackedPrompt:
+        budget = self.budget_for(max_new_tokens)
+
+        # Headers (title/url/author...) are always kept; if even they do not fit,
+        # drop the least relevant sources. The caller trims its article list to
+        # ``n_sources`` so that [n] citations keep pointing at articles[n-1].
+        kept = list(sources)
+        base = self._count(build(self._with_excerpts(kept, [[] for _ in kept])))
+        while base > budget and len(kept) > 1:
+            kept.pop()
+            base = self._count(build(self._with_excerpts(kept, [[] for _ in kept])))
+
+        pieces: List[List[str]] = [[] for _ in kept]
+        remaining = budget - base
+        sep_cost = self._count(EXCERPT_SEPARATOR)
+        order = sorted(range(len(kept)), key=lambda i: kept[i].get("score", 0.0), reverse=True)
+        depth_max = max((len(s.get("texts") or []) for s in kept), default=0)
+
+        for depth in range(depth_max):
+            for i in order:
+                texts = kept[i].get("texts") or []
+                if depth >= len(texts) or remaining <= 0:
+                    continue
+                text = (texts[depth] or "").strip()
+                if not text:
+                    continue
+                overhead = sep_cost if pieces[i] else 0
+                cost = self._count(text) + overhead
+                if cost > remaining:
+                    text, cost = self._trim(text, remaining - overhead)
+                    cost += overhead
+                if text:
+                    pieces[i].append(text)
+                    remaining -= cost
+
+        # Per-piece counts are an estimate of the joined prompt; verify and
+        # shorten the least relevant pieces until the real count fits.
+        prompt = build(self._with_excerpts(kept, pieces))
+        used = self._count(prompt)
+        while used > budget and any(pieces):
+            i = next(i for i in reversed(order) if pieces[i])
+            last = pieces[i].pop()
+            shorter, _ = self._trim(last, self._count(last) - (used - budget))
+            if shorter and shorter != last:
+                pieces[i].append(shorter)
+            prompt = build(self._with_excerpts(kept, pieces))
+            used = self._count(prompt)
+
+        return PackedPrompt(
+            prompt=prompt,
+            prompt_tokens=used,
+            budget=budget,
+            n_sources=len(kept),
+            n_excerpts=sum(len(p) for p in pieces),
+        )
+
+    def _trim(self, text: str, limit: int) -> tuple[str, int]:
+        if limit <= 0:
+            return "", 0
+        out = ""
+        out_cost = 0
+        for sentence in SENTENCE_END.split(text):
+            candidate = f"{out} {sentence}" if out else sentence
+            cost = self._count(candidate)
+            if cost > limit:
+                break
+            out, out_cost = candidate, cost
+        return out, out_cost
+
+    @staticmethod
+    def _with_excerpts(sources: List[Dict[str, Any]], pieces: List[List[str]]) -> List[Dict[str, Any]]:
+        return [dict(s, excerpt=EXCERPT_SEPARATOR.join(p)) for s, p in zip(sources, pieces)]
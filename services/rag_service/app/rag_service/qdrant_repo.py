@@ -1,14 +1,87 @@
-from typing import Any, Dict, List, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny
+import asyncio
+import datetime as dt
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny, Range, SearchRequest
+
+from common.contracts.articles import articles_collection
+from common.contracts.catalog import FACETS_POINT_ID, meta_collection
+
+from rag_service.domain import RetrievedChunk
+
+try:
+    import grpc
+    from grpc import aio as grpc_aio
+except ImportError:  # grpcio ships with qdrant-client; only needed with prefer_grpc
+    grpc = grpc_aio = None  # type: ignore[assignment]
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Payload fields rag-service actually reads from a chunk; everything else
+# (normalized keys, topic lists, raw dates) is only needed by filters. Chunks
+# now hold article_id/chunk_id/text only; title..abstract are read from
+# collections indexed before the article store (common.contracts.articles).
+SEARCH_PAYLOAD_FIELDS = ["article_id", "chunk_id", "title", "url", "author", "pub_day", "subtopic_raw", "text", "abstract"]
+
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+def epoch_day(day: dt.date) -> int:
+    """Days since 1970-01-01, as stored in the ``pub_epoch_day`` payload field."""
+    return day.toordinal() - _EPOCH_ORDINAL
+
+
+def _hit(h: Any) -> RetrievedChunk:
+    return RetrievedChunk(float(h.score), h.payload or {})
+
+
+def _vector(point: Any) -> List[float]:
+    vec = point.vector
+    # qdrant-client may return dict or list depending on config
+    if isinstance(vec, dict):
+        # take first vector
+        return list(next(iter(vec.values())))
+    return list(vec)
+
+
+def _articles_filter(article_ids: List[str], per_article: int) -> Filter:
+    # chunk_id is a 0-based position, so "< per_article" selects each article's
+    # first chunks; both fields have payload indexes (see indexer).
+    return Filter(must=[
+        FieldCondition(key="article_id", match=MatchAny(any=list(article_ids))),
+        FieldCondition(key="chunk_id", range=Range(lt=per_article)),
+    ])
+
+
+def _group_articles(points: List[Any], with_vectors: bool) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for p in points:
+        payload = p.payload or {}
+        item = {"id": p.id, "payload": payload}
+        if with_vectors:
+            item["vector"] = _vector(p)
+        out.setdefault(payload.get("article_id", ""), []).append(item)
+    for chunks in out.values():
+        chunks.sort(key=lambda c: int(c["payload"].get("chunk_id", 0)))
+    return out
 
 
 class QdrantSearchRepository:
-    def __init__(self, host: str, port: int, collection: str) -> None:
-        self._client = QdrantClient(host=host, port=port)
+    def __init__(self, host: str, port: int, collection: str, client: Optional[Any] = None) -> None:
+        # ``client``: any QdrantClient-compatible object, e.g. EmbeddedVectorStore.
+        self._client = client if client is not None else QdrantClient(host=host, port=port)
         self._collection = collection
 
-    def search(self, vector: List[float], qfilter: Optional[Filter], limit: int) -> List[Dict[str, Any]]:
+    def search(self, vector: List[float], qfilter: Optional[Filter], limit: int) -> List[RetrievedChunk]:
         hits = self._client.search(
             collection_name=self._collection,
             query_vector=vector,
@@ -16,11 +89,18 @@ class QdrantSearchRepository:
             limit=limit,
             with_payload=True,
         )
-        out = []
-        for h in hits:
-            out.append({"score": float(h.score), "payload": h.payload or {}})
-        return out
+        return [_hit(h) for h in hits]
 
+    def search_batch(
+        self, vectors: List[List[float]], qfilters: List[Optional[Filter]], limit: int
+    ) -> List[List[RetrievedChunk]]:
+        """One round trip for many searches; results align with ``vectors``."""
+        requests = [
+            SearchRequest(vector=v, filter=f, limit=limit, with_payload=True)
+            for v, f in zip(vectors, qfilters)
+        ]
+        batches = self._client.search_batch(collection_name=self._collection, requests=requests)
+        return [[_hit(h) for h in hits] for hits in batches]
 
     def retrieve_vector(self, point_id: str) -> Optional[List[float]]:
         pts = self._client.retrieve(
@@ -31,12 +111,7 @@ class QdrantSearchRepository:
         )
         if not pts:
             return None
-        vec = pts[0].vector
-        # qdrant-client may return dict or list depending on config
-        if isinstance(vec, dict):
-            # take first vector
-            return list(next(iter(vec.values())))
-        return list(vec)
+        return _vector(pts[0])
 
     def scroll_payloads(self, qfilter: Filter, limit: int = 10) -> List[Dict[str, Any]]:
         points, _ = self._client.scroll(
@@ -51,15 +126,287 @@ class QdrantSearchRepository:
             out.append({"id": p.id, "payload": p.payload or {}})
         return out
 
+    def fetch_articles(
+        self, article_ids: List[str], per_article: int = 3, with_vectors: bool = False
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """First ``per_article`` chunks of each article in one request.
+
+        Returns ``{article_id: [{"id", "payload"[, "vector"]}, ...]}`` ordered by
+        chunk_id; articles that are not indexed are absent.
+        """
+        if not article_ids:
+            return {}
+        points, _ = self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=_articles_filter(article_ids, per_article),
+            limit=len(article_ids) * per_article,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=with_vectors,
+        )
+        return _group_articles(points, with_vectors)
+
+    def count(self, qfilter: Optional[Filter]) -> int:
+        return self._client.count(collection_name=self._collection, count_filter=qfilter, exact=True).count
+
+    def scroll_vectors(self, qfilter: Optional[Filter], limit: int) -> List[Tuple[Dict[str, Any], List[float]]]:
+        """Up to ``limit`` matching chunks as ``(payload, vector)`` pairs, for exact scoring."""
+        points, _ = self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=qfilter,
+            limit=limit,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=True,
+        )
+        return [(p.payload or {}, _vector(p)) for p in points]
+
+    def load_catalog(self, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Facet catalog published by the indexer (only ``fields`` if given); None if absent."""
+        meta = meta_collection(self._collection)
+        if not self._client.collection_exists(meta):
+            return None
+        pts = self._client.retrieve(collection_name=meta, ids=[FACETS_POINT_ID], with_payload=fields or True, with_vectors=False)
+        return (pts[0].payload or {}) if pts else None
+
+    def fetch_article_meta(self, article_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Article records by id from the article store; articles without one are absent."""
+        name = articles_collection(self._collection)
+        if not article_ids or not self._client.collection_exists(name):
+            return {}
+        pts = self._client.retrieve(collection_name=name, ids=article_ids, with_payload=True, with_vectors=False)
+        return {str(p.id): p.payload or {} for p in pts}
+
+    def set_article_payload(self, article_id: str, payload: Dict[str, Any]) -> None:
+        """Merge ``payload`` into an article's record (offline stages such as abstracts).
+
+        Articles indexed before the article store get it in every chunk instead.
+        """
+        if self.fetch_article_meta([article_id]):
+            self._client.set_payload(
+                collection_name=articles_collection(self._collection), payload=payload, points=[article_id]
+            )
+            return
+        self._client.set_payload(
+            collection_name=self._collection,
+            payload=payload,
+            points=Filter(must=[FieldCondition(key="article_id", match=MatchValue(value=article_id))]),
+        )
+
     @staticmethod
-    def build_filter(author: Optional[str], day: Optional[str], topic: Optional[str]) -> Optional[Filter]:
+    def build_filter(
+        author: Optional[str],
+        day: Optional[str],
+        topic: Optional[str],
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+    ) -> Optional[Filter]:
         must = []
         if author:
             must.append(FieldCondition(key="author_norm", match=MatchValue(value=author.strip().lower())))
         if day:
             must.append(FieldCondition(key="pub_day", match=MatchValue(value=day.strip())))
+        if date_from or date_to:
+            # Inclusive day range over the integer index on pub_epoch_day.
+            must.append(FieldCondition(key="pub_epoch_day", range=Range(
+                gte=epoch_day(date_from) if date_from else None,
+                lte=epoch_day(date_to) if date_to else None,
+            )))
         if topic:
             must.append(FieldCondition(key="topics_norm", match=MatchAny(any=[topic.strip().lower()])))
         if not must:
             return None
         return Filter(must=must)
+
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, (ResponseHandlingException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code in (502, 503, 504)
+    if grpc is not None and isinstance(e, grpc_aio.AioRpcError):
+        return e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED)
+    return False
+
+
+class AsyncQdrantSearchRepository:
+    """Non-blocking counterpart of ``QdrantSearchRepository`` for rag-service.
+
+    One ``AsyncQdrantClient`` per process keeps its HTTP keep-alive pool (or
+    gRPC channel with ``prefer_grpc``) open across requests; gRPC avoids
+    JSON-decoding chunk payloads. Transient failures are retried with
+    exponential backoff.
+    """
+
+    build_filter = staticmethod(QdrantSearchRepository.build_filter)
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        collection: str,
+        prefer_grpc: bool = False,
+        grpc_port: int = 6334,
+        timeout_s: float = 10.0,
+        retries: int = 2,
+        retry_backoff_s: float = 0.1,
+        pool_size: int = 32,
+        client: Optional[Any] = None,
+    ) -> None:
+        # ``client``: any AsyncQdrantClient-compatible object, e.g. AsyncEmbeddedVectorStore.
+        self._client = client if client is not None else AsyncQdrantClient(
+            host=host,
+            port=port,
+            grpc_port=grpc_port,
+            prefer_grpc=prefer_grpc,
+            timeout=timeout_s,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._collection = collection
+        self._retries = retries
+        self._retry_backoff_s = retry_backoff_s
+        # Whether the article store exists; re-checked while it does not.
+        self._has_articles = False
+        self._articles_checked_at = float("-inf")
+
+    async def _call(self, op: str, fn: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self._retries + 1):
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt >= self._retries or not _is_transient(e):
+                    raise
+                delay = self._retry_backoff_s * (2 ** attempt)
+                logger.warning("Qdrant call failed, retrying", extra={"trace_id": "", "op": op, "attempt": attempt + 1, "err": str(e)})
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    async def search(self, vector: List[float], qfilter: Optional[Filter], limit: int) -> List[RetrievedChunk]:
+        hits = await self._call("search", lambda: self._client.search(
+            collection_name=self._collection,
+            query_vector=vector,
+            query_filter=qfilter,
+            limit=limit,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+        ))
+        return [_hit(h) for h in hits]
+
+    async def search_groups(
+        self, vector: List[float], qfilter: Optional[Filter], limit: int, group_size: int, group_by: str = "article_id"
+    ) -> List[List[RetrievedChunk]]:
+        """Top ``limit`` groups (articles) with their best ``group_size`` chunks each.
+
+        Groups come ordered by their best hit; hits within a group by score.
+        """
+        result = await self._call("search_groups", lambda: self._client.search_groups(
+            collection_name=self._collection,
+            query_vector=vector,
+            group_by=group_by,
+            query_filter=qfilter,
+            limit=limit,
+            group_size=group_size,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+        ))
+        return [[_hit(h) for h in g.hits] for g in result.groups]
+
+    async def search_batch(
+        self, vectors: List[List[float]], qfilters: List[Optional[Filter]], limit: int
+    ) -> List[List[RetrievedChunk]]:
+        requests = [
+            SearchRequest(vector=v, filter=f, limit=limit, with_payload=SEARCH_PAYLOAD_FIELDS)
+            for v, f in zip(vectors, qfilters)
+        ]
+        batches = await self._call("search_batch", lambda: self._client.search_batch(
+            collection_name=self._collection, requests=requests
+        ))
+        return [[_hit(h) for h in hits] for hits in batches]
+
+    async def retrieve_vector(self, point_id: str) -> Optional[List[float]]:
+        pts = await self._call("retrieve", lambda: self._client.retrieve(
+            collection_name=self._collection,
+            ids=[point_id],
+            with_vectors=True,
+            with_payload=False,
+        ))
+        if not pts:
+            return None
+        return _vector(pts[0])
+
+    async def scroll_payloads(self, qfilter: Filter, limit: int = 10) -> List[Dict[str, Any]]:
+        points, _ = await self._call("scroll", lambda: self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=qfilter,
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        ))
+        return [{"id": p.id, "payload": p.payload or {}} for p in points]
+
+    async def fetch_articles(
+        self, article_ids: List[str], per_article: int = 3, with_vectors: bool = False
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Async ``QdrantSearchRepository.fetch_articles``."""
+        if not article_ids:
+            return {}
+        points, _ = await self._call("fetch_articles", lambda: self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=_articles_filter(article_ids, per_article),
+            limit=len(article_ids) * per_article,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=with_vectors,
+        ))
+        return _group_articles(points, with_vectors)
+
+    async def fetch_article_meta(self, article_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Async ``QdrantSearchRepository.fetch_article_meta``; called for the final top-N only."""
+        if not article_ids:
+            return {}
+        name = articles_collection(self._collection)
+        now = time.monotonic()
+        if not self._has_articles and now - self._articles_checked_at > 60.0:
+            self._articles_checked_at = now
+            self._has_articles = await self._call("collection_exists", lambda: self._client.collection_exists(name))
+        if not self._has_articles:
+            return {}
+        pts = await self._call("fetch_article_meta", lambda: self._client.retrieve(
+            collection_name=name, ids=article_ids, with_payload=True, with_vectors=False
+        ))
+        return {str(p.id): p.payload or {} for p in pts}
+
+    async def live_collection(self) -> str:
+        """Collection the configured name resolves to: the alias target, or the name itself."""
+        if not hasattr(self._client, "get_aliases"):
+            return self._collection  # embedded store: no aliases
+        aliases = await self._call("get_aliases", lambda: self._client.get_aliases())
+        for a in aliases.aliases:
+            if a.alias_name == self._collection:
+                return a.collection_name
+        return self._collection
+
+    async def count(self, qfilter: Optional[Filter]) -> int:
+        result = await self._call("count", lambda: self._client.count(
+            collection_name=self._collection, count_filter=qfilter, exact=True
+        ))
+        return result.count
+
+    async def scroll_vectors(self, qfilter: Optional[Filter], limit: int) -> List[Tuple[Dict[str, Any], List[float]]]:
+        """Async ``QdrantSearchRepository.scroll_vectors``."""
+        points, _ = await self._call("scroll_vectors", lambda: self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=qfilter,
+            limit=limit,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=True,
+        ))
+        return [(p.payload or {}, _vector(p)) for p in points]
+
+    async def load_catalog(self, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Async ``QdrantSearchRepository.load_catalog``."""
+        meta = meta_collection(self._collection)
+        if not await self._call("collection_exists", lambda: self._client.collection_exists(meta)):
+            return None
+        pts = await self._call("load_catalog", lambda: self._client.retrieve(
+            collection_name=meta, ids=[FACETS_POINT_ID], with_payload=fields or True, with_vectors=False
+        ))
+        return (pts[0].payload or {}) if pts else None
@@ -0,0 +1,159 @@
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from common.contracts.models import QuizQuestion
+
+
+logger = logging.getLogger(__name__)
+
+OPTION_LETTERS = ["A", "B", "C", "D"]
+
+# Schema length limits (characters); the per-question token budget is derived
+# from them so a maximal question always fits.
+QUESTION_MAX_CHARS = 120
+OPTION_MAX_CHARS = 60
+EXPLANATION_MAX_CHARS = 120
+# Rough estimate, used only until the model's tokenizer is attached
+# (``QuizFormat.attach_tokenizer``); not measured.
+CHARS_PER_TOKEN = 2.5
+# Keys, quotes, brackets, answer letter and source number of one question.
+QUESTION_JSON_OVERHEAD_TOKENS = 40
+# Measured counts are for typical Russian wording; rarer words, numbers and
+# Latin terms split into more tokens.
+MEASURED_HEADROOM = 1.25
+
+_SAMPLE_TEXT = (
+    "Какой подход позволяет ускорить обучение нейросетевых моделей при ограниченных "
+    "вычислительных ресурсах и сохранить качество ответов на реальных данных? "
+)
+
+
+def schema_tokens_per_question() -> int:
+    chars = QUESTION_MAX_CHARS + 4 * OPTION_MAX_CHARS + EXPLANATION_MAX_CHARS
+    return int(chars / CHARS_PER_TOKEN) + QUESTION_JSON_OVERHEAD_TOKENS
+
+
+def measured_tokens_per_question(count_tokens: Callable[[str], int]) -> int:
+    """Tokens of one question with every field at its length limit, plus headroom."""
+
+    def fill(n: int) -> str:
+        return (_SAMPLE_TEXT * (n // len(_SAMPLE_TEXT) + 1))[:n]
+
+    question = {
+        "question": fill(QUESTION_MAX_CHARS),
+        "options": [fill(OPTION_MAX_CHARS)] * 4,
+        "answer": "A",
+        "explanation": fill(EXPLANATION_MAX_CHARS),
+        "source": 5,
+    }
+    return int(count_tokens(json.dumps(question, ensure_ascii=False) + ", ") * MEASURED_HEADROOM)
+
+
+class QuizFormat:
+    """Output format and token budget of the quiz endpoint.
+
+    In structured mode generation is constrained by a JSON schema grammar: the
+    model can only emit ``{"questions": [...]}`` with exactly ``n_questions``
+    items and stops as soon as the object is closed. The token budget scales
+    with ``n_questions`` instead of using the global LLM_MAX_TOKENS;
+    ``tokens_per_question=0`` derives it from the schema length limits,
+    counted with the model's tokenizer once it is attached.
+    """
+
+    def __init__(self, structured: bool, base_tokens: int, tokens_per_question: int, max_tokens_cap: int) -> None:
+        self.structured = structured
+        self._base_tokens = base_tokens
+        self._configured = tokens_per_question > 0
+        self._tokens_per_question = tokens_per_question or schema_tokens_per_question()
+        self._max_tokens_cap = max_tokens_cap
+
+    def attach_tokenizer(self, count_tokens: Callable[[str], int]) -> None:
+        if self._configured:
+            return
+        self._tokens_per_question = measured_tokens_per_question(count_tokens)
+        logger.info(
+            "Quiz budget measured",
+            extra={"trace_id": "", "tokens_per_question": self._tokens_per_question, "max_questions": self.max_questions()},
+        )
+
+    def max_questions(self) -> int:
+        """Most questions whose full budget fits under the cap."""
+        return max(1, (self._max_tokens_cap - self._base_tokens) // self._tokens_per_question)
+
+    def max_tokens(self, n_questions: int) -> int:
+        return min(self._max_tokens_cap, self._base_tokens + self._tokens_per_question * n_questions)
+
+    @staticmethod
+    def schema(n_questions: int, n_sources: int) -> Dict[str, Any]:
+        question = {
+            "type": "object",
+            "properties": {
+                "question": {"type": "string", "maxLength": QUESTION_MAX_CHARS},
+                "options": {
+                    "type": "array",
+                    "items": {"type": "string", "maxLength": OPTION_MAX_CHARS},
+                    "minItems": 4,
+                    "maxItems": 4,
+                },
+                "answer": {"type": "string", "enum": OPTION_LETTERS},
+                "explanation": {"type": "string", "maxLength": EXPLANATION_MAX_CHARS},
+                "source": {"type": "integer", "enum": list(range(1, n_sources + 1))},
+            },
+            "required": ["question", "options", "answer", "explanation", "source"],
+        }
+        return {
+            "type": "object",
+            "properties": {
+                "questions": {"type": "array", "items": question, "minItems": n_questions, "maxItems": n_questions},
+            },
+            "required": ["questions"],
+        }
+
+    @staticmethod
+    def _complete_items(text: str) -> List[Any]:
+        """Question objects that were fully emitted before the output was cut."""
+        start = text.find("[")
+        if start < 0:
+            return []
+        decoder = json.JSONDecoder()
+        items: List[Any] = []
+        i = start + 1
+        while True:
+            while i < len(text) and text[i] in " \t\r\n,":
+                i += 1
+            try:
+                obj, i = decoder.raw_decode(text, i)
+            except ValueError:
+                return items
+            items.append(obj)
+
+    @staticmethod
+    def parse(text: str, n_sources: int) -> Optional[List[QuizQuestion]]:
+        try:
+            items = json.loads(text)["questions"]
+        except Exception as e:
+            # Truncated output (token budget hit before the object was closed):
+            # keep the questions that are complete.
+            items = QuizFormat._complete_items(text)
+            logger.warning("Quiz JSON parse failed", extra={"trace_id": "", "err": str(e), "complete": len(items)})
+        questions = []
+        for item in items:
+            try:
+                q = QuizQuestion.model_validate(item)
+            except Exception:
+                continue
+            if 1 <= q.source <= n_sources:
+                questions.append(q)
+        return questions or None
+
+    @staticmethod
+    def render(questions: List[QuizQuestion]) -> str:
+        """Plain-text rendering for clients that only read ``summary``."""
+        lines = []
+        for i, q in enumerate(questions, start=1):
+            lines.append(f"{i}. {q.question} [{q.source}]")
+            for letter, option in zip(OPTION_LETTERS, q.options):
+                lines.append(f"   {letter}) {option}")
+            lines.append(f"   Ответ: {q.answer}. {q.explanation}")
+        return "\n".join(lines)
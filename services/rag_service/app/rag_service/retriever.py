@@ -1,37 +1,106 @@
-from typing import Any, Dict, List
+import logging
+from typing import Dict, List, Optional
+
 from rag_service.domain import RetrievedChunk, AggregatedArticle
+from rag_service.planner import FacetCounts, score_exact
+
+
+logger = logging.getLogger(__name__)
+
+
+RETRIEVAL_MODES = ("groups", "chunks")
 
 
 class Retriever:
-    def __init__(self, repo) -> None:
+    """Finds the most relevant articles for a query vector.
+
+    ``groups`` mode lets Qdrant group hits by ``article_id`` and return the best
+    chunks per article; ``chunks`` mode fetches top chunks and folds them here.
+
+    With ``facets`` set, a filter estimated to match at most ``exact_threshold``
+    chunks skips the ANN index: the matching chunks are fetched with their
+    vectors and scored exactly, which is faster and complete for narrow filters
+    (HNSW under a restrictive filter may return fewer hits than asked for).
+    """
+
+    def __init__(
+        self,
+        repo,
+        mode: str = "groups",
+        chunks_per_article: int = 3,
+        facets: Optional[FacetCounts] = None,
+        exact_threshold: int = 0,
+    ) -> None:
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
         self._repo = repo
+        self._mode = mode
+        self._chunks_per_article = chunks_per_article
+        self._facets = facets
+        self._exact_threshold = exact_threshold
 
-    def retrieve_chunks(self, query_vec: List[float], qfilter, limit_chunks: int) -> List[RetrievedChunk]:
-        hits = self._repo.search(query_vec, qfilter, limit=limit_chunks)
-        return [RetrievedChunk(score=h["score"], payload=h["payload"]) for h in hits]
+    async def _plan(self, qfilter, trace_id: str) -> bool:
+        """Whether exact scoring should be used for ``qfilter``."""
+        estimate = await self._facets.estimate(qfilter) if self._facets is not None and self._exact_threshold > 0 else None
+        exact = estimate is not None and estimate <= self._exact_threshold
+        logger.info(
+            "Retrieval plan",
+            extra={
+                "trace_id": trace_id,
+                "plan": "exact" if exact else "ann",
+                "mode": self._mode,
+                "estimate": estimate,
+                "threshold": self._exact_threshold,
+            },
+        )
+        return exact
+
+    async def retrieve_articles(
+        self, query_vec: List[float], qfilter, max_articles: int, trace_id: str = ""
+    ) -> List[AggregatedArticle]:
+        if await self._plan(qfilter, trace_id):
+            # The estimate comes from cached counts that may predate a re-index,
+            # so it only picks the plan: fetch one past the threshold and fall
+            # back to ANN if the filter turns out to be wider.
+            points = await self._repo.scroll_vectors(qfilter, limit=self._exact_threshold + 1)
+            if len(points) <= self._exact_threshold:
+                chunks = score_exact(query_vec, points)
+                return self.aggregate(chunks, max_articles=max_articles, max_texts_per_article=self._chunks_per_article)
+            logger.info("Exact plan exceeded threshold, using ANN", extra={"trace_id": trace_id, "threshold": self._exact_threshold})
+
+        if self._mode == "chunks":
+            chunks = await self.retrieve_chunks(query_vec, qfilter, limit_chunks=10 * max_articles)
+            return self.aggregate(chunks, max_articles=max_articles, max_texts_per_article=self._chunks_per_article)
+
+        groups = await self._repo.search_groups(query_vec, qfilter, limit=max_articles, group_size=self._chunks_per_article)
+        return [
+            AggregatedArticle(hits[0].score, hits[0].payload, [t for t in (h.payload.get("text") for h in hits) if t])
+            for hits in groups
+            if hits
+        ]
+
+    async def retrieve_chunks(self, query_vec: List[float], qfilter, limit_chunks: int) -> List[RetrievedChunk]:
+        return await self._repo.search(query_vec, qfilter, limit=limit_chunks)
+
+    async def retrieve_chunks_batch(self, query_vecs: List[List[float]], qfilters: List, limit_chunks: int) -> List[List[RetrievedChunk]]:
+        return await self._repo.search_batch(query_vecs, qfilters, limit=limit_chunks)
 
     def aggregate(self, chunks: List[RetrievedChunk], max_articles: int, max_texts_per_article: int = 3) -> List[AggregatedArticle]:
-        by_article: Dict[str, Dict[str, Any]] = {}
+        by_article: Dict[str, AggregatedArticle] = {}
         for ch in chunks:
             p = ch.payload
             aid = p.get("article_id")
             if not aid:
                 continue
+            text = p.get("text")
             item = by_article.get(aid)
             if item is None:
-                by_article[aid] = {
-                    "best_score": ch.score,
-                    "payload": p,
-                    "texts": [p.get("text", "")] if p.get("text") else [],
-                }
+                by_article[aid] = AggregatedArticle(ch.score, p, [text] if text else [])
             else:
-                item["best_score"] = max(item["best_score"], ch.score)
-                if p.get("text") and len(item["texts"]) < max_texts_per_article:
-                    item["texts"].append(p.get("text"))
+                if ch.score > item.best_score:
+                    item.best_score = ch.score
+                if text and len(item.texts) < max_texts_per_article:
+                    item.texts.append(text)
 
-        aggregated = [
-            AggregatedArticle(best_score=v["best_score"], payload=v["payload"], texts=v["texts"])
-            for v in by_article.values()
-        ]
-        aggregated.sort(key=lambda a: a.best_score, reverse=True)
+        aggregated = sorted(by_article.values(), key=lambda a: a.best_score, reverse=True)
         return aggregated[:max_articles]
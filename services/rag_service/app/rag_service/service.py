@@ -1,18 +1,24 @@
+import asyncio
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from pydantic import BaseModel, Field
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue
-from rag_service.domain import RetrievedChunk, AggregatedArticle
+from rag_service.domain import AggregatedArticle, PackedPrompt
 
-from common.contracts.models import RagRequest
+from common.contracts.models import RagBatchRequest, RagBatchResponse, RagRequest
+from common.rabbit.cancellation import CancelToken
 from rag_service.embedder import QueryEmbedder
-from rag_service.qdrant_repo import QdrantSearchRepository
+from rag_service.embed_batcher import EmbeddingBatcher
+from rag_service.extractive import ExtractiveSummarizer
+from rag_service.qdrant_repo import AsyncQdrantSearchRepository
 from rag_service.retriever import Retriever
 from rag_service.prompt_builder import PromptBuilder
+from rag_service.prompt_packer import PromptPacker
 from rag_service.llm import LLM
 from rag_service.mapper import ContractMapper
+from rag_service.quiz import QuizFormat
 
 
 logger = logging.getLogger(__name__)
@@ -31,25 +37,74 @@ class QuizRequest(BaseModel):
 class RagService:
     def __init__(
         self,
-        embedder: QueryEmbedder,
-        qrepo: QdrantSearchRepository,
+        embedder: Union[QueryEmbedder, EmbeddingBatcher],
+        qrepo: AsyncQdrantSearchRepository,
         retriever: Retriever,
-        llm: LLM,
+        llm: Optional[LLM],
         prompt_builder: PromptBuilder,
+        prompt_packer: Optional[PromptPacker],
         mapper: ContractMapper,
+        quiz_format: QuizFormat,
+        use_abstracts: bool = True,
+        extractive: Optional[ExtractiveSummarizer] = None,
+        degrade_wait_s: float = 0.0,
     ) -> None:
+        """``llm`` and ``prompt_packer`` may be attached later (``attach_llm``):
+        until then search answers in degraded (extractive) mode."""
         self._embedder = embedder
         self._qrepo = qrepo
         self._retriever = retriever
         self._llm = llm
         self._prompt_builder = prompt_builder
+        self._prompt_packer = prompt_packer
         self._mapper = mapper
+        self._quiz_format = quiz_format
+        self._use_abstracts = use_abstracts
+        self._extractive = extractive
+        self._degrade_wait_s = degrade_wait_s
+
+    def attach_llm(self, llm: LLM, prompt_packer: PromptPacker) -> None:
+        self._prompt_packer = prompt_packer
+        self._quiz_format.attach_tokenizer(llm.count_tokens)
+        self._llm = llm
 
-    def _build_sources(self, aggregated, limit_articles: int) -> tuple[list[dict], list[dict]]:
+    @property
+    def llm_ready(self) -> bool:
+        return self._llm is not None
+
+    def _degrade_reason(self, req: RagRequest) -> Optional[str]:
+        """Why this search should skip the LLM, or None to generate."""
+        if not req.allow_degraded or self._extractive is None:
+            return None
+        if self._llm is None:
+            return "warmup"
+        # Only the context pool knows its queue; a bare context never degrades.
+        predicted = getattr(self._llm, "predicted_wait_s", None)
+        if self._degrade_wait_s > 0 and predicted is not None and predicted() > self._degrade_wait_s:
+            return "busy"
+        return None
+
+    @staticmethod
+    def _article_ids(aggregated, limit_articles: int) -> List[str]:
+        return [a.payload["article_id"] for a in aggregated[:limit_articles] if a.payload.get("article_id")]
+
+    async def _build_sources(
+        self,
+        aggregated,
+        limit_articles: int,
+        prefer_abstracts: bool = True,
+        meta: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> tuple[list[dict], list[dict]]:
         articles_for_contract: List[Dict[str, Any]] = []
         sources_for_llm: List[Dict[str, Any]] = []
-        for art in aggregated[:limit_articles]:
-            p = art.payload
+        top = aggregated[:limit_articles]
+        # Chunks carry no display metadata; join the article records for the
+        # final top-N only (chunk payloads of older collections still have it).
+        # ``meta``: records already fetched by the caller (search_batch).
+        if meta is None:
+            meta = await self._qrepo.fetch_article_meta(self._article_ids(aggregated, limit_articles))
+        for art in top:
+            p = {**art.payload, **meta.get(art.payload.get("article_id"), {})}
             title = p.get("title", "")
             url = p.get("url", "")
             author = p.get("author", "")
@@ -64,51 +119,188 @@ class RagService:
                 "topic": topic,
             })
 
-            excerpt = "\n---\n".join([t for t in art.texts if t][:3])
+            # Excerpts are assembled by PromptPacker within the token budget; a
+            # precomputed abstract (rag_service.abstracts) replaces raw chunks.
+            abstract = p.get("abstract", "")
             sources_for_llm.append({
                 "title": title,
                 "url": url,
                 "author": author,
                 "date": date,
                 "topic": topic,
-                "excerpt": excerpt,
+                "score": art.best_score,
+                "abstract": abstract,
+                "texts": [abstract] if abstract and prefer_abstracts and self._use_abstracts else [t for t in art.texts if t],
             })
         return articles_for_contract, sources_for_llm
 
-    def search(self, payload: Dict[str, Any], trace_id: str = "") -> Dict[str, Any]:
+    @staticmethod
+    def _log_packed(endpoint: str, packed: PackedPrompt, trace_id: str) -> None:
+        logger.info(
+            "Prompt packed",
+            extra={
+                "trace_id": trace_id,
+                "endpoint": endpoint,
+                "prompt_tokens": packed.prompt_tokens,
+                "budget": packed.budget,
+                "sources": packed.n_sources,
+                "excerpts": packed.n_excerpts,
+            },
+        )
+
+    async def search_prompt(self, req: RagRequest, trace_id: str = "") -> Tuple[List[Dict[str, Any]], Optional[PackedPrompt]]:
+        """Retrieve sources for a search request and pack the summary prompt.
+
+        Returns the contract articles (aligned with [n] in the prompt) and the
+        packed prompt, or ``([], None)`` when nothing was found.
+        """
+        _, aggregated = await self._retrieve(req, trace_id)
+        return await self._pack_summary(req.query, aggregated, max_articles=5, endpoint="search", trace_id=trace_id)
+
+    async def _retrieve(self, req: RagRequest, trace_id: str) -> Tuple[List[float], List[AggregatedArticle]]:
+        qfilter = self._filter_for(req)
+        qvec = (await self._embedder.embed_async(req.query)).tolist()
+        return qvec, await self._retriever.retrieve_articles(qvec, qfilter, max_articles=5, trace_id=trace_id)
+
+    def _filter_for(self, req: RagRequest) -> Optional[Filter]:
+        f = req.filters
+        return self._qrepo.build_filter(f.author, f.date, f.topic, date_from=f.date_from, date_to=f.date_to)
+
+    async def _pack_summary(
+        self,
+        query: str,
+        aggregated: List[AggregatedArticle],
+        max_articles: int,
+        endpoint: str,
+        trace_id: str,
+        meta: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[PackedPrompt]]:
+        if not aggregated:
+            return [], None
+
+        articles, sources = await self._build_sources(aggregated, limit_articles=max_articles, meta=meta)
+
+        # Packing tokenizes repeatedly; keep it off the event loop.
+        packed = await asyncio.to_thread(
+            self._prompt_packer.pack, lambda s: self._prompt_builder.build_summary(query, s), sources
+        )
+        self._log_packed(endpoint, packed, trace_id)
+        return articles[:packed.n_sources], packed
+
+    @staticmethod
+    def _digest(sources: List[Dict[str, Any]], excerpt_chars: int = 300) -> str:
+        """Summary without generation: one line per article from its abstract."""
+        lines = []
+        for i, src in enumerate(sources, start=1):
+            text = src.get("abstract") or ""
+            if not text and src.get("texts"):
+                text = src["texts"][0][:excerpt_chars].rsplit(" ", 1)[0] + "…"
+            lines.append(f"[{i}] {src['title']}: {text}" if text else f"[{i}] {src['title']}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _with_refs(summary: str, articles: List[Dict[str, Any]]) -> str:
+        if "Источники" not in summary:
+            refs = "".join([f"[{i}]" for i in range(1, len(articles) + 1)])
+            summary = summary + f"\nИсточники: {refs}"
+        return summary
+
+    async def search(self, payload: Dict[str, Any], trace_id: str = "", cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
         try:
             req = RagRequest.model_validate(payload)
         except Exception as e:
             logger.warning("Validation error", extra={"trace_id": trace_id, "err": str(e)})
             return {"summary": "Некорректный запрос.", "articles": []}
 
-        author = req.filters.author
-        day = req.filters.date
-        topic = req.filters.topic
+        if req.mode == "fast":
+            _, aggregated = await self._retrieve(req, trace_id)
+            if not aggregated:
+                return {"summary": "Ничего не найдено по заданным фильтрам.", "articles": []}
+            articles, sources = await self._build_sources(aggregated, limit_articles=5)
+            return self._mapper.to_contract(self._with_refs(self._digest(sources), articles), articles)
+
+        reason = self._degrade_reason(req)
+        if reason is not None:
+            return await self._search_degraded(req, reason, trace_id)
+        if self._llm is None:
+            return {"summary": "Сервис прогревается (загрузка модели). Попробуйте через 30–60 секунд.", "articles": [], "error": "warmup"}
+
+        articles, packed = await self.search_prompt(req, trace_id=trace_id)
+        if packed is None:
+            return {"summary": "Ничего не найдено по заданным фильтрам.", "articles": []}
 
-        qfilter = self._qrepo.build_filter(author, day, topic)
-        qvec = self._embedder.embed(req.query).tolist()
+        summary = (await asyncio.to_thread(self._llm.generate, packed.prompt, endpoint="search", cancel=cancel)).strip()
+        if not summary:
+            summary = f"Найдено {len(articles)} статей по запросу «{req.query}»."
 
-        chunks = self._retriever.retrieve_chunks(qvec, qfilter, limit_chunks=50)
-        aggregated = self._retriever.aggregate(chunks, max_articles=5)
+        return self._mapper.to_contract(self._with_refs(summary, articles), articles)
 
+    async def _search_degraded(self, req: RagRequest, reason: str, trace_id: str) -> Dict[str, Any]:
+        """Answer right away with an extractive summary; the response is flagged ``degraded``."""
+        assert self._extractive is not None
+        qvec, aggregated = await self._retrieve(req, trace_id)
         if not aggregated:
             return {"summary": "Ничего не найдено по заданным фильтрам.", "articles": []}
+        articles, sources = await self._build_sources(aggregated, limit_articles=5)
+        summary = await self._extractive.summarize(qvec, sources) or self._digest(sources)
+        logger.info("Degraded search", extra={"trace_id": trace_id, "reason": reason, "articles": len(articles)})
+        return self._mapper.to_contract(self._with_refs(summary, articles), articles, degraded=True)
 
-        articles, sources = self._build_sources(aggregated, limit_articles=5)
+    async def search_batch(self, payload: Dict[str, Any], trace_id: str = "", cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
+        """Run many searches with one encoder call, one Qdrant batch search and one article lookup.
 
-        prompt = self._prompt_builder.build_summary(req.query, sources)
-        summary = self._llm.generate(prompt).strip()
-        if not summary:
-            summary = f"Найдено {len(articles)} статей по запросу «{req.query}»."
+        Payload contract:
+          {"queries": [<search payload>, ...], "summarize": false, "max_articles": 5}
 
-        if "Источники" not in summary:
-            refs = "".join([f"[{i}]" for i in range(1, len(articles) + 1)])
-            summary = summary + f"\nИсточники: {refs}"
+        Without ``summarize`` the LLM is skipped and each result lists the
+        found articles; with it, summaries are generated one query at a time
+        (llama.cpp has no batched multi-prompt generation here).
+        """
+        try:
+            req = RagBatchRequest.model_validate(payload)
+        except Exception as e:
+            logger.warning("Validation error", extra={"trace_id": trace_id, "err": str(e)})
+            return RagBatchResponse(results=[], summary="Некорректный запрос.").model_dump(exclude_none=True)
+
+        queries = req.queries
+        qvecs = (await self._embedder.embed_batch_async([q.query for q in queries])).tolist()
+        qfilters = [self._filter_for(q) for q in queries]
+        per_query_chunks = await self._retriever.retrieve_chunks_batch(qvecs, qfilters, limit_chunks=10 * req.max_articles)
+
+        per_query_articles = [self._retriever.aggregate(chunks, max_articles=req.max_articles) for chunks in per_query_chunks]
+        # One article-store lookup for the top-N of every query.
+        wanted = {aid for aggregated in per_query_articles for aid in self._article_ids(aggregated, req.max_articles)}
+        meta = await self._qrepo.fetch_article_meta(sorted(wanted))
+
+        results: List[Dict[str, Any]] = []
+        for q, aggregated in zip(queries, per_query_articles):
+            if not aggregated:
+                results.append(self._mapper.to_contract("Ничего не найдено по заданным фильтрам.", []))
+                continue
 
-        return self._mapper.to_contract(summary, articles)
+            if not req.summarize:
+                articles, _ = await self._build_sources(aggregated, limit_articles=req.max_articles, meta=meta)
+                summary = self._with_refs(f"Найдено {len(articles)} статей по запросу «{q.query}».", articles)
+                results.append(self._mapper.to_contract(summary, articles))
+                continue
 
-    def recommend(self, payload: Dict[str, Any], trace_id: str = "") -> Dict[str, Any]:
+            articles, packed = await self._pack_summary(
+                q.query, aggregated, max_articles=req.max_articles, endpoint="search_batch", trace_id=trace_id, meta=meta
+            )
+            summary = (
+                await asyncio.to_thread(self._llm.generate, packed.prompt, endpoint="search_batch", cancel=cancel)
+            ).strip()
+            if not summary:
+                summary = f"Найдено {len(articles)} статей по запросу «{q.query}»."
+            results.append(self._mapper.to_contract(self._with_refs(summary, articles), articles))
+
+        logger.info(
+            "Batch search finished",
+            extra={"trace_id": trace_id, "queries": len(queries), "summarize": req.summarize},
+        )
+        return {"results": results}
+
+    async def recommend(self, payload: Dict[str, Any], trace_id: str = "") -> Dict[str, Any]:
         """Recommend similar publications for a given seed URL.
 
         Payload contract:
@@ -122,25 +314,19 @@ class RagService:
         seed_url = req.url.strip()
         seed_article_id = str(uuid.uuid5(uuid.NAMESPACE_URL, seed_url))
 
-        seed_vec = self._qrepo.retrieve_vector(seed_article_id)
-        if seed_vec is None:
-            qf = Filter(must=[FieldCondition(key="article_id", match=MatchValue(value=seed_article_id))])
-            pts = self._qrepo.scroll_payloads(qf, limit=1)
-            if pts:
-                seed_vec = self._qrepo.retrieve_vector(str(pts[0]["id"]))
+        # The lead chunk represents the article.
+        seed = (await self._qrepo.fetch_articles([seed_article_id], per_article=1, with_vectors=True)).get(seed_article_id)
+        seed_vec = seed[0]["vector"] if seed else None
 
         if seed_vec is None:
             return {"summary": "Не удалось найти исходную статью для рекомендаций.", "articles": []}
 
-        hits = self._qrepo.search(seed_vec, qfilter=None, limit=req.top_k * 20)
-        chunks = [RetrievedChunk(score=h["score"], payload=h["payload"]) for h in hits]
-        aggregated = self._retriever.aggregate(chunks, max_articles=req.top_k + 5)
-
-        aggregated = [a for a in aggregated if a.payload.get("article_id") != seed_article_id]
+        not_seed = Filter(must_not=[FieldCondition(key="article_id", match=MatchValue(value=seed_article_id))])
+        aggregated = await self._retriever.retrieve_articles(seed_vec, not_seed, max_articles=req.top_k, trace_id=trace_id)
         if not aggregated:
             return {"summary": "Похожие публикации не найдены.", "articles": []}
 
-        articles, _ = self._build_sources(aggregated, limit_articles=req.top_k)
+        articles, _ = await self._build_sources(aggregated, limit_articles=req.top_k)
         if not articles:
             return {"summary": "Похожие публикации не найдены.", "articles": []}
 
@@ -148,52 +334,74 @@ class RagService:
         summary = f"Найдено {len(articles)} похожих публикаций. Источники: {refs}"
         return self._mapper.to_contract(summary, articles)
 
-    def quiz(self, payload: Dict[str, Any], trace_id: str = "") -> Dict[str, Any]:
+    async def quiz(self, payload: Dict[str, Any], trace_id: str = "", cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
         """Generate a quiz from a list of article URLs.
 
         Payload contract:
           {"urls": ["..."], "n_questions": 8}
+
+        ``n_questions`` is clamped to what the token budget holds; the response
+        carries the number asked of the model and, if clamped, the requested one.
         """
         try:
             req = QuizRequest.model_validate(payload)
         except Exception:
             return {"summary": "Некорректный запрос.", "articles": []}
 
-        aggregated: List[AggregatedArticle] = []
+        article_ids = list(dict.fromkeys(
+            str(uuid.uuid5(uuid.NAMESPACE_URL, url.strip())) for url in req.urls if (url or "").strip()
+        ))
+        found = await self._qrepo.fetch_articles(article_ids, per_article=3)
 
-        for url in req.urls:
-            url = (url or "").strip()
-            if not url:
-                continue
-            article_id = str(uuid.uuid5(uuid.NAMESPACE_URL, url))
-            qf = Filter(must=[FieldCondition(key="article_id", match=MatchValue(value=article_id))])
-            pts = self._qrepo.scroll_payloads(qf, limit=8)
-            if not pts:
+        aggregated: List[AggregatedArticle] = []
+        for article_id in article_ids:  # keep the requested order
+            chunks = found.get(article_id)
+            if not chunks:
                 continue
-
-            pts_sorted = sorted(pts, key=lambda p: int(p["payload"].get("chunk_id", 0)))
-            p0 = pts_sorted[0]["payload"]
-            texts = []
-            for p in pts_sorted[:3]:
-                t = (p["payload"].get("text") or "").strip()
-                if t:
-                    texts.append(t)
-
-            aggregated.append(AggregatedArticle(best_score=1.0, payload=p0, texts=texts))
+            texts = [t for t in ((c["payload"].get("text") or "").strip() for c in chunks) if t]
+            aggregated.append(AggregatedArticle(best_score=1.0, payload=chunks[0]["payload"], texts=texts))
 
         if not aggregated:
             return {"summary": "Ничего не найдено для генерации теста.", "articles": []}
 
-        articles, sources = self._build_sources(aggregated, limit_articles=min(len(aggregated), 5))
-        prompt = self._prompt_builder.build_quiz("Тест по выбранным материалам", sources, n_questions=req.n_questions)
-        quiz_text = self._llm.generate(prompt).strip()
+        # Questions need details, so the quiz keeps raw excerpts.
+        articles, sources = await self._build_sources(aggregated, limit_articles=min(len(aggregated), 5), prefer_abstracts=False)
+        structured = self._quiz_format.structured
+        # Asking for more questions than the budget holds only truncates the output.
+        n_questions = min(req.n_questions, self._quiz_format.max_questions())
+        if n_questions < req.n_questions:
+            logger.info("Quiz questions clamped", extra={"trace_id": trace_id, "requested": req.n_questions, "n_questions": n_questions})
+        max_tokens = self._quiz_format.max_tokens(n_questions)
+        packed = await asyncio.to_thread(
+            self._prompt_packer.pack,
+            lambda s: self._prompt_builder.build_quiz(
+                "Тест по выбранным материалам", s, n_questions=n_questions, structured=structured
+            ),
+            sources,
+            max_new_tokens=max_tokens,
+        )
+        articles = articles[:packed.n_sources]
+        self._log_packed("quiz", packed, trace_id)
+
+        schema = self._quiz_format.schema(n_questions, len(articles)) if structured else None
+        quiz_text = (
+            await asyncio.to_thread(
+                self._llm.generate, packed.prompt, endpoint="quiz", max_tokens=max_tokens, json_schema=schema, cancel=cancel
+            )
+        ).strip()
+
+        questions = self._quiz_format.parse(quiz_text, len(articles)) if structured and quiz_text else None
+        if questions:
+            quiz_text = self._quiz_format.render(questions)
+        elif structured:
+            # Never show raw (possibly truncated) JSON to the user.
+            quiz_text = ""
 
         if not quiz_text:
             quiz_text = "Тест не удалось сгенерировать на основе найденных материалов."
 
-        if "Источники" not in quiz_text:
-            refs = "".join([f"[{i}]" for i in range(1, len(articles) + 1)])
-            quiz_text = quiz_text + f"Источники: {refs}"
-
-        return self._mapper.to_contract(quiz_text, articles)
-
+        resp = self._mapper.to_contract(self._with_refs(quiz_text, articles), articles, quiz=questions)
+        resp["n_questions"] = n_questions
+        if n_questions < req.n_questions:
+            resp["n_questions_requested"] = req.n_questions
+        return resp
@@ -1,5 +1,8 @@
+from datetime import date, timedelta
 from html import escape
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
 import traceback
 
 from aiogram import Router, F
@@ -14,10 +17,12 @@ from aiogram.types import (
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
-from telegram_bot_service.services.rag_client import get_rag_client
-from telegram_bot_service.models.contracts import SearchResponse
+from telegram_bot_service.services.rag_client import RpcCancelled, get_rag_client
+from telegram_bot_service.models.contracts import FacetsResponse, FacetValue, SearchResponse
 
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
 
@@ -40,7 +45,7 @@ def make_filter_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
-def make_post_search_inline_keyboard(articles: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+def make_post_search_inline_keyboard(articles: List[Dict[str, Any]], degraded: bool = False) -> InlineKeyboardMarkup:
     # Recommend for first up to 3 items to keep UI compact
     rec_buttons: List[InlineKeyboardButton] = []
     for i in range(min(3, len(articles))):
@@ -50,11 +55,101 @@ def make_post_search_inline_keyboard(articles: List[Dict[str, Any]]) -> InlineKe
     if rec_buttons:
         rows.append(rec_buttons)
 
+    if degraded:
+        rows.append([InlineKeyboardButton(text="🧠 Полное резюме", callback_data="full_summary")])
     rows.append([InlineKeyboardButton(text="📝 Тест по найденным", callback_data="quiz")])
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+_RELATIVE_DAYS = {"сегодня": 1, "неделя": 7, "неделю": 7, "месяц": 30, "год": 365}
+_LAST_N_DAYS = re.compile(r"^(\d{1,4})\s*(д|дн|дня|дней|d)$")
+
+
+def parse_date_filter(text: str, today: Optional[date] = None) -> Optional[Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """Parse the date filter input into ``(date, date_from, date_to)``.
+
+    Accepts a day (``2024-12-01``), a range (``2024-12-01..2024-12-31``, either
+    end may be empty) or a relative period (``неделя``, ``месяц``, ``14 дней``).
+    Returns None if the input is not understood.
+    """
+    today = today or date.today()
+    value = text.strip().lower()
+    value = re.sub(r"^(за\s+)?(последн\w*\s+)?", "", value)
+
+    days = _RELATIVE_DAYS.get(value)
+    m = _LAST_N_DAYS.match(value)
+    if m:
+        days = int(m.group(1))
+    if days:
+        return None, (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+    try:
+        if ".." in value:
+            start, end = (p.strip() for p in value.split("..", 1))
+            date_from = date.fromisoformat(start).isoformat() if start else None
+            date_to = date.fromisoformat(end).isoformat() if end else None
+            if not (date_from or date_to) or (date_from and date_to and date_from > date_to):
+                return None
+            return None, date_from, date_to
+        return date.fromisoformat(value).isoformat(), None, None
+    except ValueError:
+        return None
+
+
+_FACET_TEXT = {
+    "author": {"set": "Фильтр по автору установлен.", "missing": "Автор «{}» не найден в базе."},
+    "topic": {"set": "Фильтр по теме установлен.", "missing": "Тема «{}» не найдена в базе."},
+}
+
+
+def make_facet_keyboard(field: str, values: List[FacetValue]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"{v.label} ({v.count})", callback_data=f"facet:{field}:{i}")]
+        for i, v in enumerate(values)
+    ])
+
+
+async def suggest_facet(field: str, prefix: str) -> Optional[FacetsResponse]:
+    """Catalog suggestions, or None when rag-service has no catalog (filters are then taken as typed)."""
+    try:
+        resp = await get_rag_client().facets(field, prefix)
+    except Exception:
+        logger.exception("Facet lookup failed")
+        return None
+    return resp if resp.version else None
+
+
+async def offer_facets(message: Message, state: FSMContext, field: str, prompt: str) -> None:
+    resp = await suggest_facet(field, "")
+    if resp is None or not resp.values:
+        await message.answer(prompt)
+        return
+    await state.update_data(facet_choices={field: [v.label for v in resp.values]})
+    await message.answer(prompt + "\nИли выберите из самых частых:", reply_markup=make_facet_keyboard(field, resp.values))
+
+
+async def apply_facet_input(message: Message, state: FSMContext, field: str) -> None:
+    """Set the filter if the value is known; otherwise suggest close ones and keep waiting."""
+    typed = (message.text or "").strip()
+    resp = await suggest_facet(field, typed)
+    if resp is not None:
+        exact = next((v for v in resp.values if v.value == typed.lower()), None)
+        if exact is None:
+            missing = _FACET_TEXT[field]["missing"].format(typed)
+            if resp.values:
+                await state.update_data(facet_choices={field: [v.label for v in resp.values]})
+                await message.answer(missing + " Возможно, вы имели в виду:", reply_markup=make_facet_keyboard(field, resp.values))
+            else:
+                await message.answer(missing + " Попробуйте другое написание.")
+            return
+        typed = exact.label
+
+    await state.update_data(**{field: typed})
+    await state.set_state(None)
+    await message.answer(_FACET_TEXT[field]["set"], reply_markup=make_filter_keyboard())
+
+
 @router.message(F.text == "/start")
 async def cmd_start(message: Message, state: FSMContext) -> None:
     await state.clear()
@@ -71,7 +166,8 @@ async def cmd_start(message: Message, state: FSMContext) -> None:
 async def process_help_command(message: Message) -> None:
     await message.answer(
         "Используйте /search и задайте запрос.\n"
-        "Далее вы можете добавить фильтры: автор, дата (YYYY-MM-DD), тематика.\n\n"
+        "Далее вы можете добавить фильтры: автор, дата (YYYY-MM-DD, диапазон YYYY-MM-DD..YYYY-MM-DD "
+        "или период: неделя, месяц, 14 дней), тематика.\n\n"
         "После ответа доступны кнопки: похожие публикации и генерация теста."
     )
 
@@ -84,7 +180,9 @@ async def cmd_search(message: Message, state: FSMContext) -> None:
 
 @router.message(SearchStates.waiting_for_query)
 async def process_query(message: Message, state: FSMContext) -> None:
-    await state.update_data(query=message.text.strip(), author=None, date=None, topic=None, last_articles=[])
+    await state.update_data(
+        query=message.text.strip(), author=None, date=None, date_from=None, date_to=None, topic=None, last_articles=[]
+    )
     await state.set_state(None)
     await message.answer(
         "Выберите фильтры (или нажмите ✅ Выполнить поиск):",
@@ -99,14 +197,12 @@ async def filter_author(message: Message, state: FSMContext) -> None:
         await message.answer("Сначала введите запрос через /search.")
         return
     await state.set_state(SearchStates.waiting_for_author)
-    await message.answer("Введите автора (точное совпадение):")
+    await offer_facets(message, state, "author", "Введите автора (можно начало фамилии):")
 
 
 @router.message(SearchStates.waiting_for_author)
 async def process_author(message: Message, state: FSMContext) -> None:
-    await state.update_data(author=message.text.strip())
-    await state.set_state(None)
-    await message.answer("Фильтр по автору установлен.", reply_markup=make_filter_keyboard())
+    await apply_facet_input(message, state, "author")
 
 
 @router.message(F.text == "📅 Дата")
@@ -116,12 +212,20 @@ async def filter_date(message: Message, state: FSMContext) -> None:
         await message.answer("Сначала введите запрос через /search.")
         return
     await state.set_state(SearchStates.waiting_for_date)
-    await message.answer("Введите дату в формате YYYY-MM-DD:")
+    await message.answer(
+        "Введите дату (YYYY-MM-DD), диапазон (YYYY-MM-DD..YYYY-MM-DD, любой конец можно опустить) "
+        "или период: неделя, месяц, 14 дней:"
+    )
 
 
 @router.message(SearchStates.waiting_for_date)
 async def process_date(message: Message, state: FSMContext) -> None:
-    await state.update_data(date=message.text.strip())
+    parsed = parse_date_filter(message.text or "")
+    if parsed is None:
+        await message.answer("Не понял дату. Примеры: 2024-12-01, 2024-12-01..2024-12-31, неделя, 14 дней.")
+        return
+    day, date_from, date_to = parsed
+    await state.update_data(date=day, date_from=date_from, date_to=date_to)
     await state.set_state(None)
     await message.answer("Фильтр по дате установлен.", reply_markup=make_filter_keyboard())
 
@@ -133,14 +237,26 @@ async def filter_topic(message: Message, state: FSMContext) -> None:
         await message.answer("Сначала введите запрос через /search.")
         return
     await state.set_state(SearchStates.waiting_for_topic)
-    await message.answer("Введите тематику (как в базе, например 'ИИ'):")
+    await offer_facets(message, state, "topic", "Введите тематику (например 'ИИ'):")
 
 
 @router.message(SearchStates.waiting_for_topic)
 async def process_topic(message: Message, state: FSMContext) -> None:
-    await state.update_data(topic=message.text.strip())
+    await apply_facet_input(message, state, "topic")
+
+
+@router.callback_query(F.data.startswith("facet:"))
+async def cb_facet(call: CallbackQuery, state: FSMContext) -> None:
+    try:
+        _, field, idx = call.data.split(":", 2)
+        label = (await state.get_data()).get("facet_choices", {})[field][int(idx)]
+    except Exception:
+        await call.answer("Список устарел, введите значение ещё раз.", show_alert=True)
+        return
+    await state.update_data(**{field: label})
     await state.set_state(None)
-    await message.answer("Фильтр по теме установлен.", reply_markup=make_filter_keyboard())
+    await call.answer()
+    await call.message.answer(f"{_FACET_TEXT[field]['set']} ({label})", reply_markup=make_filter_keyboard())
 
 
 @router.message(F.text == "♻️ Сбросить фильтры")
@@ -151,13 +267,15 @@ async def reset_filters(message: Message, state: FSMContext) -> None:
         await message.answer("Фильтры сброшены. Используйте /search для нового запроса.", reply_markup=make_filter_keyboard())
         await state.clear()
         return
-    await state.update_data(author=None, date=None, topic=None)
+    await state.update_data(author=None, date=None, date_from=None, date_to=None, topic=None)
     await message.answer("Фильтры сброшены. Нажмите ✅ Выполнить поиск.", reply_markup=make_filter_keyboard())
 
 
 def format_search_response(resp: SearchResponse) -> str:
     summary = escape(resp.summary or "Результаты поиска")
     text = f"<b>{summary}</b>\n\n"
+    if resp.degraded:
+        text += "<i>⚡ Быстрое резюме из текста статей (модель занята или прогревается).</i>\n\n"
 
     if not resp.articles:
         return text + "Ничего не найдено."
@@ -180,6 +298,47 @@ def format_search_response(resp: SearchResponse) -> str:
     return text
 
 
+def format_quiz_response(resp: SearchResponse) -> str:
+    text = "<b>📝 Тест по найденным материалам</b>\n\n"
+    if resp.n_questions_requested:
+        text += (
+            f"<i>Вопросов: {resp.n_questions} из {resp.n_questions_requested} запрошенных: "
+            "больше не помещается в лимит генерации.</i>\n\n"
+        )
+    letters = ["A", "B", "C", "D"]
+
+    for idx, q in enumerate(resp.quiz or [], start=1):
+        text += f"<b>{idx}. {escape(q.question)}</b> [{q.source}]\n"
+        for letter, option in zip(letters, q.options):
+            text += f"   {letter}) {escape(option)}\n"
+        answer = f"{escape(q.answer)}. {escape(q.explanation)}".strip()
+        text += f"   Ответ: <tg-spoiler>{answer}</tg-spoiler>\n\n"
+
+    text += "Источники:\n"
+    for idx, art in enumerate(resp.articles[:10], start=1):
+        title = escape(art.title or "Без названия")
+        text += f"[{idx}] <a href='{art.url or ''}'>{title}</a>\n"
+
+    if len(text) > 4000:
+        # Cut on a line boundary so HTML tags stay balanced.
+        text = text[:4000].rsplit("\n\n", 1)[0] + "\n\n... (результат усечён)"
+
+    return text
+
+
+async def search_from_state(data: Dict[str, Any], user_id: int, allow_degraded: bool = True) -> SearchResponse:
+    return await get_rag_client().search(
+        query=data["query"],
+        author=data.get("author"),
+        date=data.get("date"),
+        date_from=data.get("date_from"),
+        date_to=data.get("date_to"),
+        topic=data.get("topic"),
+        cancel_key=f"search:{user_id}",
+        allow_degraded=allow_degraded,
+    )
+
+
 @router.message(F.text == "✅ Выполнить поиск")
 async def run_search(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
@@ -190,14 +349,11 @@ async def run_search(message: Message, state: FSMContext) -> None:
 
     await message.answer("Ищу статьи…")
 
-    client = get_rag_client()
     try:
-        resp = await client.search(
-            query=query,
-            author=data.get("author"),
-            date=data.get("date"),
-            topic=data.get("topic"),
-        )
+        resp = await search_from_state(data, message.from_user.id)
+    except RpcCancelled:
+        # A newer search from the same user replaced this one.
+        return
     except Exception as e:
         tb = traceback.format_exc()
         await message.answer(
@@ -211,11 +367,46 @@ async def run_search(message: Message, state: FSMContext) -> None:
     await state.update_data(last_articles=last_articles)
 
     text = format_search_response(resp)
-    inline_kb = make_post_search_inline_keyboard(last_articles)
+    inline_kb = make_post_search_inline_keyboard(last_articles, degraded=resp.degraded)
 
     await message.answer(text, parse_mode="HTML", disable_web_page_preview=False, reply_markup=inline_kb)
 
 
+@router.callback_query(F.data == "full_summary")
+async def cb_full_summary(call: CallbackQuery, state: FSMContext) -> None:
+    data = await state.get_data()
+    if not data.get("query"):
+        await call.answer("Сначала выполните поиск.", show_alert=True)
+        return
+
+    await call.answer("Готовлю полное резюме…")
+
+    try:
+        # Asks for the generated summary; nothing waits for the LLM, during
+        # warm-up the service answers with error="warmup" instead.
+        resp = await search_from_state(data, call.from_user.id, allow_degraded=False)
+    except RpcCancelled:
+        return
+    except Exception:
+        await call.message.answer("❌ Ошибка при подготовке резюме.")
+        return
+
+    if resp.error == "warmup":
+        # The previous results and their buttons stay usable.
+        await call.message.answer("⏳ Модель ещё загружается. Нажмите «🧠 Полное резюме» через минуту.")
+        return
+    if not resp.articles:
+        await call.message.answer(escape(resp.summary or "Не удалось подготовить резюме."), parse_mode="HTML")
+        return
+
+    last_articles = [a.model_dump() for a in resp.articles]
+    await state.update_data(last_articles=last_articles)
+
+    text = format_search_response(resp)
+    inline_kb = make_post_search_inline_keyboard(last_articles, degraded=resp.degraded)
+    await call.message.answer(text, parse_mode="HTML", disable_web_page_preview=False, reply_markup=inline_kb)
+
+
 @router.callback_query(F.data.startswith("rec:"))
 async def cb_recommend(call: CallbackQuery, state: FSMContext) -> None:
     data = await state.get_data()
@@ -279,7 +470,7 @@ async def cb_quiz(call: CallbackQuery, state: FSMContext) -> None:
         await call.message.answer("❌ Ошибка при генерации теста.")
         return
 
-    # quiz response: summary contains the quiz text; articles = sources
-    text = format_search_response(resp)
+    # Structured quiz is rendered from `quiz`; otherwise summary contains the quiz text.
+    text = format_quiz_response(resp) if resp.quiz else format_search_response(resp)
     inline_kb = make_post_search_inline_keyboard([a.model_dump() for a in resp.articles])
     await call.message.answer(text, parse_mode="HTML", disable_web_page_preview=False, reply_markup=inline_kb)
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
 class SearchFilters(BaseModel):
     author: Optional[str] = None
-    date: Optional[str] = None  # YYYY-MM-DD
+    date: Optional[str] = None  # YYYY-MM-DD, exact day
+    date_from: Optional[str] = None  # YYYY-MM-DD, inclusive
+    date_to: Optional[str] = None  # YYYY-MM-DD, inclusive
     topic: Optional[str] = None
 
 
 class SearchRequest(BaseModel):
     query: str = Field(min_length=1)
     filters: SearchFilters = Field(default_factory=SearchFilters)
+    allow_degraded: bool = True
 
 
 class ArticleItem(BaseModel):
@@ -23,9 +26,22 @@ class ArticleItem(BaseModel):
     topic: str
 
 
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str] = Field(default_factory=list)
+    answer: str = ""
+    explanation: str = ""
+    source: int = 0  # 1-based index into articles
+
+
 class SearchResponse(BaseModel):
     summary: str
     articles: List[ArticleItem] = Field(default_factory=list)
+    quiz: Optional[List[QuizQuestion]] = None
+    degraded: bool = False  # extractive summary; a full one can be requested with allow_degraded=False
+    error: Optional[str] = None  # "warmup" (model loading) or "overloaded"; no results then
+    n_questions: Optional[int] = None  # quiz: questions asked of the model
+    n_questions_requested: Optional[int] = None  # quiz: set when n_questions was clamped
 
 
 class RecommendRequest(BaseModel):
@@ -36,3 +52,21 @@ class RecommendRequest(BaseModel):
 class QuizRequest(BaseModel):
     urls: List[str] = Field(min_length=1)
     n_questions: int = Field(default=8, ge=1, le=20)
+
+
+class FacetsRequest(BaseModel):
+    field: Literal["author", "topic", "day"]
+    prefix: str = ""
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class FacetValue(BaseModel):
+    value: str
+    label: str
+    count: int = 0
+
+
+class FacetsResponse(BaseModel):
+    field: str
+    values: List[FacetValue] = Field(default_factory=list)
+    version: str = ""  # empty => rag-service has no catalog loaded
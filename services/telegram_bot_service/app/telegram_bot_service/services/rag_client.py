@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import asyncio
-import json
 import logging
-import uuid
-from typing import Any, Dict, Optional, List
+import time
+from typing import Any, Dict, Optional, List, Tuple
 
-import aio_pika
-from aio_pika.abc import AbstractRobustConnection, AbstractRobustChannel
+from aio_pika.abc import AbstractRobustConnection
+
+from common.rabbit.connection import connect
+from common.rabbit.rpc_client import RpcCancelled, RpcClient
 
 from telegram_bot_service.settings import settings
 from telegram_bot_service.models.contracts import (
@@ -15,129 +15,81 @@ from telegram_bot_service.models.contracts import (
     SearchResponse,
     RecommendRequest,
     QuizRequest,
+    FacetsRequest,
+    FacetsResponse,
 )
 
 logger = logging.getLogger(__name__)
 
 
 class RAGClient:
-    """RabbitMQ RPC client for the RAG service (Direct Reply-to).
+    """RabbitMQ RPC client for the RAG service.
 
-    - Keeps a single robust connection + channel
-    - Starts exactly one consumer for `amq.rabbitmq.reply-to`
-    - Supports concurrent in-flight RPC calls via correlation_id map
+    Thin typed wrapper over the shared ``RpcClient``: one robust connection,
+    one channel and one reply consumer for all in-flight calls.
     """
 
     def __init__(self) -> None:
         self._conn: Optional[AbstractRobustConnection] = None
-        self._channel: Optional[AbstractRobustChannel] = None
-        self._exchange: Optional[aio_pika.Exchange] = None
-
-        self._reply_queue: Optional[str] = None
-        self._reply_q: Optional[aio_pika.Queue] = None
-        self._pending: Dict[str, asyncio.Future[Dict[str, Any]]] = {}
-        self._pending_lock = asyncio.Lock()
-        self._consumer_started = False
+        self._rpc: Optional[RpcClient] = None
+        # (field, prefix, limit) -> (expires_at, response)
+        self._facets_cache: Dict[Tuple[str, str, int], Tuple[float, FacetsResponse]] = {}
 
     async def connect(self) -> None:
         if self._conn:
             return
 
-        self._conn = await aio_pika.connect_robust(settings.amqp_url)
-        self._channel = await self._conn.channel()
-        await self._channel.set_qos(prefetch_count=20)
-
-        self._exchange = await self._channel.declare_exchange(
-            settings.rag_exchange, aio_pika.ExchangeType.DIRECT, durable=True
+        self._conn = await connect(settings.amqp_url)
+        self._rpc = RpcClient(
+            self._conn,
+            settings.rag_exchange,
+            api_key=settings.service_api_key,
+            cancel_exchange=settings.rag_cancel_exchange,
+            content_type=settings.rpc_content_type,
+            compress_threshold=settings.rpc_compress_threshold,
         )
-
-        await self._start_reply_consumer()
+        await self._rpc.start()
         logger.info("RAGClient connected. Exchange='%s'", settings.rag_exchange)
 
-    async def _start_reply_consumer(self) -> None:
-        """
-        Start a private reply queue consumer for RPC responses.
-
-        We intentionally avoid RabbitMQ "direct reply-to" (amq.rabbitmq.reply-to) here because
-        it can break on reconnects/consumer cancellations and causes:
-        PRECONDITION_FAILED - fast reply consumer does not exist
-        """
-        if self._consumer_started:
-            return
-        assert self._channel is not None
-
-        # Server-named, exclusive, auto-delete queue: stable for the lifetime of this connection.
-        # RobustChannel will re-declare it on reconnect.
-        self._reply_q = await self._channel.declare_queue(
-            name="",
-            durable=False,
-            exclusive=True,
-            auto_delete=True,
-        )
-        self._reply_queue = self._reply_q.name
-
-        async def on_response(message: aio_pika.IncomingMessage) -> None:
-            cid = message.correlation_id
-            if not cid:
-                return
-            try:
-                payload = json.loads(message.body.decode("utf-8"))
-            except Exception:
-                logger.exception("Failed to decode RPC response JSON")
-                return
-
-            async with self._pending_lock:
-                fut = self._pending.pop(cid, None)
-
-            if fut and not fut.done():
-                fut.set_result(payload)
-
-        await self._reply_q.consume(on_response, no_ack=True)
-        self._consumer_started = True
+    async def close(self) -> None:
+        if self._rpc is not None:
+            await self._rpc.close()
+        if self._conn is not None:
+            await self._conn.close()
+        self._rpc = None
+        self._conn = None
 
-
-    async def _rpc_call(self, routing_key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        if not self._conn or not self._channel or not self._exchange or not self._reply_queue:
+    async def _rpc_call(
+        self,
+        routing_key: str,
+        payload: Dict[str, Any],
+        cancel_key: Optional[str] = None,
+        timeout_s: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        if self._rpc is None:
             raise RuntimeError("RAGClient is not connected. Call connect() on startup.")
-
-        correlation_id = str(uuid.uuid4())
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-
-        headers = {}
-        if settings.service_api_key:
-            headers["x-api-key"] = settings.service_api_key
-
-        fut: asyncio.Future[Dict[str, Any]] = asyncio.get_running_loop().create_future()
-        async with self._pending_lock:
-            self._pending[correlation_id] = fut
-
-        msg = aio_pika.Message(
-            body=body,
-            reply_to=self._reply_queue or "",
-            correlation_id=correlation_id,
-            headers=headers,
-            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-            content_type="application/json",
+        return await self._rpc.call(
+            routing_key, payload, timeout_s=timeout_s or settings.rag_rpc_timeout_s, cancel_key=cancel_key
         )
 
-        await self._exchange.publish(msg, routing_key=routing_key)
-
-        try:
-            return await asyncio.wait_for(fut, timeout=settings.rag_rpc_timeout_s)
-        except Exception:
-            async with self._pending_lock:
-                await self._pending.pop(correlation_id, None)
-            raise
-
     async def search(
         self,
         query: str,
         author: Optional[str] = None,
         date: Optional[str] = None,
         topic: Optional[str] = None,
+        cancel_key: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        allow_degraded: bool = True,
     ) -> SearchResponse:
-        req = SearchRequest(query=query.strip(), filters={"author": author, "date": date, "topic": topic})
-        raw = await self._rpc_call(settings.rag_routing_search, req.model_dump(exclude_none=True))
+        """Run a search; a newer call with the same ``cancel_key`` cancels this one."""
+        req = SearchRequest(
+            query=query.strip(),
+            filters={"author": author, "date": date, "date_from": date_from, "date_to": date_to, "topic": topic},
+            allow_degraded=allow_degraded,
+        )
+        raw = await self._rpc_call(settings.rag_routing_search, req.model_dump(exclude_none=True), cancel_key=cancel_key)
         return SearchResponse.model_validate(raw)
 
     async def recommend(self, seed_url: str, top_k: int = 5) -> SearchResponse:
@@ -150,6 +102,23 @@ class RAGClient:
         raw = await self._rpc_call(settings.rag_routing_quiz, req.model_dump())
         return SearchResponse.model_validate(raw)
 
+    async def facets(self, field: str, prefix: str = "", limit: int = 8) -> FacetsResponse:
+        """Known filter values starting with ``prefix``, most frequent first (cached)."""
+        req = FacetsRequest(field=field, prefix=prefix.strip().lower(), limit=limit)
+        key = (req.field, req.prefix, req.limit)
+        now = time.monotonic()
+        cached = self._facets_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        # Interactive lookup: fail fast instead of holding the user for the full RPC timeout.
+        raw = await self._rpc_call(settings.rag_routing_facets, req.model_dump(), timeout_s=10.0)
+        resp = FacetsResponse.model_validate(raw)
+        if resp.version:
+            if len(self._facets_cache) >= 1024:
+                self._facets_cache.clear()
+            self._facets_cache[key] = (now + settings.facets_cache_ttl_s, resp)
+        return resp
+
 
 _rag_client: Optional[RAGClient] = None
 
@@ -22,7 +22,13 @@ class Settings(BaseSettings):
     rag_routing_search: str = Field(default="search", alias="RAG_ROUTING_SEARCH")
     rag_routing_recommend: str = Field(default="recommend", alias="RAG_ROUTING_RECOMMEND")
     rag_routing_quiz: str = Field(default="quiz", alias="RAG_ROUTING_QUIZ")
+    rag_routing_facets: str = Field(default="facets", alias="RAG_ROUTING_FACETS")
+    # Facet suggestions are cached in the bot; the catalog changes only on re-indexing.
+    facets_cache_ttl_s: float = Field(default=300.0, alias="FACETS_CACHE_TTL_S")
+    rag_cancel_exchange: str = Field(default="rag.cancel", alias="RAG_CANCEL_EXCHANGE")
     rag_rpc_timeout_s: float = Field(default=250.0, alias="RAG_RPC_TIMEOUT_S")
+    rpc_content_type: str = Field(default="application/msgpack", alias="RPC_CONTENT_TYPE")
+    rpc_compress_threshold: int = Field(default=16384, alias="RPC_COMPRESS_THRESHOLD")
 
     # Optional access control (comma-separated Telegram user ids). Empty => allow everyone.
     allowed_telegram_ids: str | None = Field(default=None, alias="ALLOWED_TELEGRAM_IDS")